@@ -13,7 +13,10 @@ from pathlib import Path
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Model paths
+sys.path.insert(0, str(Path(__file__).resolve().parent / "skills" / "local-genai" / "scripts"))
+from model_staging import staged
+
+# Model paths (main() swaps in local staged copies, see skills/local-genai/scripts/model_staging.py)
 LTX_MODEL_PATH = "/mnt/c/models/diffusion_models/ltx-2-19b-dev-fp8.safetensors"
 SPATIAL_UPSAMPLER_PATH = "/mnt/c/models/upscale_models/ltx-2-spatial-upscaler-x2-1.0.safetensors"
 DISTILLED_LORA_PATH = "/mnt/c/models/loras/ltx-2-19b-distilled-lora-384.safetensors"
@@ -159,6 +162,9 @@ def generate_video(
 
 def main():
     """Main entry point - generates test video."""
+    global LTX_MODEL_PATH, SPATIAL_UPSAMPLER_PATH, DISTILLED_LORA_PATH, GEMMA_ROOT
+    LTX_MODEL_PATH, SPATIAL_UPSAMPLER_PATH, DISTILLED_LORA_PATH, GEMMA_ROOT = (
+        staged(path) for path in (LTX_MODEL_PATH, SPATIAL_UPSAMPLER_PATH, DISTILLED_LORA_PATH, GEMMA_ROOT))
     
     # Test video parameters
     prompt = "A cat walks across a sunny living room floor, moving from left to right"
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Load balancing across several ComfyUI backends
+
+A BackendPool takes a list of endpoints (e.g. a second ComfyUI instance
+on another port or another box), polls each one's queue depth (/queue)
+and free VRAM (/system_stats), and dispatches every workflow to the
+least-loaded backend that can run it - preferring one that already has
+the workflow's models loaded. Which models a server holds is read from
+the server itself (the last job in its /queue, else its most recent
+/history entry), so a fresh pool in a one-shot script routes by it too.
+A backend that stops answering is marked down, the job fails over to the
+next candidate, and the dead backend is probed again after a cool-down.
+
+Backends come from --backends or $COMFYUI_BACKENDS (comma-separated);
+the default is the single $COMFYUI_URL server.
+
+Usage (from another script):
+    from backend_pool import BackendPool
+
+    pool = BackendPool(["http://127.0.0.1:8188", "http://127.0.0.1:8189"])
+    backend, prompt_id = pool.dispatch(workflow)
+    entry = backend.client.wait_for_prompt(prompt_id)
+
+CLI:
+    python backend_pool.py status --backends http://127.0.0.1:8188,http://gpu2:8188
+    python backend_pool.py run job1.json job2.json ... --backends ...
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import FrozenSet, List, Optional, Tuple
+
+import requests
+
+from comfyui_client import ComfyClient, DEFAULT_URL
+from job_scheduler import LOADER_INPUTS, model_key
+from workflow_templates import get_object_info
+
+REFRESH_INTERVAL = 2.0  # seconds between /queue + /system_stats polls
+DEAD_RETRY = 30.0  # seconds before a failed backend is probed again
+SWAP_PENALTY = 3  # a model reload costs about as much as this many queued jobs
+
+
+def backend_urls(value: Optional[str] = None) -> List[str]:
+    value = value or os.environ.get("COMFYUI_BACKENDS") or DEFAULT_URL
+    return [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+
+
+class NoBackendAvailable(RuntimeError):
+    """No live backend can run the workflow."""
+
+
+class Backend:
+    """One ComfyUI server and what we know about its load."""
+
+    def __init__(self, url: str, client: Optional[ComfyClient] = None):
+        self.url = url.rstrip("/")
+        self.client = client or ComfyClient(self.url, retries=1)
+        self.alive = True
+        self.queue_depth = 0
+        self.vram_free = 0
+        self.vram_total = 0
+        self.loaded: FrozenSet[Tuple[str, str]] = frozenset()
+        self.last_refresh = 0.0
+        self.down_since: Optional[float] = None
+        self.dispatched = 0
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        """Poll /queue and /system_stats; marks the backend down on failure."""
+        try:
+            queue = self.client.get_queue()
+            stats = self.client.get_system_stats()
+        except requests.RequestException:
+            self.mark_down()
+            return
+        self.queue_depth = len(queue.get("queue_running", [])) + len(queue.get("queue_pending", []))
+        devices = stats.get("devices") or [{}]
+        self.vram_free = devices[0].get("vram_free", 0)
+        self.vram_total = devices[0].get("vram_total", 0)
+        self.loaded = self.server_loaded(queue)
+        self.alive = True
+        self.down_since = None
+        self.last_refresh = time.time()
+
+    def server_loaded(self, queue: dict) -> FrozenSet[Tuple[str, str]]:
+        """Models the server holds once its queue drains: the last queued job's, else the last finished one's."""
+        items = queue.get("queue_running", []) + sorted(queue.get("queue_pending", []), key=lambda i: i[0])
+        if not items:
+            try:
+                history = self.client.get_json("/history", params={"max_items": 1})
+            except requests.RequestException:
+                return self.loaded
+            items = [entry["prompt"] for entry in list(history.values())[-1:] if "prompt" in entry]
+        for item in reversed(items):
+            key = model_key(item[2]) if len(item) > 2 and isinstance(item[2], dict) else frozenset()
+            if key:
+                return key
+        return self.loaded
+
+    def mark_down(self):
+        self.alive = False
+        self.down_since = self.down_since or time.time()
+        self.loaded = frozenset()  # a restarted server has nothing loaded
+
+    def supports(self, workflow: dict) -> bool:
+        """All node types exist on this backend and its loaders offer the model files."""
+        try:
+            info = get_object_info(self.client)
+        except requests.RequestException:
+            self.mark_down()
+            return False
+        for node in workflow.values():
+            node_info = info.get(node.get("class_type"))
+            if node_info is None:
+                return False
+            required = node_info.get("input", {}).get("required", {})
+            for input_name in LOADER_INPUTS.get(node["class_type"], {}):
+                choices = required.get(input_name, [None])[0]
+                value = node.get("inputs", {}).get(input_name)
+                if isinstance(choices, list) and isinstance(value, str) and value not in choices:
+                    return False
+        return True
+
+    def score(self, key) -> tuple:
+        """Lower is better: queued work plus a reload penalty, then more free VRAM."""
+        swap = SWAP_PENALTY if key and not key <= self.loaded else 0
+        return (self.queue_depth + swap, -self.vram_free)
+
+    def __repr__(self):
+        state = "up" if self.alive else "down"
+        return f"Backend({self.url}, {state}, queue={self.queue_depth})"
+
+
+class BackendPool:
+    """Dispatch workflows to the least-loaded compatible backend, with failover."""
+
+    def __init__(self, urls=None, refresh_interval: float = REFRESH_INTERVAL,
+                 dead_retry: float = DEAD_RETRY):
+        urls = backend_urls(urls) if urls is None or isinstance(urls, str) else urls
+        self.backends = [Backend(url) for url in urls]
+        self.refresh_interval = refresh_interval
+        self.dead_retry = dead_retry
+        self.failovers = 0
+
+    def refresh(self, force: bool = False):
+        now = time.time()
+        for backend in self.backends:
+            if not backend.alive and now - (backend.down_since or 0) < self.dead_retry and not force:
+                continue
+            if force or now - backend.last_refresh >= self.refresh_interval:
+                backend.refresh()
+
+    def candidates(self, workflow: dict) -> List[Backend]:
+        """Live, compatible backends, best first."""
+        self.refresh()
+        key = model_key(workflow)
+        live = [b for b in self.backends if b.alive and b.supports(workflow)]
+        return sorted(live, key=lambda b: b.score(key))
+
+    def choose(self, workflow: dict) -> Backend:
+        candidates = self.candidates(workflow)
+        if not candidates:
+            raise NoBackendAvailable(f"No live backend can run this workflow ({len(self.backends)} configured)")
+        return candidates[0]
+
+    def dispatch(self, workflow: dict) -> Tuple[Backend, str]:
+        """Queue workflow on the best backend, failing over to the next ones."""
+        key = model_key(workflow)
+        errors = []
+        for backend in self.candidates(workflow):
+            try:
+                prompt_id = backend.client.queue_prompt(workflow)["prompt_id"]
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.lost(backend)
+                errors.append(f"{backend.url}: {e}")
+                continue
+            with backend.lock:
+                backend.queue_depth += 1  # until the next /queue poll
+                backend.dispatched += 1
+                if key:
+                    backend.loaded = key
+            return backend, prompt_id
+        raise NoBackendAvailable("All backends failed: " + "; ".join(errors) if errors
+                                 else "No live backend can run this workflow")
+
+    def run(self, workflow: dict, timeout: float = 600, retries: int = 1) -> Tuple[Backend, dict]:
+        """Dispatch and wait; if the backend dies mid-job, resubmit elsewhere."""
+        for attempt in range(retries + 1):
+            backend, prompt_id = self.dispatch(workflow)
+            try:
+                return backend, backend.client.wait_for_prompt(prompt_id, timeout=timeout)
+            except requests.ConnectionError:
+                # wait_for_prompt raises this once the server stops answering its polls
+                self.lost(backend)
+                if attempt == retries:
+                    raise
+        raise AssertionError("unreachable")
+
+    def lost(self, backend: Backend):
+        """A backend dropped a job: take it out of rotation; the job goes elsewhere."""
+        backend.mark_down()
+        self.failovers += 1
+
+    def status(self) -> List[dict]:
+        self.refresh(force=True)
+        return [{
+            "url": b.url,
+            "alive": b.alive,
+            "queue_depth": b.queue_depth,
+            "vram_free_gb": b.vram_free / 1024 ** 3,
+            "vram_total_gb": b.vram_total / 1024 ** 3,
+            "loaded": sorted(f for _, f in b.loaded),
+            "dispatched": b.dispatched,
+        } for b in self.backends]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spread ComfyUI jobs over several backends")
+    parser.add_argument("command", choices=["status", "run"])
+    parser.add_argument("workflows", nargs="*", help="API-format workflow JSON files (run)")
+    parser.add_argument("--backends", default=None,
+                        help="Comma-separated base URLs (default: $COMFYUI_BACKENDS or $COMFYUI_URL)")
+    parser.add_argument("--timeout", type=float, default=600, help="Per-job timeout in seconds")
+    args = parser.parse_args()
+
+    pool = BackendPool(args.backends)
+    if args.command == "status":
+        for s in pool.status():
+            state = "✓" if s["alive"] else "✗"
+            print(f"{state} {s['url']}  queue={s['queue_depth']}  "
+                  f"VRAM free {s['vram_free_gb']:.1f}/{s['vram_total_gb']:.1f} GB")
+        return 0
+
+    def one(path):
+        workflow = json.loads(Path(path).read_text())
+        start = time.time()
+        try:
+            backend, entry = pool.run(workflow, timeout=args.timeout)
+            return f"✓ {path} on {backend.url} ({time.time() - start:.1f}s)"
+        except Exception as e:
+            return f"✗ {path}: {e}"
+
+    with ThreadPoolExecutor(max_workers=max(1, len(pool.backends) * 2)) as executor:
+        for line in executor.map(one, args.workflows):
+            print(line)
+    print(f"\nFailovers: {pool.failovers}")
+    for s in pool.status():
+        print(f"  {s['url']}: {s['dispatched']} jobs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Client throughput benchmarks against the stand-in ComfyUI server
+
+Runs the client paths of comfyui_client, comfyui_async and
+comfyui_outputs against fake_comfyui.FakeComfyUI (started in-process on
+a free port) and measures:
+
+    submit      prompts/s through queue_prompt (sync) and submit (async)
+    detect      completion-detection latency - from the server's
+                execution_success timestamp to the moment the client
+                returns - for the WebSocket, polling and async clients
+    download    MB/s for streamed /view downloads (1 and 4 workers) and
+                for local link retrieval from the output directory
+
+Results can be saved as a named baseline and later runs compared against
+it; a metric that is worse than the baseline by more than --tolerance is
+reported as a regression (exit code 1).
+
+CLI:
+    python bench_clients.py --save before
+    ...change the clients...
+    python bench_clients.py --compare before
+    python bench_clients.py --only detect --jobs 100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from comfyui_async import AsyncComfyClient
+from comfyui_client import POLL_INTERVAL, ComfyClient, finished_at, history_outputs
+from comfyui_outputs import download_file, retrieve_all
+from fake_comfyui import FakeComfyUI
+from node_timing import percentile
+
+BENCH_DIR = Path(os.environ.get("COMFYUI_BENCH_DIR", Path.home() / ".cache" / "comfyui" / "bench")).expanduser()
+BENCHMARKS = ("submit", "detect", "download")
+TOLERANCE = 0.15
+
+
+def bench_workflow(seed: int = 0, prefix: str = "bench") -> dict:
+    """Small Flux-shaped graph; only the seed differs between jobs."""
+    return {
+        "1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "flux1-dev-fp8.safetensors"}},
+        "2": {"class_type": "CLIPTextEncode", "inputs": {"text": "benchmark", "clip": ["1", 1]}},
+        "3": {"class_type": "EmptyLatentImage", "inputs": {"width": 1024, "height": 1024, "batch_size": 1}},
+        "4": {"class_type": "KSampler", "inputs": {"model": ["1", 0], "positive": ["2", 0], "negative": ["2", 0],
+                                                   "latent_image": ["3", 0], "seed": seed, "steps": 4, "cfg": 1.0,
+                                                   "sampler_name": "euler", "scheduler": "simple",
+                                                   "denoise": 1.0}},
+        "5": {"class_type": "VAEDecode", "inputs": {"samples": ["4", 0], "vae": ["1", 2]}},
+        "6": {"class_type": "SaveImage", "inputs": {"images": ["5", 0], "filename_prefix": prefix}},
+    }
+
+
+def metric(value: float, unit: str, better: str = "higher") -> dict:
+    return {"value": value, "unit": unit, "better": better}
+
+
+def latency_metrics(name: str, latencies: List[float]) -> Dict[str, dict]:
+    return {f"{name}_p50_ms": metric(1000 * percentile(latencies, 50), "ms", "lower"),
+            f"{name}_p95_ms": metric(1000 * percentile(latencies, 95), "ms", "lower")}
+
+
+def bench_submit(url: str, jobs: int, concurrency: int) -> Dict[str, dict]:
+    client = ComfyClient(url, record_metrics=False)
+    start = time.perf_counter()
+    for i in range(jobs):
+        client.queue_prompt(bench_workflow(i))
+    sync_rate = jobs / (time.perf_counter() - start)
+    client.close()
+
+    async def run():
+        async with AsyncComfyClient(url, record_metrics=False) as aclient:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one(i):
+                async with semaphore:
+                    await aclient.submit(bench_workflow(jobs + i))
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(jobs)))
+            return jobs / (time.perf_counter() - start)
+
+    return {"submit_sync_per_s": metric(sync_rate, "prompts/s"),
+            "submit_async_per_s": metric(asyncio.run(run()), "prompts/s")}
+
+
+def bench_detect(url: str, jobs: int) -> Dict[str, dict]:
+    """One job in flight at a time, so only the detection path is measured."""
+    client = ComfyClient(url, record_metrics=False)
+    results = {}
+    for mode in ("ws", "poll"):
+        latencies = []
+        # Polling detects after POLL_INTERVAL / 2 on average; fewer jobs keep the run short
+        for i in range(jobs if mode == "ws" else max(3, jobs // 5)):
+            prompt_id = client.queue_prompt(bench_workflow(i))["prompt_id"]
+            if mode == "ws":
+                entry = client.wait_for_prompt(prompt_id, timeout=60)
+            else:
+                entry = client._wait_poll(prompt_id, time.monotonic() + 60, POLL_INTERVAL)
+            latencies.append(time.time() - finished_at(entry))
+        results.update(latency_metrics(f"detect_{mode}", latencies))
+    client.close()
+
+    async def run():
+        latencies = []
+        async with AsyncComfyClient(url, record_metrics=False) as aclient:
+            for i in range(jobs):
+                entry = await aclient.run(bench_workflow(i), timeout=60)
+                latencies.append(time.time() - finished_at(entry))
+        return latencies
+
+    results.update(latency_metrics("detect_async", asyncio.run(run())))
+    return results
+
+
+def bench_download(url: str, output_dir: Path, files: int) -> Dict[str, dict]:
+    client = ComfyClient(url, record_metrics=False)
+    prompt_ids = [client.queue_prompt(bench_workflow(i))["prompt_id"] for i in range(files)]
+    outputs = [f for pid in prompt_ids for f in history_outputs(client.wait_for_prompt(pid, timeout=120))]
+    results = {}
+    with tempfile.TemporaryDirectory(dir=output_dir.parent) as dest:
+        dest = Path(dest)
+        start = time.perf_counter()
+        size = sum(download_file(client, f, dest / f"w1_{f['filename']}")["bytes"] for f in outputs)
+        results["download_1_worker_mb_s"] = metric(size / 2 ** 20 / (time.perf_counter() - start), "MB/s")
+
+        start = time.perf_counter()
+        done = retrieve_all(client, outputs, dests=[dest / f"w4_{f['filename']}" for f in outputs], mode="http")
+        results["download_4_workers_mb_s"] = metric(
+            sum(r["bytes"] for r in done) / 2 ** 20 / (time.perf_counter() - start), "MB/s")
+
+        start = time.perf_counter()
+        done = retrieve_all(client, outputs, dests=[dest / f"ln_{f['filename']}" for f in outputs], mode="auto",
+                            folders={"output": output_dir})
+        results["retrieve_local_mb_s"] = metric(
+            sum(r["bytes"] for r in done) / 2 ** 20 / (time.perf_counter() - start), "MB/s")
+    client.close()
+    return results
+
+
+def run_benchmarks(only=BENCHMARKS, jobs: int = 30, concurrency: int = 8, latency: float = 0.02,
+                   output_mb: float = 32, files: int = 8) -> dict:
+    """Start a stand-in server per benchmark and return {metric: {value, unit, better}}."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        if "submit" in only:
+            server = FakeComfyUI(latency=0.0)
+            try:
+                results.update(bench_submit(server.start_in_thread(), jobs, concurrency))
+            finally:
+                server.stop()
+        if "detect" in only:
+            server = FakeComfyUI(latency=latency)
+            try:
+                results.update(bench_detect(server.start_in_thread(), jobs))
+            finally:
+                server.stop()
+        if "download" in only:
+            output_dir = Path(tmp) / "output"
+            server = FakeComfyUI(latency=0.0, output_bytes=int(output_mb * 2 ** 20), output_dir=output_dir)
+            try:
+                results.update(bench_download(server.start_in_thread(), output_dir, files))
+            finally:
+                server.stop()
+    return results
+
+
+def save_baseline(name: str, results: dict, params: dict) -> Path:
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    path = BENCH_DIR / f"{name}.json"
+    path.write_text(json.dumps({"name": name, "created": time.time(), "host": platform.node(),
+                                "python": platform.python_version(), "params": params,
+                                "results": results}, indent=2))
+    return path
+
+
+def load_baseline(name: str) -> dict:
+    path = Path(name) if name.endswith(".json") else BENCH_DIR / f"{name}.json"
+    return json.loads(path.read_text())
+
+
+def compare(results: dict, baseline: dict, tolerance: float = TOLERANCE) -> List[dict]:
+    """One row per metric; "regression" when worse than the baseline by more than tolerance."""
+    rows = []
+    for name, current in results.items():
+        base = baseline.get("results", {}).get(name)
+        change = None
+        if base and base["value"]:
+            change = (current["value"] - base["value"]) / base["value"]
+        worse = change is not None and (change < -tolerance if current["better"] == "higher" else change > tolerance)
+        rows.append({"metric": name, "value": current["value"], "unit": current["unit"],
+                     "baseline": base["value"] if base else None, "change": change, "regression": worse})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ComfyUI client paths against a stand-in server")
+    parser.add_argument("--only", default=",".join(BENCHMARKS),
+                        help=f"Comma-separated subset of {', '.join(BENCHMARKS)}")
+    parser.add_argument("--jobs", type=int, default=30, help="Prompts per submit/detect measurement")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent async submissions")
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake compute seconds per prompt (detect)")
+    parser.add_argument("--output-mb", type=float, default=32, help="Size of each downloaded output")
+    parser.add_argument("--files", type=int, default=8, help="Outputs downloaded per measurement")
+    parser.add_argument("--save", metavar="NAME", help=f"Save the results as baseline NAME in {BENCH_DIR}")
+    parser.add_argument("--compare", metavar="NAME", help="Compare against baseline NAME (or a .json path)")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="Relative change counted as a regression (default: 0.15)")
+    args = parser.parse_args()
+
+    only = [b.strip() for b in args.only.split(",") if b.strip()]
+    unknown = set(only) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    params = {"jobs": args.jobs, "concurrency": args.concurrency, "latency": args.latency,
+              "output_mb": args.output_mb, "files": args.files}
+    results = run_benchmarks(only, **params)
+
+    baseline = load_baseline(args.compare) if args.compare else {}
+    rows = compare(results, baseline, args.tolerance)
+    print(f"{'metric':<28} {'value':>10} {'unit':<10}" + (f" {'baseline':>10} {'change':>8}" if baseline else ""))
+    for row in rows:
+        line = f"{row['metric']:<28} {row['value']:>10.2f} {row['unit']:<10}"
+        if baseline and row["baseline"] is not None:
+            line += f" {row['baseline']:>10.2f} {100 * row['change']:>+7.1f}%"
+            if row["regression"]:
+                line += "  REGRESSION"
+        print(line)
+
+    if args.save:
+        print(f"\nBaseline saved: {save_baseline(args.save, results, params)}")
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
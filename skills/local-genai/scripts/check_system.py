@@ -8,6 +8,9 @@ import subprocess
 import sys
 from pathlib import Path
 
+from model_index import ModelIndex, format_dtypes, format_params
+from model_staging import StagingCache
+
 def check_comfyui():
     """Check if ComfyUI is installed and running"""
     print("=" * 60)
@@ -48,13 +51,25 @@ def check_models():
         "Qwen-Image": "/mnt/c/models/Qwen/Qwen-Image-2512/model_index.json",
     }
     
+    staging = StagingCache()
+    index = ModelIndex()
     for name, path in model_paths.items():
         p = Path(path)
         if p.exists():
             size = p.stat().st_size / (1024**3)  # GB
-            print(f"✓ {name}: {size:.1f} GB")
+            local = staging.lookup(p)
+            # Parameter count and dtypes from the safetensors headers (diffusers models: the whole folder)
+            try:
+                info = index.info(p if p.suffix == ".safetensors" else p.parent)
+            except (OSError, ValueError):
+                info = None
+            if info:
+                size = info["bytes"] / (1024**3)
+            detail = f", {format_params(info['params'])} params ({format_dtypes(info['dtypes'])})" if info else ""
+            print(f"✓ {name}: {size:.1f} GB{detail}" + (f" (staged: {local})" if local else ""))
         else:
             print(f"✗ {name}: Not found")
+    index.save()
 
 def check_gpu():
     """Check GPU and PyTorch CUDA setup"""
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+asyncio ComfyUI client with one multiplexed WebSocket
+
+Submits many prompts concurrently and tracks all of them over a single
+/ws?clientId=... connection. Events (progress, executing, executed,
+execution_cached, execution_error, ...) are routed by prompt_id to a
+per-prompt PromptJob whose future resolves to the /history entry.
+
+Usage (from another script):
+    import asyncio
+    from comfyui_async import AsyncComfyClient
+
+    async def main(workflows):
+        async with AsyncComfyClient() as client:
+            return await client.run_many(workflows, concurrency=8)
+
+    results = asyncio.run(main(workflows))
+
+CLI (submit API-format workflow files and wait for all of them):
+    python comfyui_async.py job1.json job2.json ... --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+
+from comfyui_client import DEFAULT_URL, HISTORY_SETTLE_DELAYS
+import tracing
+from node_timing import NodeTimer
+
+RECONNECT_DELAYS = (0.5, 1, 2, 5, 10)
+POLL_INTERVAL = 1.0  # /history polling once events can no longer be relied on
+MAX_EARLY_PROMPTS = 256
+
+
+class ExecutionError(RuntimeError):
+    """A prompt failed or was interrupted on the ComfyUI server."""
+
+    def __init__(self, prompt_id: str, data: dict):
+        self.prompt_id = prompt_id
+        self.data = data
+        message = data.get("exception_message") or data.get("exception_type") or "interrupted"
+        node = data.get("node_type") or data.get("node_id")
+        super().__init__(f"{prompt_id}: {message}" + (f" (node {node})" if node else ""))
+
+
+class PromptJob:
+    """State of one submitted prompt, fed by the shared WebSocket reader."""
+
+    def __init__(self, prompt_id: str, loop: asyncio.AbstractEventLoop, workflow: Optional[dict] = None,
+                 submitted_at: Optional[float] = None):
+        self.prompt_id = prompt_id
+        self.future: asyncio.Future = loop.create_future()
+        self.submitted_at = submitted_at or time.time()
+        self.timer = NodeTimer(prompt_id, workflow, self.submitted_at)
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.current_node: Optional[str] = None
+        self.progress = (0, 0)
+        self.outputs: Dict[str, dict] = {}
+        self.cached_nodes: List[str] = []
+
+    @property
+    def done(self) -> bool:
+        return self.future.done()
+
+    def __await__(self):
+        return self.future.__await__()
+
+
+class AsyncComfyClient:
+    """Async ComfyUI client: pooled aiohttp session + one WebSocket for all jobs."""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        client_id: Optional[str] = None,
+        timeout: float = 30,
+        max_connections: int = 8,
+        on_event: Optional[Callable[[PromptJob, str, dict], None]] = None,
+        record_metrics: bool = True,
+    ):
+        self.base_url = (base_url or DEFAULT_URL).rstrip("/")
+        self.client_id = client_id or str(uuid.uuid4())
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_connections = max_connections
+        self.on_event = on_event
+        self.record_metrics = record_metrics
+        self.jobs: Dict[str, PromptJob] = {}
+        # Events that arrive before POST /prompt has returned the prompt_id
+        self._early: Dict[str, List[tuple]] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def ws_url(self) -> str:
+        scheme, rest = self.base_url.split("://", 1)
+        return f"{'wss' if scheme == 'https' else 'ws'}://{rest}/ws?clientId={self.client_id}"
+
+    # -- connection management ------------------------------------------------
+
+    async def connect(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        self._ws = await self._session.ws_connect(self.ws_url, heartbeat=30)
+        self._reader = asyncio.create_task(self._read_loop())
+        return self
+
+    async def close(self):
+        self._closing = True
+        if self._reader:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+        # Jobs nobody waited for; their pending history lookups then stay quiet
+        for job in self.jobs.values():
+            if not job.done:
+                job.future.cancel()
+        if self._ws is not None:
+            await self._ws.close()
+        if self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # -- HTTP -----------------------------------------------------------------
+
+    async def get_json(self, path: str):
+        async with self._session.get(f"{self.base_url}{path}") as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def get_history(self, prompt_id: str) -> dict:
+        return await self.get_json(f"/history/{prompt_id}")
+
+    async def submit(self, workflow: dict) -> PromptJob:
+        """Queue a workflow and register it for event routing."""
+        payload = {"prompt": workflow, "client_id": self.client_id}
+        submitted_at = time.time()
+        async with self._session.post(f"{self.base_url}/prompt", json=payload) as response:
+            if response.status >= 400:
+                raise RuntimeError(f"POST /prompt failed ({response.status}): {await response.text()}")
+            prompt_id = (await response.json())["prompt_id"]
+        tracing.add("submit", submitted_at, time.time(), tracing.prompt_track(prompt_id), "submit")
+
+        job = PromptJob(prompt_id, asyncio.get_running_loop(), workflow, submitted_at)
+        self.jobs[prompt_id] = job
+        for msg_type, data in self._early.pop(prompt_id, []):
+            self._dispatch(job, msg_type, data)
+        if self._reader is not None and self._reader.done():
+            asyncio.create_task(self._poll_history(job))  # no event stream any more
+        return job
+
+    async def wait(self, job: PromptJob, timeout: Optional[float] = None) -> dict:
+        """Wait for a job and return its /history entry.
+
+        On timeout (or if the caller is cancelled) the job is given up: its
+        future is cancelled and the client stops tracking and polling it.
+        The prompt itself keeps running on the server.
+        """
+        try:
+            return await asyncio.wait_for(job.future, timeout)
+        finally:
+            if job.done:
+                self.jobs.pop(job.prompt_id, None)
+
+    async def run(self, workflow: dict, timeout: Optional[float] = None) -> dict:
+        return await self.wait(await self.submit(workflow), timeout)
+
+    async def run_many(self, workflows: List[dict], concurrency: int = 8,
+                       timeout: Optional[float] = None) -> list:
+        """Run workflows with at most `concurrency` queued at once.
+
+        Returns one entry per workflow: the history dict, or the exception.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(workflow):
+            async with semaphore:
+                return await self.run(workflow, timeout)
+
+        return await asyncio.gather(*(one(w) for w in workflows), return_exceptions=True)
+
+    # -- WebSocket routing ----------------------------------------------------
+
+    async def _read_loop(self):
+        try:
+            await self._read_events()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The reader is gone: without it no event would ever resolve a job
+            print(f"  WebSocket reader failed ({e!r}), polling /history for pending jobs", file=sys.stderr)
+            for job in list(self.jobs.values()):
+                if not job.done:
+                    asyncio.create_task(self._poll_history(job))
+
+    async def _read_events(self):
+        attempt = 0
+        while not self._closing:
+            try:
+                async for msg in self._ws:
+                    attempt = 0
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        try:
+                            self._route(json.loads(msg.data))
+                        except Exception as e:
+                            # One bad frame or failing on_event callback must not stop the reader
+                            print(f"  Ignoring WebSocket message ({e!r}): {str(msg.data)[:200]}", file=sys.stderr)
+                    elif msg.type == aiohttp.WSMsgType.ERROR:
+                        break
+                    # BINARY frames are latent previews - ignored
+            except aiohttp.ClientError:
+                pass
+            if self._closing:
+                return
+
+            # Connection dropped: reconnect, then reconcile jobs that may have
+            # finished while we were not listening.
+            delay = RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)]
+            attempt += 1
+            await asyncio.sleep(delay)
+            try:
+                self._ws = await self._session.ws_connect(self.ws_url, heartbeat=30)
+            except aiohttp.ClientError:
+                continue
+            for job in list(self.jobs.values()):
+                if not job.done:
+                    asyncio.create_task(self._check_history(job))
+
+    def _route(self, message: dict):
+        msg_type = message.get("type")
+        data = message.get("data") or {}
+        prompt_id = data.get("prompt_id")
+        if not prompt_id:
+            return  # status broadcasts, crystools etc.
+        job = self.jobs.get(prompt_id)
+        if job is None:
+            if len(self._early) >= MAX_EARLY_PROMPTS and prompt_id not in self._early:
+                self._early.pop(next(iter(self._early)))
+            self._early.setdefault(prompt_id, []).append((msg_type, data))
+            return
+        self._dispatch(job, msg_type, data)
+
+    def _dispatch(self, job: PromptJob, msg_type: str, data: dict):
+        if job.done:
+            return
+        now = time.time()
+        job.timer.feed(msg_type, data, now)
+
+        if msg_type == "execution_start":
+            job.started_at = now
+        elif msg_type == "execution_cached":
+            job.cached_nodes.extend(data.get("nodes") or [])
+        elif msg_type == "executing":
+            job.current_node = data.get("node")
+            if job.started_at is None:
+                job.started_at = now
+        elif msg_type == "progress":
+            job.progress = (data.get("value", 0), data.get("max", 0))
+        elif msg_type == "executed":
+            job.outputs[str(data.get("node"))] = data.get("output") or {}
+
+        if self.on_event:
+            self.on_event(job, msg_type, data)
+
+        if msg_type in ("execution_error", "execution_interrupted"):
+            job.finished_at = now
+            self._write_metrics(job)
+            job.future.set_exception(ExecutionError(job.prompt_id, data))
+        elif msg_type == "execution_success" or (msg_type == "executing" and data.get("node") is None):
+            if job.finished_at is None:
+                job.finished_at = now
+                self._write_metrics(job)
+                asyncio.create_task(self._check_history(job, settle=True))
+
+    def _write_metrics(self, job: PromptJob):
+        if self.record_metrics:
+            job.timer.write()
+        tracing.add_timer(job.timer)
+
+    async def _check_history(self, job: PromptJob, settle: bool = False) -> bool:
+        """Resolve a job from /history (authoritative outputs and status). Returns True once resolved.
+
+        ComfyUI announces completion slightly before it writes the history
+        entry, so with settle=True the lookup is retried for a few seconds;
+        if the entry still is not there, the job is polled until it is, as
+        no further event will arrive for it.
+        """
+        delays = HISTORY_SETTLE_DELAYS if settle else ()
+        for delay in (0,) + delays:
+            await asyncio.sleep(delay)
+            if job.done:
+                return True
+            try:
+                history = await self.get_history(job.prompt_id)
+            except Exception as e:
+                if not job.done:
+                    job.future.set_exception(e)
+                return True
+            entry = history.get(job.prompt_id)
+            if entry is not None:
+                break
+        if job.done:
+            return True
+        if entry is None:
+            if settle:
+                await self._poll_history(job)
+                return True
+            return False  # still queued/running - keep waiting for events
+        status = entry.get("status", {})
+        if status.get("status_str") == "error":
+            errors = [m[1] for m in status.get("messages", [])
+                      if isinstance(m, list) and len(m) > 1 and m[0] == "execution_error"]
+            job.future.set_exception(ExecutionError(job.prompt_id, errors[0] if errors else {}))
+        else:
+            job.future.set_result(entry)
+        return True
+
+    async def _poll_history(self, job: PromptJob):
+        """Resolve a job by polling /history, for when its events cannot be relied on."""
+        while not job.done and not self._closing:
+            if await self._check_history(job):
+                return
+            await asyncio.sleep(POLL_INTERVAL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run API-format ComfyUI workflows concurrently")
+    parser.add_argument("workflows", nargs="+", help="API-format workflow JSON files")
+    parser.add_argument("--concurrency", "-c", type=int, default=8, help="Max prompts queued at once")
+    parser.add_argument("--timeout", type=float, default=None, help="Per-job timeout in seconds")
+    parser.add_argument("--comfyui-url", default=None,
+                        help="ComfyUI base URL (default: $COMFYUI_URL or http://127.0.0.1:8188)")
+    args = parser.parse_args()
+
+    workflows = [json.loads(Path(p).read_text()) for p in args.workflows]
+
+    def on_event(job, msg_type, data):
+        if msg_type == "progress":
+            value, max_val = job.progress
+            print(f"  {job.prompt_id[:8]} {value}/{max_val}", end="\r", flush=True)
+
+    async def run():
+        async with AsyncComfyClient(args.comfyui_url, on_event=on_event) as client:
+            return await client.run_many(workflows, args.concurrency, args.timeout)
+
+    start = time.time()
+    results = asyncio.run(run())
+    failed = 0
+    for path, result in zip(args.workflows, results):
+        if isinstance(result, BaseException):
+            failed += 1
+            print(f"✗ {path}: {result}")
+        else:
+            files = [img["filename"] for out in result.get("outputs", {}).values()
+                     for img in out.get("images", [])]
+            print(f"✓ {path}: {files}")
+    print(f"\n{len(results) - failed}/{len(results)} done in {time.time() - start:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Shared ComfyUI HTTP client
+
+One keep-alive requests.Session (connection pool) per ComfyUI base URL,
+with timeouts and retry/backoff. All generation scripts import this module
+instead of making bare requests.get/post calls, so a poll loop or a batch
+run reuses a handful of TCP connections instead of opening one per call.
+
+The base URL defaults to $COMFYUI_URL (or http://127.0.0.1:8188).
+
+wait_for_prompt() is notified over the WebSocket when a job finishes, so
+turnaround is set by the GPU rather than a poll interval. Polling
+/history is only used as a degraded fallback (websocket-client missing or
+the socket fails). While it listens, the per-node timing of the prompt is
+appended to the node_timing metrics file and, when a trace is active,
+added to it (see tracing.py).
+
+Usage (from another script):
+    from comfyui_client import get_client
+
+    client = get_client()
+    prompt_id = client.queue_prompt(workflow)["prompt_id"]
+    entry = client.wait_for_prompt(prompt_id)  # /history entry
+
+Scripts outside skills/local-genai/scripts add this directory to sys.path
+before importing (see skills/qwen-image/scripts/generate_qwen.py).
+"""
+
+import json
+import os
+import time
+import urllib.parse
+import uuid
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable, List
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import tracing
+from node_timing import NodeTimer
+
+try:
+    import websocket  # websocket-client
+except ImportError:
+    websocket = None
+
+DEFAULT_URL = os.environ.get("COMFYUI_URL", "http://127.0.0.1:8188")
+DEFAULT_TIMEOUT = (5, 30)  # (connect, read) seconds
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5  # 0.5s, 1s, 2s, ...
+DEFAULT_POOL_SIZE = 8
+POLL_INTERVAL = 2.0  # seconds, polling fallback only
+MAX_POLL_FAILURES = 3  # consecutive unreachable polls (each already retried) before giving up
+HISTORY_SETTLE_DELAYS = (0.02, 0.05, 0.1, 0.25, 0.5, 1, 2)
+OUTPUT_KINDS = ("images", "gifs", "videos", "audio")
+MAX_TRACKED_PROMPTS = 256
+
+
+class ComfyClient:
+    """Pooled HTTP client for one ComfyUI server."""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        timeout=DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        record_metrics: bool = True,
+        client_id: Optional[str] = None,
+    ):
+        self.base_url = (base_url or DEFAULT_URL).rstrip("/")
+        self.timeout = timeout
+        # ComfyUI sends a prompt's events only to the client_id that queued it
+        self.client_id = client_id or str(uuid.uuid4())
+        self.record_metrics = record_metrics
+        # prompt_id -> (workflow, submit time), for node class names and queue wait
+        self._submitted: Dict[str, tuple] = {}
+
+        # GETs are retried on connection/read errors and 502/503/504.
+        # POST /prompt is only retried when the connection could not be
+        # established, so a job is never queued twice.
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            max_retries=retry,
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @property
+    def ws_url(self) -> str:
+        """WebSocket endpoint for this server and client_id."""
+        parts = urllib.parse.urlsplit(self.base_url)
+        scheme = "wss" if parts.scheme == "https" else "ws"
+        return f"{scheme}://{parts.netloc}/ws?clientId={self.client_id}"
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Send a request through the pooled session and raise on HTTP errors."""
+        kwargs.setdefault("timeout", self.timeout)
+        response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+        response.raise_for_status()
+        return response
+
+    def get_json(self, path: str, **kwargs) -> Any:
+        return self.request("GET", path, **kwargs).json()
+
+    def queue_prompt(self, prompt: dict, client_id: Optional[str] = None, prompt_id: Optional[str] = None) -> dict:
+        """Send prompt to ComfyUI queue. Returns {"prompt_id": ..., "number": ...}.
+
+        prompt_id asks the server to use that id (ComfyUI versions that do
+        not support it assign their own; check the returned one).
+        """
+        payload = {"prompt": prompt, "client_id": client_id or self.client_id}
+        if prompt_id:
+            payload["prompt_id"] = prompt_id
+        submitted_at = time.time()
+        result = self.request("POST", "/prompt", json=payload).json()
+        if "prompt_id" in result:
+            tracing.add("submit", submitted_at, time.time(), tracing.prompt_track(result["prompt_id"]), "submit")
+            if len(self._submitted) >= MAX_TRACKED_PROMPTS:
+                self._submitted.pop(next(iter(self._submitted)))
+            self._submitted[result["prompt_id"]] = (prompt, submitted_at)
+        return result
+
+    def get_history(self, prompt_id: Optional[str] = None) -> dict:
+        """Get execution history for one prompt (or the whole history)."""
+        path = f"/history/{prompt_id}" if prompt_id else "/history"
+        return self.get_json(path)
+
+    def get_queue(self) -> dict:
+        """Get running and pending queue entries."""
+        return self.get_json("/queue")
+
+    def get_system_stats(self, timeout=None) -> dict:
+        return self.get_json("/system_stats", timeout=timeout or self.timeout)
+
+    def get_object_info(self, node_class: Optional[str] = None) -> dict:
+        path = f"/object_info/{node_class}" if node_class else "/object_info"
+        return self.get_json(path)
+
+    def get_models(self, folder: str = "checkpoints") -> list:
+        """List model files in a ComfyUI model folder."""
+        return self.get_json(f"/models/{folder}")
+
+    def upload_image(self, data: bytes, filename: str, subfolder: str = "", overwrite: bool = True) -> dict:
+        """Upload an input image (e.g. the first frame for I2V) and return {"name", "subfolder", "type"}.
+
+        A LoadImage node refers to it as "subfolder/name", or just name.
+        """
+        files = {"image": (filename, data, "application/octet-stream")}
+        form = {"subfolder": subfolder, "type": "input", "overwrite": "true" if overwrite else "false"}
+        return self.request("POST", "/upload/image", files=files, data=form).json()
+
+    def view(self, filename: str, subfolder: str = "", folder_type: str = "output",
+             stream: bool = False) -> requests.Response:
+        """GET /view for a generated file."""
+        params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
+        return self.request("GET", "/view", params=params, stream=stream)
+
+    def get_file(self, filename: str, subfolder: str = "", folder_type: str = "output") -> bytes:
+        """Download a generated file into memory."""
+        return self.view(filename, subfolder, folder_type).content
+
+    def wait_for_prompt(
+        self,
+        prompt_id: str,
+        timeout: float = 600,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        poll_interval: float = POLL_INTERVAL,
+        use_websocket: bool = True,
+    ) -> dict:
+        """Block until prompt_id has finished and return its /history entry.
+
+        The entry is returned for failed jobs too; check
+        entry["status"]["status_str"]. Raises TimeoutError after `timeout`,
+        and requests.ConnectionError when the server stops answering.
+        use_websocket=False polls /history only - for prompts queued under a
+        client_id this client does not have.
+        """
+        deadline = time.monotonic() + timeout
+        if websocket is not None and use_websocket:
+            try:
+                return self._wait_ws(prompt_id, deadline, on_progress)
+            except websocket.WebSocketTimeoutException:
+                raise TimeoutError(f"Prompt {prompt_id} not finished after {timeout}s")
+            except (OSError, websocket.WebSocketException) as e:
+                print(f"  WebSocket unavailable ({e}), falling back to polling")
+        return self._wait_poll(prompt_id, deadline, poll_interval)
+
+    def _wait_ws(self, prompt_id: str, deadline: float, on_progress) -> dict:
+        ws = websocket.create_connection(self.ws_url, timeout=max(deadline - time.monotonic(), 0.1))
+        try:
+            # The job may have finished before the socket was open
+            entry = self.get_history(prompt_id).get(prompt_id)
+            if entry is not None:
+                return entry
+
+            timer = NodeTimer(prompt_id, *self._submitted.pop(prompt_id, (None, None)))
+            while True:
+                ws.settimeout(max(deadline - time.monotonic(), 0.01))
+                msg = ws.recv()
+                if not isinstance(msg, str):
+                    continue  # binary latent previews
+                message = json.loads(msg)
+                msg_type = message.get("type")
+                data = message.get("data") or {}
+                if data.get("prompt_id") != prompt_id:
+                    continue
+
+                timer.feed(msg_type, data)
+                if msg_type == "progress" and on_progress:
+                    on_progress(data.get("value", 0), data.get("max", 0))
+                elif msg_type in ("execution_success", "execution_error", "execution_interrupted") or \
+                        (msg_type == "executing" and data.get("node") is None):
+                    if self.record_metrics:
+                        timer.write()
+                    tracing.add_timer(timer)
+                    return self._settled_history(prompt_id, deadline)
+        finally:
+            ws.close()
+
+    def _settled_history(self, prompt_id: str, deadline: float) -> dict:
+        """History entry right after completion.
+
+        ComfyUI announces completion slightly before it stores the history
+        entry, so retry briefly instead of falling back to the poll interval.
+        """
+        for delay in (0,) + HISTORY_SETTLE_DELAYS:
+            time.sleep(delay)
+            entry = self.get_history(prompt_id).get(prompt_id)
+            if entry is not None:
+                return entry
+        return self._wait_poll(prompt_id, deadline, POLL_INTERVAL)
+
+    def _wait_poll(self, prompt_id: str, deadline: float, poll_interval: float) -> dict:
+        failures = 0
+        while time.monotonic() < deadline:
+            try:
+                entry = self.get_history(prompt_id).get(prompt_id)
+                failures = 0
+                if entry is not None:
+                    return entry  # history is only written once a job is done
+            except requests.ConnectionError:
+                # A stopped server is not a slow job: give up instead of waiting out the timeout
+                failures += 1
+                if failures >= MAX_POLL_FAILURES:
+                    raise
+            except requests.RequestException:
+                pass
+            time.sleep(min(poll_interval, max(deadline - time.monotonic(), 0)))
+        raise TimeoutError(f"Prompt {prompt_id} not finished before deadline")
+
+    def is_alive(self, timeout: float = 5) -> bool:
+        """True if the server answers /system_stats."""
+        try:
+            self.get_system_stats(timeout=timeout)
+            return True
+        except requests.RequestException:
+            return False
+
+    def close(self):
+        self.session.close()
+
+
+def history_outputs(entry: dict, kinds=OUTPUT_KINDS) -> List[dict]:
+    """List the files a job produced, from the "outputs" of its /history entry.
+
+    Each item has filename, subfolder, type ("output"/"temp") and node (the
+    id of the node that saved it), in node order.
+    """
+    files = []
+    for node_id, node_output in entry.get("outputs", {}).items():
+        for kind in kinds:
+            for item in node_output.get(kind, []):
+                if "filename" in item:
+                    files.append({
+                        "filename": item["filename"],
+                        "subfolder": item.get("subfolder", ""),
+                        "type": item.get("type", "output"),
+                        "node": node_id,
+                    })
+    return files
+
+
+def find_output_files(entry: dict, output_dir, kinds=("images",)) -> List[Path]:
+    """Paths under ComfyUI's output directory of the files a job saved, from its /history entry."""
+    return [Path(output_dir) / f["subfolder"] / f["filename"]
+            for f in history_outputs(entry, kinds) if f["type"] == "output"]
+
+
+def execution_seconds(entry: dict) -> Optional[float]:
+    """Server-side run time of a job (execution_start to its final message), without queue wait."""
+    stamps = {}
+    for message in entry.get("status", {}).get("messages", []):
+        if isinstance(message, list) and len(message) > 1 and "timestamp" in message[1]:
+            stamps[message[0]] = message[1]["timestamp"]
+    end = stamps.get("execution_success") or stamps.get("execution_error")
+    if "execution_start" not in stamps or end is None:
+        return None
+    return (end - stamps["execution_start"]) / 1000.0
+
+
+def finished_at(entry: dict) -> Optional[float]:
+    """Server time (epoch seconds) at which a job finished, from its history status messages."""
+    for message in entry.get("status", {}).get("messages", []):
+        if isinstance(message, list) and len(message) > 1 and \
+                message[0] in ("execution_success", "execution_error", "execution_interrupted"):
+            return message[1].get("timestamp", 0) / 1000.0
+    return None
+
+
+def numbered_paths(path, count: int) -> List[Path]:
+    """Destination paths for count outputs: path itself, or name_1.ext, name_2.ext, ..."""
+    path = Path(path)
+    if count == 1:
+        return [path]
+    return [path.with_name(f"{path.stem}_{i}{path.suffix}") for i in range(1, count + 1)]
+
+
+_clients: Dict[str, ComfyClient] = {}
+
+
+def get_client(base_url: Optional[str] = None, **kwargs) -> ComfyClient:
+    """Return the process-wide client for base_url, creating it on first use."""
+    key = (base_url or DEFAULT_URL).rstrip("/")
+    if key not in _clients:
+        _clients[key] = ComfyClient(key, **kwargs)
+    return _clients[key]
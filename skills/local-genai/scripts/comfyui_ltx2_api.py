@@ -13,7 +13,6 @@ Usage:
 """
 
 import json
-import requests
 import argparse
 import os
 import sys
@@ -21,78 +20,55 @@ import time
 from pathlib import Path
 from typing import Optional, Dict, Any
 import websocket
-import uuid
-import urllib.request
-import urllib.parse
 
-# ComfyUI API Endpoints
-COMFYUI_URL = "http://127.0.0.1:8188"
-WS_URL = "ws://127.0.0.1:8188/ws"
+from comfyui_client import execution_seconds, get_client, history_outputs, numbered_paths
+from comfyui_outputs import retrieve_all, format_throughput, RETRIEVE_MODES
+from job_store import JobStore
+from ltx_planner import PIPELINES, plan, record_timing, snap, valid_frames
+from node_timing import NodeTimer
+from result_cache import ResultCache
+from seed_sweep import LTX2_GB_PER_MP_FRAME, fit_batch_size, format_sweep, is_seed_range, parse_seeds, run_sweep
+import tracing
+from workflow_templates import WorkflowTemplate, WorkflowValidationError, register, validate_for
+
+# ComfyUI API Endpoints (override with $COMFYUI_URL or --comfyui-url)
+client = get_client()
+COMFYUI_URL = client.base_url
 
 def queue_prompt(prompt: dict, client_id: str = None) -> dict:
     """Send prompt to ComfyUI queue."""
-    client_id = client_id or str(uuid.uuid4())
-    payload = {"prompt": prompt, "client_id": client_id}
-    
-    response = requests.post(
-        f"{COMFYUI_URL}/prompt",
-        json=payload,
-        headers={"Content-Type": "application/json"}
-    )
-    response.raise_for_status()
-    return response.json()
+    return client.queue_prompt(prompt, client_id)
 
 def get_history(prompt_id: str) -> dict:
     """Get execution history for a prompt."""
-    response = requests.get(f"{COMFYUI_URL}/history/{prompt_id}")
-    response.raise_for_status()
-    return response.json()
+    return client.get_history(prompt_id)
 
 def get_image(filename: str, subfolder: str = "", folder_type: str = "output") -> bytes:
-    """Download a generated file from ComfyUI."""
-    params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
-    url = f"{COMFYUI_URL}/view?{urllib.parse.urlencode(params)}"
-    
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.content
+    """Download a generated file from ComfyUI into memory.
+
+    Fine for small images; large videos go through comfyui_outputs.download_all,
+    which streams to disk.
+    """
+    return client.get_file(filename, subfolder, folder_type)
 
 def get_available_models(model_type: str = "checkpoints") -> list:
     """Get list of available models."""
-    response = requests.get(f"{COMFYUI_URL}/models/{model_type}")
-    response.raise_for_status()
-    return response.json()
+    return client.get_models(model_type)
 
-def load_ltx2_workflow(
-    prompt: str,
-    width: int = 704,
-    height: int = 384,
-    num_frames: int = 25,
-    frame_rate: float = 25.0,
-    seed: int = 42,
-    steps: int = 20,
-    checkpoint: str = "ltx-2-19b-dev-fp8.safetensors"
-) -> dict:
-    """
-    Load and configure LTX-2 workflow.
-    
-    Based on ComfyUI's video_ltx2_t2v_distilled.json template,
-    but simplified for single-stage generation (no spatial upsampling).
-    """
-    
-    # Base workflow structure for LTX-2
-    # This creates a simplified single-stage workflow
-    workflow = {
+# Base workflow structure for LTX-2 (single stage, see load_ltx2_workflow)
+LTX2_TEMPLATE = register(WorkflowTemplate(
+    "ltx2_t2v",
+    {
         "1": {
             "inputs": {
-                "ckpt_name": checkpoint
+                "ckpt_name": "ltx-2-19b-dev-fp8.safetensors"
             },
             "class_type": "CheckpointLoaderSimple",
             "_meta": {"title": "Load Checkpoint"}
         },
         "2": {
             "inputs": {
-                "text": prompt,
+                "text": "",
                 "clip": ["1", 1]
             },
             "class_type": "CLIPTextEncode",
@@ -108,9 +84,9 @@ def load_ltx2_workflow(
         },
         "4": {
             "inputs": {
-                "width": width,
-                "height": height,
-                "length": num_frames,
+                "width": 704,
+                "height": 384,
+                "length": 25,
                 "batch_size": 1
             },
             "class_type": "EmptyLTXVLatentVideo",
@@ -118,7 +94,7 @@ def load_ltx2_workflow(
         },
         "5": {
             "inputs": {
-                "seed": seed,
+                "seed": 42,
                 "control_after_generate": "fixed",
                 "noise": ["4", 0]
             },
@@ -155,7 +131,7 @@ def load_ltx2_workflow(
         "9": {
             "inputs": {
                 "scheduler": "normal",
-                "steps": steps,
+                "steps": 20,
                 "denoise": 1.0
             },
             "class_type": "BasicScheduler",
@@ -183,43 +159,96 @@ def load_ltx2_workflow(
         "12": {
             "inputs": {
                 "filename_prefix": "LTX-2/API",
-                "fps": frame_rate,
+                "fps": 25.0,
                 "compress_level": 4,
                 "images": ["11", 0]
             },
             "class_type": "SaveAnimatedWEBP",
             "_meta": {"title": "Save Animated WEBP"}
         }
-    }
+    },
+    slots={
+        "prompt": [("2", "text")],
+        "width": [("4", "width")],
+        "height": [("4", "height")],
+        "num_frames": [("4", "length")],
+        "seed": [("5", "seed")],
+        "steps": [("9", "steps")],
+        "frame_rate": [("12", "fps")],
+        "checkpoint": [("1", "ckpt_name")],
+    },
+))
+
+def load_ltx2_workflow(
+    prompt: str,
+    width: int = 704,
+    height: int = 384,
+    num_frames: int = 25,
+    frame_rate: float = 25.0,
+    seed: int = 42,
+    steps: int = 20,
+    checkpoint: str = "ltx-2-19b-dev-fp8.safetensors"
+) -> dict:
+    """
+    Render the compiled LTX-2 workflow template.
     
-    return workflow
+    Based on ComfyUI's video_ltx2_t2v_distilled.json template,
+    but simplified for single-stage generation (no spatial upsampling).
+    """
+    return LTX2_TEMPLATE.render(
+        prompt=prompt, width=width, height=height, num_frames=num_frames,
+        frame_rate=frame_rate, seed=seed, steps=steps, checkpoint=checkpoint
+    )
 
-def track_progress(ws_url: str, prompt_id: str):
-    """Track generation progress via WebSocket."""
+def track_progress(ws_url: str, prompt_id: str, workflow: Optional[dict] = None,
+                   submitted_at: Optional[float] = None):
+    """Track generation progress via WebSocket.
+
+    Only messages for prompt_id are considered, so other jobs running on
+    the same server cannot end tracking early. For many concurrent jobs use
+    comfyui_async.AsyncComfyClient (one socket for all prompts). Per-node
+    timings are appended to the node_timing metrics file.
+    """
     print(f"Connecting to WebSocket for progress tracking...")
     
     ws = websocket.create_connection(ws_url)
     
     try:
+        # The job may already be done if it finished before we connected
+        if prompt_id in get_history(prompt_id):
+            print("✓ Execution complete!")
+            return True
+        
+        timer = NodeTimer(prompt_id, workflow, submitted_at)
         while True:
             msg = ws.recv()
             if isinstance(msg, str):
                 data = json.loads(msg)
                 msg_type = data.get("type")
+                msg_data = data.get("data", {})
+                
+                if msg_data.get("prompt_id") != prompt_id:
+                    continue
+                
+                timer.feed(msg_type, msg_data)
                 
                 if msg_type == "progress":
-                    value = data.get("data", {}).get("value", 0)
-                    max_val = data.get("data", {}).get("max", 100)
+                    value = msg_data.get("value", 0)
+                    max_val = msg_data.get("max", 100)
                     print(f"\rProgress: {value}/{max_val} ({100*value/max_val:.1f}%)", end="", flush=True)
                 
                 elif msg_type == "executing":
-                    node = data.get("data", {}).get("node")
+                    node = msg_data.get("node")
                     if node is None:
                         print("\n✓ Execution complete!")
+                        timer.write()
+                        tracing.add_timer(timer)
                         break
                 
                 elif msg_type == "execution_error":
                     print(f"\n✗ Execution error: {data}")
+                    timer.write()
+                    tracing.add_timer(timer)
                     return False
                     
     except websocket.WebSocketException as e:
@@ -258,18 +287,50 @@ def main():
     parser.add_argument("--seed", type=int, default=42, help="Random seed")
     parser.add_argument("--checkpoint", default="ltx-2-19b-dev-fp8.safetensors",
                        help="Checkpoint filename")
+    parser.add_argument("--deadline", type=float, default=None,
+                       help="Time budget in minutes: pick width/height/steps from measured timings")
+    parser.add_argument("--seeds", help="Seed sweep, e.g. 1-8 (one video per sample in batched jobs)")
+    parser.add_argument("--batch-size", type=int, default=0,
+                       help="Samples per job for a --seeds range (default: as many as fit in free VRAM)")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Always render, bypassing the local result cache")
+    parser.add_argument("--comfyui-url", default=None,
+                       help="ComfyUI base URL (default: $COMFYUI_URL or http://127.0.0.1:8188)")
+    parser.add_argument("--retrieve", choices=RETRIEVE_MODES, default="auto",
+                       help="auto: hardlink/reflink from the local ComfyUI output dir, else HTTP; "
+                            "move: rename instead of link; http: always download")
+    parser.add_argument("--download-workers", type=int, default=4,
+                       help="Parallel downloads for jobs with several outputs")
+    parser.add_argument("--trace", action="store_true",
+                       help="Write a Chrome trace of this run (also: $COMFYUI_TRACE=1)")
     
     args = parser.parse_args()
+    tracing.start_if_enabled("comfyui_ltx2_api", args.trace)
+    
+    global client, COMFYUI_URL
+    if args.comfyui_url:
+        client = get_client(args.comfyui_url)
+        COMFYUI_URL = client.base_url
     
     # Check ComfyUI is running
-    try:
-        requests.get(f"{COMFYUI_URL}/system_stats", timeout=5)
-    except requests.ConnectionError:
+    if not client.is_alive():
         print(f"✗ ComfyUI nicht erreichbar unter {COMFYUI_URL}")
         print("Bitte starte ComfyUI zuerst:")
         print("  cd ~/ComfyUI && source venv/bin/activate && python main.py --listen 127.0.0.1 --port 8188")
         sys.exit(1)
     
+    pipeline = "distilled" if "distilled" in args.checkpoint else "comfyui"
+    # LTX-2 needs 8*K+1 frames and sizes divisible by 32
+    args.frames = valid_frames(args.frames)
+    args.width = snap(args.width, PIPELINES[pipeline]["multiple"])
+    args.height = snap(args.height, PIPELINES[pipeline]["multiple"])
+    if args.deadline:
+        preset = plan(args.deadline * 60, frames=args.frames, fps=args.fps, pipelines=[pipeline])
+        args.width, args.height, args.steps = preset["width"], preset["height"], preset["steps"]
+        fits = "passt" if preset["fits"] else "passt NICHT, schnellste Option"
+        print(f"⏱️  Budget {args.deadline:.0f} min → {args.width}x{args.height}, {args.steps} Steps "
+              f"(erwartet {preset['predicted_seconds'] / 60:.1f} min, {fits}; {preset['model']})")
+    
     print("=" * 60)
     print("🎬 ComfyUI LTX-2 API Client")
     print("=" * 60)
@@ -281,22 +342,71 @@ def main():
     
     # Load and configure workflow
     print("\n📋 Lade Workflow...")
-    workflow = load_ltx2_workflow(
-        prompt=args.prompt,
-        width=args.width,
-        height=args.height,
-        num_frames=args.frames,
-        frame_rate=args.fps,
-        seed=args.seed,
-        steps=args.steps,
-        checkpoint=args.checkpoint
-    )
+    with tracing.span("build workflow", cat="build"):
+        workflow = load_ltx2_workflow(
+            prompt=args.prompt,
+            width=args.width,
+            height=args.height,
+            num_frames=args.frames,
+            frame_rate=args.fps,
+            seed=args.seed,
+            steps=args.steps,
+            checkpoint=args.checkpoint
+        )
+    
+    # Seed sweep: batched latents, split back into one video per sample
+    if args.seeds:
+        seeds = parse_seeds(args.seeds)
+        if args.batch_size > 1 and not is_seed_range(seeds):
+            parser.error("only a --seeds range (e.g. 1-8) can be batched; a seed list needs --batch-size 1")
+        batch = args.batch_size or (fit_batch_size(client, workflow, args.width, args.height, args.frames,
+                                                   gb_per_mp=LTX2_GB_PER_MP_FRAME) if is_seed_range(seeds) else 1)
+        batch = min(batch, len(seeds))
+        out = Path(args.output).expanduser()
+        print(f"\n🎲 Seed-Sweep: {len(seeds)} Samples, Batch-Größe {batch}")
+        start = time.time()
+        results = run_sweep(
+            client,
+            lambda seed: load_ltx2_workflow(args.prompt, args.width, args.height, args.frames, args.fps,
+                                            seed, args.steps, args.checkpoint),
+            seeds, batch, dest_dir=out.parent, stem=out.stem, retrieve=args.retrieve,
+            metadata={"model": args.checkpoint, "prompt": args.prompt, "width": args.width,
+                      "height": args.height, "frames": args.frames, "fps": args.fps, "steps": args.steps},
+        )
+        for r in results:
+            print(f"✓ Seed {r['seed']} #{r['batch_index']}: {', '.join(str(p) for p in r['paths'])}")
+        print(format_sweep(results, time.time() - start))
+        return
+    
+    # Same workflow (incl. seed) rendered before? Serve it from the cache
+    cache = None if args.no_cache else ResultCache()
+    with tracing.span("cache lookup", cat="cache"):
+        cached = cache.get(workflow) if cache else None
+    if cached:
+        print("\n⚡ Cache-Treffer - keine GPU-Zeit verbraucht")
+        with tracing.span("cache restore", cat="io"):
+            for path in cache.restore(cached, numbered_paths(args.output, len(cached))):
+                print(f"✓ Gespeichert: {path}")
+        return
+    
+    # Validate locally against the cached /object_info schema
+    try:
+        with tracing.span("validate", cat="build"):
+            validate_for(client, workflow, LTX2_TEMPLATE)
+    except WorkflowValidationError as e:
+        print("✗ Ungültiger Workflow:")
+        for error in e.errors:
+            print(f"  {error}")
+        sys.exit(1)
     
     # Queue the prompt
     print("🚀 Starte Generation...")
+    gen_start = time.time()
     try:
-        result = queue_prompt(workflow)
-        prompt_id = result["prompt_id"]
+        submitted_at = time.time()
+        # Recorded before it is queued, so `job_store.py resume` can re-attach after a crash
+        jobs = JobStore()
+        prompt_id = jobs.submit(client, workflow, name=args.output)
         print(f"Prompt ID: {prompt_id}")
     except Exception as e:
         print(f"✗ Fehler beim Queue: {e}")
@@ -305,7 +415,7 @@ def main():
     # Track progress
     print("\n⏳ Warte auf Fertigstellung...")
     try:
-        success = track_progress(WS_URL, prompt_id)
+        success = track_progress(client.ws_url, prompt_id, workflow, submitted_at)
         if not success:
             print("Fehler während der Ausführung!")
             sys.exit(1)
@@ -324,36 +434,37 @@ def main():
     if prompt_id not in history:
         print("✗ Prompt nicht in History gefunden")
         sys.exit(1)
+    jobs.record_result(prompt_id, history[prompt_id])
     
-    outputs = history[prompt_id].get("outputs", {})
+    # Feed the planner's cost model (server-side run time, without queue wait)
+    seconds = execution_seconds(history[prompt_id])
+    if seconds and history[prompt_id].get("status", {}).get("status_str") != "error":
+        record_timing(pipeline, args.width, args.height, args.frames, args.steps, seconds, prompt_id=prompt_id)
     
     # Find saved files
-    saved_files = []
-    for node_id, node_output in outputs.items():
-        if "images" in node_output:
-            for image in node_output["images"]:
-                saved_files.append(image["filename"])
+    saved_files = history_outputs(history[prompt_id])
     
     if not saved_files:
         print("✗ Keine Dateien generiert")
         sys.exit(1)
     
-    print(f"\n✓ Generiert: {saved_files}")
+    print(f"\n✓ Generiert: {[f['filename'] for f in saved_files]}")
     
-    # Download the file
-    latest_file = saved_files[-1]
-    print(f"\n⬇️  Lade {latest_file} herunter...")
+    # Fetch all outputs (zero-copy when ComfyUI is local, else streamed over HTTP)
+    output_paths = numbered_paths(args.output, len(saved_files))
+    print(f"\n⬇️  Lade {len(saved_files)} Datei(en) herunter...")
     
     try:
-        file_data = get_image(latest_file)
-        output_path = Path(args.output)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(output_path, "wb") as f:
-            f.write(file_data)
-        
-        print(f"✓ Gespeichert: {output_path}")
-        print(f"  Größe: {len(file_data) / 1024 / 1024:.1f} MB")
+        start = time.perf_counter()
+        results = retrieve_all(client, saved_files, dests=output_paths, mode=args.retrieve,
+                               workers=args.download_workers)
+        for r in results:
+            print(f"✓ Gespeichert: {r['path']} ({r['method']})")
+            print(f"  Größe: {r['bytes'] / 1024 / 1024:.1f} MB")
+        print(f"  {format_throughput(results, time.perf_counter() - start)}")
+        if cache:
+            with tracing.span("cache store", cat="io"):
+                cache.put(workflow, [r["path"] for r in results], gpu_seconds=time.time() - gen_start)
         
     except Exception as e:
         print(f"✗ Download-Fehler: {e}")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+One image job from submit to delivered files, shared by the generate scripts
+
+generate_image.py (Flux) and generate_qwen.py (Qwen-Image) only differ in
+how they build the workflow. Everything after that lives here:
+
+    restore_hit()         a result-cache hit copied to --output (per variant
+                          for merged prompts)
+    run_with_failover()   submit and wait, moving the job to the next
+                          backend when the chosen one is down or dies
+    collect_outputs()     the job's files in variant order, copied to
+                          --output with per-variant names and sidecars
+    cache_outputs()       store the files in the result cache (fetching
+                          them over HTTP when they only exist remotely)
+
+Usage (from another script):
+    from comfyui_run import cache_outputs, collect_outputs, restore_hit, run_with_failover
+
+    entry = run_with_failover(workflow, submit, wait, backends=args.backends, on_backend=use_client)
+    paths, files = collect_outputs(client, entry, output=args.output, prompts=prompts, node_maps=node_maps)
+    cache_outputs(cache, workflow, client, paths, files, gpu_seconds=time.time() - start)
+"""
+
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import requests
+
+from backend_pool import BackendPool
+from comfyui_client import history_outputs, numbered_paths
+from comfyui_outputs import FOLDERS, retrieve_all
+from graph_merge import variant_outputs, variant_paths, write_variant_sidecars
+import tracing
+
+FAILOVER_RETRIES = 1  # with backends: resubmissions after the chosen backend dies
+
+
+def restore_hit(cache, cached: List[Path], output, prompts: Optional[List[str]] = None) -> List[Path]:
+    """Copy cached files to output; with several prompts, as name_v<i> plus sidecars."""
+    with tracing.span("cache restore", cat="io"):
+        # Merged variants are cached in variant order, the same number of files each
+        counts = [len(cached) // len(prompts)] * len(prompts) if prompts and len(prompts) > 1 else None
+        if counts and sum(counts) == len(cached):
+            restored = cache.restore(cached, variant_paths(output, counts))
+            write_variant_sidecars(restored, counts, prompts)
+            return restored
+        return cache.restore(cached, numbered_paths(output, len(cached)))
+
+
+def run_with_failover(workflow: dict, submit: Callable[[dict], str], wait: Callable[[str], Optional[dict]],
+                      backends=None, retries: int = FAILOVER_RETRIES,
+                      on_backend: Optional[Callable] = None) -> Optional[dict]:
+    """Submit workflow and wait for it. Returns the /history entry, or None if the job failed.
+
+    submit(workflow) -> prompt_id and wait(prompt_id) -> entry are the
+    script's own (validation, progress output). With backends, both must
+    let requests.ConnectionError through: a backend that refuses the
+    submit or stops answering mid-job is marked down and the job goes to
+    the next one. on_backend(client) is called with the chosen backend's
+    client before each attempt. Raises NoBackendAvailable when none is left.
+    """
+    if not backends:
+        return wait(submit(workflow))
+    pool = BackendPool(backends)
+    for attempt in range(1 + retries):
+        backend = pool.choose(workflow)
+        if on_backend:
+            on_backend(backend.client)
+        print(f"Backend: {backend.url}")
+        try:
+            return wait(submit(workflow))
+        except requests.exceptions.ConnectionError as e:
+            print(f"\nLost connection to {backend.url}: {e}")
+            pool.lost(backend)
+    return None
+
+
+def collect_outputs(client, entry: dict, output=None, retrieve: str = "auto", prompts: Optional[List[str]] = None,
+                    node_maps=None, output_dir=FOLDERS["output"], verbose: bool = True) -> Tuple[List[Path], List[dict]]:
+    """The job's images: (paths, history files), copied to output when given.
+
+    For a merged job (node_maps from graph_merge), files are kept in
+    variant order and output becomes name_v0.ext, name_v1.ext, ... with a
+    JSON sidecar naming each file's prompt. Paths are under output_dir
+    when there is no output (they may not exist locally on a remote backend).
+    verbose prints each file; batch runs report one line per job themselves.
+    """
+    say = print if verbose else (lambda *args, **kwargs: None)
+    output_dir = Path(output_dir)
+    if node_maps:
+        files, counts = variant_outputs(entry, node_maps, kinds=("images",))
+        start = 0
+        for index, (prompt, count) in enumerate(zip(prompts, counts)):
+            names = ", ".join(f["filename"] for f in files[start:start + count])
+            say(f"Variant {index} ({prompt[:60]}): {names}")
+            start += count
+    else:
+        files = history_outputs(entry, kinds=("images",))
+    paths = [output_dir / f["subfolder"] / f["filename"] for f in files]
+    for path in paths:
+        say(f"\nOutput: {path}")
+    if output and files:
+        dests = variant_paths(output, counts) if node_maps else numbered_paths(output, len(files))
+        results = retrieve_all(client, files, dests=dests, mode=retrieve)
+        for r in results:
+            say(f"Copied to: {r['path']} ({r['method']})")
+        paths = [r["path"] for r in results]
+        if node_maps:
+            write_variant_sidecars(paths, counts, prompts)
+    return paths, files
+
+
+def cache_outputs(cache, workflow: dict, client, paths, files: List[dict], gpu_seconds: float = 0.0):
+    """Store a job's outputs in the result cache, from disk when they are local, else over HTTP."""
+    if not cache or not files:
+        return
+    with tracing.span("cache store", cat="io"):
+        if all(Path(p).is_file() for p in paths):
+            cache.put(workflow, paths, gpu_seconds=gpu_seconds)
+        else:  # remote backend and no output path: the images exist only on the server
+            cache.put_remote(workflow, client, files, gpu_seconds=gpu_seconds)
@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+"""
+Stand-in ComfyUI server for profiling the client paths without a GPU
+
+Implements the parts of the ComfyUI API the scripts use - POST /prompt,
+/history, /queue, /view, /system_stats, /object_info, /upload/image and
+the /ws event stream - on aiohttp. Prompts run one at a time like on the real server:
+nodes are executed in dependency order with "executing", "progress",
+"executed", "execution_cached" and "execution_success" events, and the
+result lands in /history with the same shape (status messages with
+timestamps, outputs per save node).
+
+What a "GPU" job costs is configurable:
+    latency        seconds of compute per prompt (80% in the sampler)
+    step_seconds   extra sampler seconds per step and batch item
+    load_seconds   seconds per loader node that is not cached, i.e. the
+                   model swap penalty when the weights change
+    output_bytes   size of every image /view serves (videos: video_bytes)
+Nodes whose inputs are unchanged since the previous prompt are reported
+as cached, like ComfyUI's own cache, so repeated jobs skip their loaders.
+
+Failure injection: fail_rate (execution_error), http_error_rate (503 on
+GET, exercises the client retries) and ws_drop_rate (the socket is
+closed mid-job, exercises reconnects and the polling fallback).
+
+Usage (from another script or a benchmark):
+    from fake_comfyui import FakeComfyUI
+
+    server = FakeComfyUI(latency=0.5, output_bytes=4 << 20)
+    url = server.start_in_thread()      # http://127.0.0.1:<free port>
+    ...
+    server.stop()
+
+CLI:
+    python fake_comfyui.py --port 8188 --latency 2 --load-seconds 20 --fail-rate 0.05
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+from aiohttp import web
+
+from job_scheduler import LOADER_INPUTS, model_key
+
+CHUNK_SIZE = 1024 * 1024
+VRAM_TOTAL = 32 * 1024 ** 3
+MAX_HISTORY = 10000
+SAMPLERS = ("KSampler", "KSamplerAdvanced", "SamplerCustom", "SamplerCustomAdvanced")
+LATENTS = ("EmptyLatentImage", "EmptySD3LatentImage", "EmptyLTXVLatentVideo")
+# Output node -> (history key, file extension, is video)
+SAVE_NODES = {
+    "SaveImage": ("images", ".png", False),
+    "PreviewImage": ("images", ".png", False),
+    "SaveAnimatedWEBP": ("images", ".webp", True),
+    "SaveVideo": ("images", ".mp4", True),
+}
+# Node classes the generation scripts use; inputs are not described, so
+# validation only checks that the class exists.
+NODE_CLASSES = (
+    "CheckpointLoaderSimple", "UNETLoader", "CLIPLoader", "DualCLIPLoader", "VAELoader", "LoraLoader",
+    "LoraLoaderModelOnly", "LTXVGemmaCLIPModelLoader", "CLIPTextEncode", "ModelSamplingAuraFlow",
+    "EmptyLatentImage", "EmptySD3LatentImage", "EmptyLTXVLatentVideo", "LTXVConditioning", "LTXVImgToVideo",
+    "LoadImage", "RandomNoise", "CFGGuider", "KSamplerSelect", "BasicScheduler", "KSampler",
+    "KSamplerAdvanced", "SamplerCustom", "SamplerCustomAdvanced", "VAEDecode", "VAEDecodeTiled",
+    "ImageFromBatch", "SaveImage", "PreviewImage", "SaveAnimatedWEBP", "SaveVideo",
+)
+
+
+def fake_object_info(classes=NODE_CLASSES) -> dict:
+    return {name: {"input": {"required": {}}, "output": ["*"] * 4, "output_node": name in SAVE_NODES,
+                   "name": name, "display_name": name, "category": "fake"} for name in classes}
+
+
+def _is_link(value) -> bool:
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[1], int)
+
+
+def execution_order(workflow: dict) -> List[str]:
+    """Node ids in dependency order (inputs before the nodes using them)."""
+    order, seen = [], set()
+
+    def visit(node_id):
+        if node_id in seen or node_id not in workflow:
+            return
+        seen.add(node_id)
+        for value in workflow[node_id].get("inputs", {}).values():
+            if _is_link(value):
+                visit(str(value[0]))
+        order.append(node_id)
+
+    for node_id in workflow:
+        visit(node_id)
+    return order
+
+
+def node_signatures(workflow: dict) -> Dict[str, str]:
+    """Cache key per node: its class and inputs, with links replaced by the source's key."""
+    signatures: Dict[str, str] = {}
+    for node_id in execution_order(workflow):
+        node = workflow[node_id]
+        inputs = {k: (signatures.get(str(v[0])), v[1]) if _is_link(v) else v
+                  for k, v in node.get("inputs", {}).items()}
+        raw = json.dumps([node.get("class_type"), inputs], sort_keys=True, default=str)
+        signatures[node_id] = hashlib.sha1(raw.encode()).hexdigest()
+    return signatures
+
+
+def workflow_steps(workflow: dict) -> int:
+    steps = [v for node in workflow.values() for k, v in node.get("inputs", {}).items()
+             if k == "steps" and isinstance(v, int)]
+    return max(steps, default=20)
+
+
+def workflow_batch(workflow: dict) -> int:
+    sizes = [node["inputs"].get("batch_size", 1) for node in workflow.values()
+             if node.get("class_type") in LATENTS and isinstance(node.get("inputs", {}).get("batch_size", 1), int)]
+    return max(sizes, default=1)
+
+
+class FakeComfyUI:
+    """aiohttp app that behaves like a single-GPU ComfyUI server."""
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        step_seconds: float = 0.0,
+        load_seconds: Union[float, Callable[[str, str], float]] = 0.0,
+        output_bytes: int = 256 * 1024,
+        video_bytes: Optional[int] = None,
+        fail_rate: float = 0.0,
+        http_error_rate: float = 0.0,
+        ws_drop_rate: float = 0.0,
+        duration: Optional[Callable[[dict], float]] = None,
+        output_dir=None,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.step_seconds = step_seconds
+        self.load_seconds = load_seconds
+        self.output_bytes = output_bytes
+        self.video_bytes = video_bytes if video_bytes is not None else 4 * output_bytes
+        self.fail_rate = fail_rate
+        self.http_error_rate = http_error_rate
+        self.ws_drop_rate = ws_drop_rate
+        self.duration = duration
+        self.output_dir = Path(output_dir).expanduser() if output_dir else None
+        self.random = random.Random(seed)
+
+        self.history: "OrderedDict[str, dict]" = OrderedDict()
+        self.pending: List[tuple] = []  # (number, prompt_id, workflow, client_id)
+        self.running: Optional[tuple] = None
+        self.files: Dict[str, int] = {}  # filename -> size
+        self.uploads: Dict[str, int] = {}  # input image name -> size
+        self.sockets: Dict[str, web.WebSocketResponse] = {}
+        self.stats = {"prompts": 0, "failed": 0, "cached_nodes": 0, "swaps": 0, "busy_seconds": 0.0,
+                      "load_seconds": 0.0, "started": time.time()}
+        self._cache: set = set()
+        self._loaded: Optional[frozenset] = None
+        self._number = 0
+        self._counter = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._block = b"\0" * CHUNK_SIZE
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # --- HTTP ---------------------------------------------------------------
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._inject_errors], client_max_size=64 * 1024 * 1024)
+        app.add_routes([
+            web.post("/prompt", self.post_prompt),
+            web.get("/prompt", self.get_prompt),
+            web.get("/history", self.get_history),
+            web.get("/history/{prompt_id}", self.get_history),
+            web.get("/queue", self.get_queue),
+            web.get("/view", self.view),
+            web.get("/system_stats", self.system_stats),
+            web.get("/object_info", self.object_info),
+            web.get("/object_info/{node_class}", self.object_info),
+            web.get("/models/{folder}", self.models),
+            web.get("/ws", self.websocket),
+            web.post("/upload/image", self.upload_image),
+            web.get("/fake/stats", self.fake_stats),
+        ])
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    @web.middleware
+    async def _inject_errors(self, request, handler):
+        if request.method == "GET" and request.path != "/ws" and self.random.random() < self.http_error_rate:
+            return web.json_response({"error": "injected failure"}, status=503)
+        return await handler(request)
+
+    async def post_prompt(self, request):
+        body = await request.json()
+        workflow = body.get("prompt")
+        if not isinstance(workflow, dict) or not workflow:
+            return web.json_response({"error": {"type": "invalid_prompt", "message": "no prompt"},
+                                      "node_errors": {}}, status=400)
+        unknown = {k: v.get("class_type") for k, v in workflow.items() if v.get("class_type") not in NODE_CLASSES}
+        if unknown:
+            return web.json_response({"error": {"type": "invalid_prompt",
+                                                "message": f"unknown node types {sorted(set(unknown.values()))}"},
+                                      "node_errors": {}}, status=400)
+        prompt_id = body.get("prompt_id") or str(uuid.uuid4())
+        self._number += 1
+        self.pending.append((self._number, prompt_id, workflow, body.get("client_id")))
+        self._wakeup.set()
+        await self._broadcast_status()
+        return web.json_response({"prompt_id": prompt_id, "number": self._number, "node_errors": {}})
+
+    async def get_prompt(self, request):
+        return web.json_response({"exec_info": {"queue_remaining": self._queue_remaining()}})
+
+    async def get_history(self, request):
+        prompt_id = request.match_info.get("prompt_id")
+        if prompt_id:
+            entry = self.history.get(prompt_id)
+            return web.json_response({prompt_id: entry} if entry else {})
+        max_items = int(request.query.get("max_items", 0))
+        items = list(self.history.items())
+        return web.json_response(dict(items[-max_items:] if max_items else items))
+
+    async def get_queue(self, request):
+        def item(job):
+            number, prompt_id, workflow, client_id = job
+            outputs = [k for k, v in workflow.items() if v.get("class_type") in SAVE_NODES]
+            return [number, prompt_id, workflow, {"client_id": client_id}, outputs]
+        return web.json_response({"queue_running": [item(self.running)] if self.running else [],
+                                  "queue_pending": [item(job) for job in self.pending]})
+
+    async def view(self, request):
+        filename = request.query.get("filename", "")
+        if filename not in self.files:
+            return web.Response(status=404)
+        if self.output_dir:
+            return web.FileResponse(self.output_dir / request.query.get("subfolder", "") / filename)
+        size = self.files[filename]
+        response = web.StreamResponse(headers={"Content-Type": "application/octet-stream",
+                                               "Content-Length": str(size)})
+        await response.prepare(request)
+        sent = 0
+        while sent < size:
+            chunk = self._block[:min(CHUNK_SIZE, size - sent)]
+            await response.write(chunk)
+            sent += len(chunk)
+        await response.write_eof()
+        return response
+
+    async def system_stats(self, request):
+        used = 0 if self._loaded is None else VRAM_TOTAL // 2
+        return web.json_response({
+            "system": {"os": "fake", "comfyui_version": "fake", "python_version": "", "embedded_python": False},
+            "devices": [{"name": "cuda:0 Fake GPU", "type": "cuda", "index": 0,
+                         "vram_total": VRAM_TOTAL, "vram_free": VRAM_TOTAL - used,
+                         "torch_vram_total": VRAM_TOTAL, "torch_vram_free": VRAM_TOTAL - used}],
+        })
+
+    async def object_info(self, request):
+        info = fake_object_info()
+        node_class = request.match_info.get("node_class")
+        if node_class:
+            return web.json_response({node_class: info[node_class]} if node_class in info else {})
+        return web.json_response(info)
+
+    async def upload_image(self, request):
+        form = await request.post()
+        image = form.get("image")
+        if image is None or not hasattr(image, "file"):
+            return web.Response(status=400, text="no image")
+        subfolder = form.get("subfolder", "")
+        name = image.filename
+
+        def key(name):  # how LoadImage refers to it
+            return f"{subfolder}/{name}" if subfolder else name
+
+        if form.get("overwrite", "false") not in ("true", "1"):
+            base, dot, ext = image.filename.rpartition(".")
+            counter = 1
+            while key(name) in self.uploads:
+                name = f"{base} ({counter}).{ext}" if dot else f"{image.filename} ({counter})"
+                counter += 1
+        self.uploads[key(name)] = len(image.file.read())
+        return web.json_response({"name": name, "subfolder": subfolder, "type": form.get("type", "input")})
+
+    async def models(self, request):
+        return web.json_response([])
+
+    async def fake_stats(self, request):
+        return web.json_response(self.summary())
+
+    async def websocket(self, request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        client_id = request.query.get("clientId") or uuid.uuid4().hex
+        self.sockets[client_id] = ws  # like ComfyUI: the newest socket of a client_id wins
+        await ws.send_json({"type": "status", "data": {"status": {"exec_info": {
+            "queue_remaining": self._queue_remaining()}}, "sid": client_id}})
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            if self.sockets.get(client_id) is ws:
+                del self.sockets[client_id]
+        return ws
+
+    # --- execution ----------------------------------------------------------
+
+    def _queue_remaining(self) -> int:
+        return len(self.pending) + (1 if self.running else 0)
+
+    async def _send(self, client_id, msg_type: str, data: dict):
+        ws = self.sockets.get(client_id)
+        if ws is None or ws.closed:
+            return
+        try:
+            await ws.send_json({"type": msg_type, "data": data})
+        except (ConnectionError, RuntimeError):
+            self.sockets.pop(client_id, None)
+
+    async def _broadcast_status(self):
+        for client_id in list(self.sockets):
+            await self._send(client_id, "status", {"status": {"exec_info": {
+                "queue_remaining": self._queue_remaining()}}})
+
+    def _compute_seconds(self, workflow: dict) -> float:
+        if self.duration:
+            return self.duration(workflow)
+        return self.latency + self.step_seconds * workflow_steps(workflow) * workflow_batch(workflow)
+
+    def _load_cost(self, node: dict) -> float:
+        if callable(self.load_seconds):
+            return sum(self.load_seconds(folder, node["inputs"].get(name, ""))
+                       for name, folder in LOADER_INPUTS.get(node["class_type"], {}).items())
+        return self.load_seconds
+
+    def _node_seconds(self, workflow: dict, order: List[str], compute: float) -> Dict[str, float]:
+        samplers = [n for n in order if workflow[n].get("class_type") in SAMPLERS]
+        others = [n for n in order if n not in samplers and "Loader" not in workflow[n].get("class_type", "")]
+        seconds = {}
+        for node_id in order:
+            class_type = workflow[node_id].get("class_type", "")
+            if "Loader" in class_type:
+                seconds[node_id] = self._load_cost(workflow[node_id])
+            elif node_id in samplers:
+                seconds[node_id] = compute * (0.8 if others else 1.0) / len(samplers)
+            else:
+                seconds[node_id] = compute * (0.2 if samplers else 1.0) / len(others)
+        return seconds
+
+    def _outputs(self, workflow: dict, node_id: str) -> dict:
+        key, ext, video = SAVE_NODES[workflow[node_id]["class_type"]]
+        prefix = str(workflow[node_id].get("inputs", {}).get("filename_prefix", "ComfyUI"))
+        folder_type = "temp" if workflow[node_id]["class_type"] == "PreviewImage" else "output"
+        size = self.video_bytes if video else self.output_bytes
+        items = []
+        for _ in range(1 if video else workflow_batch(workflow)):
+            self._counter += 1
+            filename = f"{Path(prefix).name}_{self._counter:05d}_{ext}"
+            self.files[filename] = size
+            if self.output_dir:
+                self.output_dir.mkdir(parents=True, exist_ok=True)
+                with open(self.output_dir / filename, "wb") as f:
+                    f.truncate(size)
+            items.append({"filename": filename, "subfolder": "", "type": folder_type})
+        output = {key: items}
+        if video:
+            output["animated"] = [True]
+        return output
+
+    async def _execute(self, number: int, prompt_id: str, workflow: dict, client_id):
+        def stamp():
+            return int(time.time() * 1000)
+
+        messages = []
+
+        async def event(msg_type, data, record=False):
+            data = dict(data, prompt_id=prompt_id)
+            if record:
+                data["timestamp"] = stamp()
+                messages.append([msg_type, data])
+            await self._send(client_id, msg_type, data)
+
+        started = time.time()
+        order = execution_order(workflow)
+        signatures = node_signatures(workflow)
+        cached = [n for n in order if signatures[n] in self._cache]
+        run = [n for n in order if n not in cached]
+        seconds = self._node_seconds(workflow, run, self._compute_seconds(workflow))
+        fail_at = self.random.choice(run) if run and self.random.random() < self.fail_rate else None
+        drop_at = self.random.choice(run) if run and self.random.random() < self.ws_drop_rate else None
+
+        await event("execution_start", {}, record=True)
+        await event("execution_cached", {"nodes": cached}, record=True)
+        models = model_key(workflow)
+        if models and self._loaded is not None and models != self._loaded:
+            self.stats["swaps"] += 1
+        outputs, error = {}, None
+        for node_id in run:
+            class_type = workflow[node_id].get("class_type", "")
+            await event("executing", {"node": node_id, "display_node": node_id})
+            if node_id == drop_at and client_id in self.sockets:
+                await self.sockets.pop(client_id).close()
+            if class_type in SAMPLERS:
+                steps = min(workflow_steps(workflow), 50)
+                for step in range(1, steps + 1):
+                    await asyncio.sleep(seconds[node_id] / steps)
+                    await event("progress", {"value": step, "max": steps, "node": node_id})
+            else:
+                await asyncio.sleep(seconds[node_id])
+            if "Loader" in class_type:
+                self.stats["load_seconds"] += seconds[node_id]
+            message = "injected failure" if node_id == fail_at else None
+            image = workflow[node_id].get("inputs", {}).get("image")
+            if class_type == "LoadImage" and image not in self.uploads:
+                message = f"Invalid image file: {image}"
+            if message:
+                error = {"node_id": node_id, "node_type": class_type, "executed": list(outputs),
+                         "exception_message": message, "exception_type": "RuntimeError",
+                         "traceback": [], "current_inputs": {}, "current_outputs": {}}
+                await event("execution_error", error, record=True)
+                break
+            if class_type in SAVE_NODES:
+                outputs[node_id] = self._outputs(workflow, node_id)
+                await event("executed", {"node": node_id, "display_node": node_id, "output": outputs[node_id]})
+
+        if error is None:
+            self._cache = set(signatures.values())
+            self._loaded = models or self._loaded
+            # ComfyUI stores the history entry just after announcing completion
+            messages.append(["execution_success", {"prompt_id": prompt_id, "timestamp": stamp()}])
+        else:
+            self._cache = set()
+            self.stats["failed"] += 1
+        self.stats["prompts"] += 1
+        self.stats["cached_nodes"] += len(cached)
+        self.stats["busy_seconds"] += time.time() - started
+        self.history[prompt_id] = {
+            "prompt": [number, prompt_id, workflow, {"client_id": client_id}, list(outputs)],
+            "outputs": outputs,
+            "status": {"status_str": "error" if error else "success", "completed": error is None,
+                       "messages": messages},
+            "meta": {k: {"node_id": k, "display_node": k} for k in outputs},
+        }
+        while len(self.history) > MAX_HISTORY:
+            self.history.popitem(last=False)
+        if error is None:
+            await self._send(client_id, "execution_success", messages[-1][1])
+        await event("executing", {"node": None})
+
+    async def _work(self):
+        while True:
+            if not self.pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            self.running = self.pending.pop(0)
+            try:
+                await self._execute(*self.running)
+            finally:
+                self.running = None
+            await self._broadcast_status()
+
+    async def _on_startup(self, app):
+        self._wakeup = asyncio.Event()
+        self._worker = asyncio.create_task(self._work())
+
+    async def _on_cleanup(self, app):
+        self._worker.cancel()
+        for ws in list(self.sockets.values()):
+            await ws.close()
+
+    def summary(self) -> dict:
+        elapsed = time.time() - self.stats["started"]
+        return dict(self.stats, elapsed=elapsed,
+                    idle_fraction=max(0.0, 1 - self.stats["busy_seconds"] / elapsed) if elapsed else 0.0)
+
+    # --- running ------------------------------------------------------------
+
+    def start_in_thread(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve from a background thread; returns the base URL (port 0 = any free port)."""
+        ready = threading.Event()
+        result = {}
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._runner = web.AppRunner(self.app(), access_log=None)
+            self._loop.run_until_complete(self._runner.setup())
+            site = web.TCPSite(self._runner, host, port)
+            self._loop.run_until_complete(site.start())
+            result["port"] = self._runner.addresses[0][1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, name="fake-comfyui", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return f"http://{host}:{result['port']}"
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+        self._loop = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in ComfyUI server (no GPU)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--latency", type=float, default=0.2, help="Compute seconds per prompt")
+    parser.add_argument("--step-seconds", type=float, default=0.0, help="Extra seconds per sampler step")
+    parser.add_argument("--load-seconds", type=float, default=0.0, help="Seconds per uncached loader node")
+    parser.add_argument("--output-mb", type=float, default=0.25, help="Size of every image output")
+    parser.add_argument("--video-mb", type=float, default=None, help="Size of every video output")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of prompts that error")
+    parser.add_argument("--http-error-rate", type=float, default=0.0, help="Fraction of GETs answered 503")
+    parser.add_argument("--ws-drop-rate", type=float, default=0.0, help="Chance per prompt of a dropped socket")
+    parser.add_argument("--output-dir", help="Also write outputs here (to test local link retrieval)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeComfyUI(
+        latency=args.latency,
+        step_seconds=args.step_seconds,
+        load_seconds=args.load_seconds,
+        output_bytes=int(args.output_mb * 1024 * 1024),
+        video_bytes=int(args.video_mb * 1024 * 1024) if args.video_mb is not None else None,
+        fail_rate=args.fail_rate,
+        http_error_rate=args.http_error_rate,
+        ws_drop_rate=args.ws_drop_rate,
+        output_dir=args.output_dir,
+        seed=args.seed,
+    )
+    print(f"Fake ComfyUI on http://{args.host}:{args.port} (latency {args.latency}s)")
+    web.run_app(server.app(), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
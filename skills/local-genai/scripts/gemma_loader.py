@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Gemma text-encoder loading for the LTX-2 scripts
+
+ltx_pipelines builds the Gemma encoder in a way that can leave weights on
+the meta device, so ltx2_generate_video_fixed.py replaces the builder
+with AutoModelForCausalLM.from_pretrained(..., low_cpu_mem_usage=False).
+That works, but materialises the whole 12B model in host RAM (randomly
+initialised first, then overwritten) before moving it to the GPU, which
+doubles peak memory and slows startup. Two modes:
+
+    eager   the existing fix, unchanged
+    mmap    build the model skeleton directly on the target device
+            without running weight init (real tensors, so rotary
+            buffers and tied weights exist - no meta tensors), then
+            copy every tensor from the memory-mapped safetensors shards
+            straight into it, one at a time. Host RAM only holds the
+            pages of the tensor being copied.
+
+If mmap cannot account for every parameter (checkpoint names that do not
+match the model), it falls back to eager and says so.
+
+Both modes log the load time and peak RSS (and peak CUDA memory), and
+append them to a log so the two can be compared on real runs. The CLI
+loads the encoder in a fresh process per mode - peak RSS is per process.
+
+Usage (from another script):
+    from gemma_loader import load_text_encoder
+
+    model = load_text_encoder(gemma_root, device="cuda", dtype=torch.bfloat16, mode="mmap")
+
+CLI:
+    python gemma_loader.py compare --gemma-root /mnt/c/models/gemma-for-ltxv
+    python gemma_loader.py load --mode mmap
+    python gemma_loader.py history
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ("eager", "mmap")
+DEFAULT_GEMMA_ROOT = "/mnt/c/models/gemma-for-ltxv"
+LOADS_PATH = Path(os.environ.get("GEMMA_LOAD_LOG",
+                                 Path.home() / ".cache" / "comfyui" / "text_encoder_loads.jsonl")).expanduser()
+
+
+def reset_peak_rss():
+    """Start a new peak-RSS window (Linux: writing 5 to clear_refs resets VmHWM)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass  # not Linux or not permitted; the peak then covers the whole process
+
+
+def peak_rss_bytes() -> int:
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def load_eager(root, device, dtype):
+    """The loading fix of ltx2_generate_video_fixed.py: full from_pretrained, weights materialised."""
+    from transformers import AutoModelForCausalLM
+
+    model = AutoModelForCausalLM.from_pretrained(
+        root,
+        torch_dtype=dtype,
+        device_map=device if device != "meta" else None,
+        low_cpu_mem_usage=False,  # Ensure weights are fully loaded
+    )
+    if device != "meta" and hasattr(model, "device") and str(model.device) != str(device):
+        model = model.to(device)
+    return model
+
+
+def _match(name: str, targets: dict) -> Optional[str]:
+    """Model state_dict key for a checkpoint tensor name (tolerates a model./language_model. prefix)."""
+    if name in targets:
+        return name
+    for prefix in ("model.", "language_model.", "model.language_model."):
+        if prefix + name in targets:
+            return prefix + name
+        if name.startswith(prefix) and name[len(prefix):] in targets:
+            return name[len(prefix):]
+    return None
+
+
+def load_mmap(root, device, dtype):
+    """Skeleton on the target device, then tensors copied from memory-mapped shards.
+
+    Returns None when the shards do not cover the model's parameters.
+    """
+    import torch
+    from safetensors import safe_open
+    from transformers import AutoConfig, AutoModelForCausalLM
+    from transformers.modeling_utils import no_init_weights
+
+    shards = sorted(Path(root).rglob("*.safetensors"))
+    if not shards:
+        return None
+    config = AutoConfig.from_pretrained(root)
+    with torch.device(device), no_init_weights():
+        model = AutoModelForCausalLM.from_config(config, torch_dtype=dtype)
+    targets = model.state_dict()  # includes tied aliases; tensors share the parameters' storage
+    loaded = set()
+    with torch.no_grad():
+        for shard in shards:
+            with safe_open(str(shard), framework="pt", device="cpu") as f:
+                for name in f.keys():
+                    key = _match(name, targets)
+                    if key is None or list(targets[key].shape) != f.get_slice(name).get_shape():
+                        continue
+                    # mmap-backed CPU tensor; its pages are dropped once copied
+                    targets[key].copy_(f.get_tensor(name))
+                    loaded.add(targets[key].data_ptr())
+    model.tie_weights()
+    missing = [name for name, param in model.named_parameters() if param.data_ptr() not in loaded]
+    if missing:
+        logger.warning(f"mmap load: {len(missing)} parameters not in the shards (e.g. {missing[0]})")
+        return None
+    return model.eval()
+
+
+def load_text_encoder(root, device="cuda", dtype=None, mode: str = "eager", record: bool = True):
+    """Load the Gemma encoder with the given mode, logging time and peak memory."""
+    import torch
+
+    if mode not in MODES:
+        raise ValueError(f"Unknown text encoder load mode {mode!r}, expected one of {MODES}")
+    dtype = dtype or torch.bfloat16
+    cuda = str(device).startswith("cuda") and torch.cuda.is_available()
+    if cuda:
+        torch.cuda.reset_peak_memory_stats(device)
+    reset_peak_rss()
+    start = time.time()
+
+    model, used = None, mode
+    if mode == "mmap" and device != "meta":
+        model = load_mmap(root, device, dtype)
+        if model is None:
+            logger.warning("mmap load not possible for these weights; falling back to eager loading")
+    if model is None:
+        used = "eager"
+        model = load_eager(root, device, dtype)
+
+    seconds = time.time() - start
+    stats = {"mode": used, "requested": mode, "seconds": round(seconds, 2), "peak_rss": peak_rss_bytes(),
+             "peak_cuda": torch.cuda.max_memory_allocated(device) if cuda else 0,
+             "root": str(root), "device": str(device), "dtype": str(dtype), "time": time.time()}
+    logger.info(f"Text encoder loaded ({used}) in {seconds:.1f}s, peak RSS {stats['peak_rss'] / 1024 ** 3:.1f} GB"
+                + (f", peak CUDA {stats['peak_cuda'] / 1024 ** 3:.1f} GB" if cuda else ""))
+    if record:
+        LOADS_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(LOADS_PATH, "a") as f:
+            f.write(json.dumps(stats) + "\n")
+    return model
+
+
+def load_history(path=None) -> list:
+    path = Path(path or LOADS_PATH)
+    if not path.is_file():
+        return []
+    records = []
+    for line in path.read_text().splitlines():
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return records
+
+
+def format_record(r: dict) -> str:
+    fallback = f" (requested {r['requested']})" if r.get("requested", r["mode"]) != r["mode"] else ""
+    return (f"{r['mode']:<6} {r['seconds']:>7.1f}s  peak RSS {r['peak_rss'] / 1024 ** 3:6.1f} GB  "
+            f"peak CUDA {r['peak_cuda'] / 1024 ** 3:6.1f} GB{fallback}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the Gemma text encoder and measure time and peak memory")
+    parser.add_argument("command", choices=["load", "compare", "history"])
+    parser.add_argument("--gemma-root", default=DEFAULT_GEMMA_ROOT)
+    parser.add_argument("--mode", choices=MODES, default="mmap", help="Mode for load")
+    parser.add_argument("--device", default="cuda")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "history":
+        for r in load_history():
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(r['time']))}  {format_record(r)}")
+        return 0
+    if args.command == "load":
+        load_text_encoder(args.gemma_root, args.device, mode=args.mode)
+        return 0
+
+    # One process per mode: peak RSS cannot be reset across a previous load's page cache and allocator
+    for mode in MODES:
+        before = len(load_history())
+        subprocess.run([sys.executable, __file__, "load", "--mode", mode, "--gemma-root", args.gemma_root,
+                        "--device", args.device], check=True, stdout=subprocess.DEVNULL)
+        for r in load_history()[before:]:
+            print(format_record(r))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
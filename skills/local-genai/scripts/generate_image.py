@@ -6,37 +6,49 @@ Usage: python generate_image.py "your prompt here" --model flux --output result.
 
 import argparse
 import json
+import os
 import requests
 import sys
 import time
 from pathlib import Path
 
-COMFYUI_URL = "http://127.0.0.1:8188"
+from backend_pool import NoBackendAvailable
+from comfyui_client import get_client
+from comfyui_outputs import RETRIEVE_MODES
+from comfyui_run import cache_outputs, collect_outputs, restore_hit, run_with_failover
+from graph_merge import merge_workflows
+from result_cache import ResultCache
+from seed_sweep import FLUX_GB_PER_MP, fit_batch_size, format_sweep, is_seed_range, parse_seeds, run_sweep
+import tracing
+from workflow_templates import WorkflowTemplate, WorkflowValidationError, register, validate_for
+
+client = get_client()
+COMFYUI_URL = client.base_url
 OUTPUT_DIR = Path.home() / "ComfyUI" / "output"
 
-def create_flux_workflow(prompt, negative_prompt="", width=1024, height=1024, seed=42, steps=20):
-    """Create Flux workflow JSON"""
-    return {
+FLUX_TEMPLATE = register(WorkflowTemplate(
+    "flux",
+    {
         "1": {
             "inputs": {"ckpt_name": "flux1-dev-fp8.safetensors"},
             "class_type": "CheckpointLoaderSimple"
         },
         "2": {
-            "inputs": {"text": prompt, "clip": ["1", 1]},
+            "inputs": {"text": "", "clip": ["1", 1]},
             "class_type": "CLIPTextEncode"
         },
         "3": {
-            "inputs": {"text": negative_prompt, "clip": ["1", 1]},
+            "inputs": {"text": "", "clip": ["1", 1]},
             "class_type": "CLIPTextEncode"
         },
         "4": {
-            "inputs": {"width": width, "height": height, "batch_size": 1},
+            "inputs": {"width": 1024, "height": 1024, "batch_size": 1},
             "class_type": "EmptyLatentImage"
         },
         "5": {
             "inputs": {
-                "seed": seed,
-                "steps": steps,
+                "seed": 42,
+                "steps": 20,
                 "cfg": 1.0,
                 "sampler_name": "euler",
                 "scheduler": "normal",
@@ -56,19 +68,40 @@ def create_flux_workflow(prompt, negative_prompt="", width=1024, height=1024, se
             "inputs": {"filename_prefix": "api_output", "images": ["6", 0]},
             "class_type": "SaveImage"
         }
-    }
+    },
+    slots={
+        "prompt": [("2", "text")],
+        "negative_prompt": [("3", "text")],
+        "width": [("4", "width")],
+        "height": [("4", "height")],
+        "seed": [("5", "seed")],
+        "steps": [("5", "steps")],
+    },
+))
+
+def create_flux_workflow(prompt, negative_prompt="", width=1024, height=1024, seed=42, steps=20):
+    """Create Flux workflow JSON from the compiled template"""
+    return FLUX_TEMPLATE.render(prompt=prompt, negative_prompt=negative_prompt, width=width,
+                                height=height, seed=seed, steps=steps)
+
+def submit_workflow(workflow, template=None, failover=False):
+    """Validate workflow against the cached /object_info schema, then submit to ComfyUI
 
-def submit_workflow(workflow):
-    """Submit workflow to ComfyUI"""
+    With failover, an unreachable server raises requests.ConnectionError so
+    the job can go to another backend.
+    """
     try:
-        response = requests.post(
-            f"{COMFYUI_URL}/prompt",
-            json={"prompt": workflow},
-            timeout=10
-        )
-        response.raise_for_status()
-        return response.json()["prompt_id"]
+        with tracing.span("validate", cat="build"):
+            validate_for(client, workflow, template)
+        return client.queue_prompt(workflow)["prompt_id"]
+    except WorkflowValidationError as e:
+        print("Error: invalid workflow")
+        for error in e.errors:
+            print(f"  {error}")
+        sys.exit(1)
     except requests.exceptions.ConnectionError:
+        if failover:
+            raise
         print(f"Error: Cannot connect to ComfyUI at {COMFYUI_URL}")
         print("Make sure ComfyUI is running: cd ~/ComfyUI && python main.py")
         sys.exit(1)
@@ -76,45 +109,40 @@ def submit_workflow(workflow):
         print(f"Error submitting workflow: {e}")
         sys.exit(1)
 
-def wait_for_completion(prompt_id, timeout=300):
-    """Wait for generation to complete"""
-    start = time.time()
+def wait_for_completion(prompt_id, timeout=300, failover=False):
+    """Wait for generation to complete (WebSocket notification, polling fallback).
+
+    Returns the /history entry on success, None otherwise. With failover, a
+    lost server raises requests.ConnectionError so the job can go elsewhere.
+    """
     print(f"Waiting for generation... (timeout: {timeout}s)")
     
-    while time.time() - start < timeout:
-        try:
-            response = requests.get(f"{COMFYUI_URL}/history/{prompt_id}", timeout=10)
-            data = response.json()
-            
-            if prompt_id in data:
-                status = data[prompt_id].get("status", {})
-                status_str = status.get("status_str", "unknown")
-                
-                if status_str == "success":
-                    print("✓ Generation complete!")
-                    return True
-                elif status_str == "error":
-                    print("✗ Generation failed!")
-                    # Get error details
-                    msgs = status.get("messages", [])
-                    errors = [m for m in msgs if isinstance(m, list) and len(m) > 1 and "error" in str(m[0]).lower()]
-                    if errors:
-                        print(f"Error: {errors[0][1].get('exception_message', 'Unknown error')}")
-                    return False
-                
-                print(f"  Status: {status_str}...", end="\r")
-        except Exception as e:
-            print(f"  Warning: {e}", end="\r")
-        
-        time.sleep(2)
+    def on_progress(value, max_val):
+        print(f"  Step {value}/{max_val}...", end="\r")
     
-    print("\n✗ Timeout waiting for generation")
-    return False
-
-def find_latest_output(prefix="api_output"):
-    """Find the most recent output file"""
-    files = sorted(OUTPUT_DIR.glob(f"{prefix}_*.png"), key=lambda x: x.stat().st_mtime, reverse=True)
-    return files[0] if files else None
+    try:
+        entry = client.wait_for_prompt(prompt_id, timeout=timeout, on_progress=on_progress)
+    except TimeoutError:
+        print("\n✗ Timeout waiting for generation")
+        return None
+    except requests.exceptions.RequestException as e:
+        if failover and isinstance(e, requests.exceptions.ConnectionError):
+            raise
+        print(f"\n✗ Lost connection to ComfyUI: {e}")
+        return None
+    
+    status = entry.get("status", {})
+    if status.get("status_str") == "error":
+        print("✗ Generation failed!")
+        # Get error details
+        msgs = status.get("messages", [])
+        errors = [m for m in msgs if isinstance(m, list) and len(m) > 1 and "error" in str(m[0]).lower()]
+        if errors:
+            print(f"Error: {errors[0][1].get('exception_message', 'Unknown error')}")
+        return None
+    
+    print("✓ Generation complete!")
+    return entry
 
 def main():
     parser = argparse.ArgumentParser(description="Generate images using ComfyUI")
@@ -126,8 +154,35 @@ def main():
     parser.add_argument("--steps", "-s", type=int, default=20, help="Sampling steps")
     parser.add_argument("--seed", type=int, default=None, help="Random seed")
     parser.add_argument("--output", "-o", help="Output filename")
+    parser.add_argument("--seeds", help="Seed sweep: a range like 1-16 is batched (start seed + batch index), "
+                                        "a list like 1,5,9 renders one job per seed")
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="Samples per job for a --seeds range (default: as many as fit in free VRAM)")
+    parser.add_argument("--variant", action="append", default=[], metavar="PROMPT",
+                        help="Extra prompt rendered in the same job with shared loaders (repeatable)")
+    parser.add_argument("--retrieve", choices=RETRIEVE_MODES, default="auto",
+                        help="How --output is filled: auto (link locally, else HTTP), move, or http")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always render, bypassing the local result cache")
+    parser.add_argument("--comfyui-url", default=None,
+                        help="ComfyUI base URL (default: $COMFYUI_URL or http://127.0.0.1:8188)")
+    parser.add_argument("--backends", default=os.environ.get("COMFYUI_BACKENDS"),
+                        help="Comma-separated ComfyUI URLs to load-balance over (default: $COMFYUI_BACKENDS)")
+    parser.add_argument("--trace", action="store_true",
+                        help="Write a Chrome trace of this run (also: $COMFYUI_TRACE=1)")
     
     args = parser.parse_args()
+    if args.seeds and args.variant:
+        parser.error("--seeds cannot be combined with --variant")
+    seeds = parse_seeds(args.seeds) if args.seeds else None
+    if seeds and args.batch_size > 1 and not is_seed_range(seeds):
+        parser.error("only a --seeds range (e.g. 1-16) can be batched; a seed list needs --batch-size 1")
+    tracing.start_if_enabled("generate_image", args.trace)
+    
+    global client, COMFYUI_URL
+    if args.comfyui_url:
+        client = get_client(args.comfyui_url)
+        COMFYUI_URL = client.base_url
     
     # Use random seed if not specified
     if args.seed is None:
@@ -141,33 +196,85 @@ def main():
     
     # Create workflow
     if args.model == "flux":
-        workflow = create_flux_workflow(
-            args.prompt,
-            args.negative,
-            args.width,
-            args.height,
-            args.seed,
-            args.steps
+        with tracing.span("build workflow", cat="build"):
+            workflow = create_flux_workflow(
+                args.prompt,
+                args.negative,
+                args.width,
+                args.height,
+                args.seed,
+                args.steps
+            )
+        template = FLUX_TEMPLATE
+        prompts, node_maps = [args.prompt] + args.variant, None
+        if args.variant:
+            with tracing.span("merge variants", cat="build", variants=len(args.variant) + 1):
+                workflows = [workflow] + [create_flux_workflow(v, args.negative, args.width, args.height,
+                                                               args.seed, args.steps) for v in args.variant]
+                workflow, node_maps = merge_workflows(workflows)
+            template = None  # merged graph no longer has the template's shape
+            print(f"Variants: {len(workflows)} prompts in one job "
+                  f"({sum(map(len, workflows))} -> {len(workflow)} nodes)")
+    
+    # Seed sweep: batched latents, split back into one file per sample
+    if seeds:
+        batch = args.batch_size or (fit_batch_size(client, workflow, args.width, args.height,
+                                                   gb_per_mp=FLUX_GB_PER_MP) if is_seed_range(seeds) else 1)
+        batch = min(batch, len(seeds))
+        out = Path(args.output).expanduser() if args.output else OUTPUT_DIR / "sweeps" / "flux.png"
+        print(f"Sweep: {len(seeds)} samples, batch size {batch}")
+        start = time.time()
+        results = run_sweep(
+            client,
+            lambda seed: create_flux_workflow(args.prompt, args.negative, args.width, args.height, seed, args.steps),
+            seeds, batch, dest_dir=out.parent, stem=out.stem, retrieve=args.retrieve,
+            metadata={"model": args.model, "prompt": args.prompt, "negative": args.negative,
+                      "width": args.width, "height": args.height, "steps": args.steps},
         )
+        for r in results:
+            print(f"seed {r['seed']} #{r['batch_index']}: {', '.join(str(p) for p in r['paths'])}")
+        print(format_sweep(results, time.time() - start))
+        return
     
-    # Submit and wait
-    prompt_id = submit_workflow(workflow)
-    print(f"Submitted: {prompt_id}")
+    # Same workflow (incl. seed) already rendered? Serve it from the cache
+    cache = None if args.no_cache else ResultCache()
+    with tracing.span("cache lookup", cat="cache"):
+        cached = cache.get(workflow) if cache else None
+    if cached:
+        print("Cache hit - no GPU time used")
+        for output_file in cached:
+            print(f"\nOutput: {output_file}")
+        if args.output:
+            for dest in restore_hit(cache, cached, args.output, prompts):
+                print(f"Copied to: {dest}")
+        return
     
-    success = wait_for_completion(prompt_id)
+    def use_client(chosen):
+        global client, COMFYUI_URL
+        client, COMFYUI_URL = chosen, chosen.base_url
     
-    if success:
-        output_file = find_latest_output()
-        if output_file:
-            print(f"\nOutput: {output_file}")
-            if args.output:
-                import shutil
-                shutil.copy(output_file, args.output)
-                print(f"Copied to: {args.output}")
-        else:
-            print(f"\nOutput saved to: {OUTPUT_DIR}")
-    else:
+    # Submit and wait; with several backends, the least-loaded one that can
+    # run this workflow, resubmitting on the next one if it is down or dies
+    start = time.time()
+    try:
+        entry = run_with_failover(
+            workflow,
+            lambda wf: submit_workflow(wf, template, failover=bool(args.backends)),
+            lambda prompt_id: wait_for_completion(prompt_id, failover=bool(args.backends)),
+            backends=args.backends, on_backend=use_client,
+        )
+    except NoBackendAvailable as e:
+        print(f"Error: {e}")
         sys.exit(1)
+    if not entry:
+        sys.exit(1)
+    
+    paths, files = collect_outputs(client, entry, output=args.output, retrieve=args.retrieve,
+                                   prompts=prompts, node_maps=node_maps, output_dir=OUTPUT_DIR)
+    if not files:
+        print(f"\nOutput saved to: {OUTPUT_DIR}")
+        return
+    cache_outputs(cache, workflow, client, paths, files, gpu_seconds=time.time() - start)
 
 if __name__ == "__main__":
     main()
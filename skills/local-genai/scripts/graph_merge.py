@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Merge several API workflows into one graph with shared nodes deduplicated
+
+Prompt variations of the same workflow differ only in a few nodes (the
+positive CLIPTextEncode and everything downstream of it). Submitting
+them one by one repeats the loaders, the empty negative prompt encode and
+the empty latent N times, plus N round-trips. merge_workflows() folds
+identical nodes - same class_type, same inputs, same (already merged)
+upstream nodes - into one, so the result has a single loader/encoder
+trunk and N sampler/decode/save branches. ComfyUI executes every node of
+a prompt once, so shared nodes are also only computed once.
+
+Usage (from another script):
+    from graph_merge import merge_workflows, split_outputs, variant_outputs, variant_paths
+
+    workflow, node_maps = merge_workflows([build(p) for p in prompts])
+    entry = client.wait_for_prompt(client.queue_prompt(workflow)["prompt_id"])
+    for files in split_outputs(entry, node_maps):
+        ...
+    files, counts = variant_outputs(entry, node_maps)     # flattened, in variant order
+    dests = variant_paths("out.png", counts)             # out_v0.png, out_v1.png, ...
+
+CLI:
+    python graph_merge.py a.json b.json c.json -o merged.json
+"""
+
+import argparse
+import copy
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from comfyui_client import OUTPUT_KINDS, history_outputs, numbered_paths
+
+
+def _is_link(value) -> bool:
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[0], str) and isinstance(value[1], int)
+
+
+def merge_workflows(workflows: List[dict], tag_outputs: bool = True) -> Tuple[dict, List[Dict[str, str]]]:
+    """Merge API workflows into one; returns (merged, [{original id: merged id}] per workflow).
+
+    With tag_outputs, each variant's filename_prefix gets a _v<i> suffix so
+    the saved files can be told apart on disk.
+    """
+    merged: Dict[str, dict] = {}
+    by_signature: Dict[str, str] = {}
+    node_maps: List[Dict[str, str]] = []
+    next_id = 1 + max((int(n) for wf in workflows for n in wf if str(n).isdigit()), default=0)
+
+    for index, workflow in enumerate(workflows):
+        mapping: Dict[str, str] = {}
+
+        def visit(node_id: str, path: frozenset) -> str:
+            nonlocal next_id
+            if node_id in mapping:
+                return mapping[node_id]
+            if node_id in path:
+                raise ValueError(f"Cycle in workflow {index} at node {node_id}")
+            node = workflow[node_id]
+            inputs = {}
+            for name, value in node.get("inputs", {}).items():
+                if _is_link(value):
+                    inputs[name] = [visit(value[0], path | {node_id}), value[1]]
+                else:
+                    inputs[name] = copy.deepcopy(value)
+            if tag_outputs and len(workflows) > 1 and isinstance(inputs.get("filename_prefix"), str):
+                inputs["filename_prefix"] += f"_v{index}"
+
+            signature = json.dumps([node["class_type"], inputs], sort_keys=True)
+            merged_id = by_signature.get(signature)
+            if merged_id is None:
+                merged_id = node_id
+                if merged_id in merged:
+                    merged_id = str(next_id)
+                    next_id += 1
+                merged[merged_id] = {"class_type": node["class_type"], "inputs": inputs}
+                if "_meta" in node:
+                    merged[merged_id]["_meta"] = copy.deepcopy(node["_meta"])
+                by_signature[signature] = merged_id
+            mapping[node_id] = merged_id
+            return merged_id
+
+        for node_id in workflow:
+            visit(str(node_id), frozenset())
+        node_maps.append(mapping)
+    return merged, node_maps
+
+
+def split_outputs(entry: dict, node_maps: List[Dict[str, str]], kinds=OUTPUT_KINDS) -> List[List[dict]]:
+    """history_outputs() of a merged job, split back per original workflow."""
+    files = history_outputs(entry, kinds)
+    return [[f for f in files if f["node"] in set(mapping.values())] for mapping in node_maps]
+
+
+def variant_outputs(entry: dict, node_maps: List[Dict[str, str]], kinds=OUTPUT_KINDS) -> Tuple[List[dict], List[int]]:
+    """split_outputs() flattened: the files in variant order, and how many belong to each variant."""
+    groups = split_outputs(entry, node_maps, kinds)
+    return [f for group in groups for f in group], [len(group) for group in groups]
+
+
+def variant_paths(path, counts: List[int]) -> List[Path]:
+    """Destinations for a merged job's outputs in variant order: name_v0.ext, name_v1.ext, ...
+
+    counts is the number of files per variant; several files of one
+    variant are numbered (name_v0_1.ext, ...).
+    """
+    path = Path(path).expanduser()
+    return [dest for index, count in enumerate(counts)
+            for dest in numbered_paths(path.with_name(f"{path.stem}_v{index}{path.suffix}"), count)]
+
+
+def write_variant_sidecars(paths, counts: List[int], prompts: List[str]):
+    """A <file>.json next to each output naming its variant and prompt, like seed sweep samples."""
+    start = 0
+    for index, (count, prompt) in enumerate(zip(counts, prompts)):
+        for path in paths[start:start + count]:
+            Path(os.fspath(path) + ".json").write_text(json.dumps({"variant": index, "prompt": prompt}, indent=2))
+        start += count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge API-format workflows into one graph with shared nodes")
+    parser.add_argument("workflows", nargs="+", help="API-format workflow JSON files")
+    parser.add_argument("--output", "-o", help="Write the merged workflow here (default: stdout)")
+    args = parser.parse_args()
+
+    workflows = [json.loads(Path(p).read_text()) for p in args.workflows]
+    merged, _ = merge_workflows(workflows)
+    text = json.dumps(merged, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+    print(f"{sum(len(w) for w in workflows)} nodes -> {len(merged)} nodes", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Model-affinity job scheduler for ComfyUI
+
+Our mixed workload interleaves Flux, Qwen-Image and LTX-2 jobs, and every
+switch makes ComfyUI evict and reload 15-39 GB of weights. This scheduler
+sits in front of queue_prompt: it keeps pending jobs locally, groups them
+by the model files their loader nodes use (CheckpointLoaderSimple,
+UNETLoader, CLIPLoader, ...) and submits next the job that shares the
+most weights with what is loaded now. A job is never passed over more than
+max_skips times, which bounds how long any job can wait.
+
+Only `depth` jobs are handed to ComfyUI at a time (default 1), since jobs
+already in the server queue can no longer be reordered.
+
+With a page_cache_warmer.PageCacheWarmer, the model files of the job that
+would be picked next are read into the OS page cache while the current
+one runs.
+
+Usage (from another script):
+    from job_scheduler import ModelAffinityScheduler
+
+    scheduler = ModelAffinityScheduler(client)
+    for workflow in workflows:
+        scheduler.add(workflow)
+    jobs = scheduler.run()
+    print(scheduler.report())
+
+CLI:
+    python job_scheduler.py flux1.json qwen1.json flux2.json ... --max-skips 3
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, FrozenSet, List, Optional, Tuple
+
+# Loader node -> {input name: ComfyUI model folder}
+LOADER_INPUTS = {
+    "CheckpointLoaderSimple": {"ckpt_name": "checkpoints"},
+    "UNETLoader": {"unet_name": "diffusion_models"},
+    "CLIPLoader": {"clip_name": "text_encoders"},
+    "DualCLIPLoader": {"clip_name1": "text_encoders", "clip_name2": "text_encoders"},
+    "LTXVGemmaCLIPModelLoader": {"gemma_path": "text_encoders"},
+    # A LoRA is not a reload, but switching it re-patches the loaded weights
+    "LoraLoader": {"lora_name": "loras"},
+    "LoraLoaderModelOnly": {"lora_name": "loras"},
+}
+DEFAULT_MAX_SKIPS = 3
+
+
+def model_files(workflow: dict) -> List[Tuple[str, str]]:
+    """(model folder, filename) of every heavy model a workflow loads."""
+    files = []
+    for node in workflow.values():
+        for input_name, folder in LOADER_INPUTS.get(node.get("class_type"), {}).items():
+            value = node.get("inputs", {}).get(input_name)
+            if isinstance(value, str):
+                files.append((folder, value))
+    return files
+
+
+def model_key(workflow: dict) -> FrozenSet[Tuple[str, str]]:
+    return frozenset(model_files(workflow))
+
+
+class Job:
+    """A workflow waiting for (or done with) its turn on the GPU."""
+
+    def __init__(self, seq: int, workflow: dict, name: Optional[str] = None):
+        self.seq = seq
+        self.name = name or f"job-{seq}"
+        self.workflow = workflow
+        self.key = model_key(workflow)
+        self.added_at = time.time()
+        self.skipped = 0
+        self.prompt_id: Optional[str] = None
+        self.submitted_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.entry: Optional[dict] = None
+        self.error: Optional[BaseException] = None
+
+    def __repr__(self):
+        return f"Job({self.name}, skipped={self.skipped})"
+
+
+class ModelAffinityScheduler:
+    """Reorders pending jobs so consecutive jobs share loaded weights."""
+
+    def __init__(self, client=None, max_skips: int = DEFAULT_MAX_SKIPS, depth: int = 1,
+                 submit: Optional[Callable[[dict], str]] = None,
+                 wait: Optional[Callable[[str], dict]] = None, warmer=None):
+        self.client = client
+        self.max_skips = max_skips
+        self.depth = depth
+        self.warmer = warmer
+        self._submit = submit or (lambda workflow: client.queue_prompt(workflow)["prompt_id"])
+        self._wait = wait or (lambda prompt_id: client.wait_for_prompt(prompt_id))
+        self.pending: Deque[Job] = deque()
+        self.done: List[Job] = []
+        self.loaded: FrozenSet[Tuple[str, str]] = frozenset()
+        self._seq = 0
+        self._last_added: Optional[FrozenSet[Tuple[str, str]]] = None
+        self.swaps = 0
+        self.fifo_swaps = 0  # swaps plain arrival order would have caused
+
+    @staticmethod
+    def _is_swap(current, key) -> bool:
+        """A job forces a reload if it needs any file that is not loaded."""
+        return bool(current) and bool(key - current)
+
+    def add(self, workflow: dict, name: Optional[str] = None) -> Job:
+        job = Job(self._seq, workflow, name)
+        self._seq += 1
+        if self._last_added is not None and self._is_swap(self._last_added, job.key):
+            self.fifo_swaps += 1
+        self._last_added = job.key
+        self.pending.append(job)
+        return job
+
+    def peek(self, loaded: Optional[FrozenSet[Tuple[str, str]]] = None) -> Optional[Job]:
+        """The job next_job() would pick with `loaded` in memory, without taking it."""
+        loaded = self.loaded if loaded is None else loaded
+        if not self.pending:
+            return None
+        oldest = self.pending[0]
+        if oldest.skipped >= self.max_skips or not loaded:
+            return oldest
+        # Most shared weights wins, earliest arrival breaks ties
+        chosen = max(self.pending, key=lambda j: (len(j.key & loaded) - len(j.key - loaded), -j.seq))
+        return chosen if chosen.key & loaded else oldest
+
+    def next_job(self) -> Optional[Job]:
+        """Pop the job to run next (model affinity within the fairness bound)."""
+        chosen = self.peek()
+        if chosen is None:
+            return None
+
+        for job in self.pending:
+            if job is chosen:
+                break
+            job.skipped += 1
+        self.pending.remove(chosen)
+
+        if self._is_swap(self.loaded, chosen.key):
+            self.swaps += 1
+        if chosen.key:
+            self.loaded = chosen.key
+        return chosen
+
+    def run(self) -> List[Job]:
+        """Submit and wait for all pending jobs, `depth` at a time."""
+        in_flight: Deque[Job] = deque()
+        while self.pending or in_flight:
+            while self.pending and len(in_flight) < self.depth:
+                job = self.next_job()
+                try:
+                    job.prompt_id = self._submit(job.workflow)
+                    job.submitted_at = time.time()
+                    in_flight.append(job)
+                    if self.warmer is not None and len(in_flight) == 1:
+                        self.warmer.job_started(job.workflow)
+                        self.warmer.set_running(job.workflow)
+                except Exception as e:
+                    job.error = e
+                    self.done.append(job)
+            if not in_flight:
+                continue
+            if self.warmer is not None:
+                upcoming = self.peek()
+                self.warmer.prefetch(upcoming.workflow if upcoming else None)
+            job = in_flight.popleft()
+            try:
+                job.entry = self._wait(job.prompt_id)
+            except Exception as e:
+                job.error = e
+            job.finished_at = time.time()
+            self.done.append(job)
+            if self.warmer is not None and in_flight:
+                # The next job in the server queue starts now
+                self.warmer.job_started(in_flight[0].workflow)
+                self.warmer.set_running(in_flight[0].workflow)
+        return self.done
+
+    def report(self) -> dict:
+        return {
+            "jobs": self._seq,
+            "pending": len(self.pending),
+            "swaps": self.swaps,
+            "fifo_swaps": self.fifo_swaps,
+            "swaps_avoided": self.fifo_swaps - self.swaps,
+            "max_skips": self.max_skips,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run API-format workflows with model-affinity ordering")
+    parser.add_argument("workflows", nargs="+", help="API-format workflow JSON files (arrival order)")
+    parser.add_argument("--max-skips", type=int, default=DEFAULT_MAX_SKIPS,
+                        help="How often a job may be passed over before it must run")
+    parser.add_argument("--depth", type=int, default=1, help="Jobs handed to ComfyUI at a time")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the order and swap counts")
+    parser.add_argument("--warm", action="store_true",
+                        help="Read the next job's model files into the page cache while the current one runs")
+    parser.add_argument("--warm-mb-s", type=float, default=300.0, help="Bandwidth cap for --warm")
+    parser.add_argument("--comfyui-url", default=None,
+                        help="ComfyUI base URL (default: $COMFYUI_URL or http://127.0.0.1:8188)")
+    args = parser.parse_args()
+
+    client = None
+    if not args.dry_run:
+        from comfyui_client import get_client
+        client = get_client(args.comfyui_url)
+
+    warmer = None
+    if args.warm and not args.dry_run:
+        from page_cache_warmer import PageCacheWarmer
+        warmer = PageCacheWarmer(args.warm_mb_s)
+    scheduler = ModelAffinityScheduler(client, max_skips=args.max_skips, depth=args.depth, warmer=warmer)
+    for path in args.workflows:
+        scheduler.add(json.loads(Path(path).read_text()), name=path)
+
+    if args.dry_run:
+        while scheduler.pending:
+            job = scheduler.next_job()
+            print(f"  {job.name}  {sorted(f for _, f in job.key)}")
+    else:
+        start = time.time()
+        for job in scheduler.run():
+            status = f"✗ {job.error}" if job.error else "✓"
+            print(f"{status} {job.name} ({job.finished_at - job.submitted_at:.1f}s)"
+                  if job.finished_at and job.submitted_at else f"{status} {job.name}")
+        print(f"Total: {time.time() - start:.1f}s")
+
+    r = scheduler.report()
+    print(f"\nModel swaps: {r['swaps']} (arrival order: {r['fifo_swaps']}, avoided: {r['swaps_avoided']})")
+    if warmer is not None:
+        from page_cache_warmer import format_report
+        warmer.close()
+        print(format_report(warmer.report()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Persistent job store for ComfyUI submissions
+
+Every submitted workflow is recorded in a SQLite database (WAL mode)
+together with its prompt_id, backend, status and outputs. If the agent
+or a script crashes while a 20-minute video is rendering, `resume`
+re-attaches to the job through /history and /queue instead of
+submitting it again:
+
+    finished while we were gone -> outputs recorded from /history
+    still queued or running     -> waited for (WebSocket under the job's
+                                   own client_id, polling fallback)
+    unknown to the server       -> marked lost (resubmitted only with --resubmit-lost,
+                                   on this or any later resume)
+
+submit() writes the row before POST /prompt, under a prompt_id chosen
+here and sent with the request, so a crash between the two leaves a job
+that resume finds (or reports lost) instead of no trace at all.
+
+Usage (from another script):
+    from job_store import JobStore
+
+    store = JobStore()
+    prompt_id = store.submit(client, workflow, name="robot.mp4")
+    ...
+    store.record_result(prompt_id, entry)
+
+CLI:
+    python job_store.py list [--all]
+    python job_store.py show <prompt_id>
+    python job_store.py resume [--no-wait] [--resubmit-lost]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+import requests
+
+from comfyui_client import ComfyClient, get_client, history_outputs
+from result_cache import workflow_hash
+
+DB_PATH = Path(os.environ.get("COMFYUI_JOB_DB", Path.home() / ".cache" / "comfyui" / "jobs.db")).expanduser()
+
+ACTIVE_STATUSES = ("submitted", "running")
+LOST = "lost"
+
+
+def rejection(response) -> str:
+    """The reason ComfyUI gave for refusing a prompt (its error message and node_errors)."""
+    try:
+        body = response.json()
+    except ValueError:
+        return response.text[:500]
+    error = body.get("error") or {}
+    message = error.get("message", "") if isinstance(error, dict) else str(error)
+    if body.get("node_errors"):
+        message += f" {json.dumps(body['node_errors'])[:500]}"
+    return message.strip() or response.text[:500]
+
+
+class JobStore:
+    """Durable record of submitted ComfyUI jobs."""
+
+    def __init__(self, path=None):
+        self.path = Path(path or DB_PATH).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT,
+                prompt_id TEXT UNIQUE,
+                backend TEXT NOT NULL,
+                client_id TEXT,
+                workflow TEXT NOT NULL,
+                workflow_hash TEXT NOT NULL,
+                status TEXT NOT NULL,
+                outputs TEXT,
+                error TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+        """)
+
+    def record_submit(self, workflow: dict, prompt_id: str, backend: str,
+                      client_id: Optional[str] = None, name: Optional[str] = None) -> int:
+        now = time.time()
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT OR REPLACE INTO jobs (name, prompt_id, backend, client_id, workflow, workflow_hash, "
+                "status, created, updated) VALUES (?, ?, ?, ?, ?, ?, 'submitted', ?, ?)",
+                (name, prompt_id, backend, client_id, json.dumps(workflow), workflow_hash(workflow), now, now),
+            )
+        return cursor.lastrowid
+
+    def submit(self, client, workflow: dict, name: Optional[str] = None) -> str:
+        """Record a job, then queue it on client's server. Returns the prompt_id.
+
+        Raises what queue_prompt raises. Only a rejection by the server (4xx,
+        e.g. node_errors) marks the row as an error; after a timeout or a
+        dropped connection the prompt may have been queued all the same, so
+        the row stays "submitted" for reconcile() to look up.
+        """
+        prompt_id = str(uuid.uuid4())
+        self.record_submit(workflow, prompt_id, client.base_url, client.client_id, name)
+        try:
+            queued = client.queue_prompt(workflow, prompt_id=prompt_id)["prompt_id"]
+        except requests.HTTPError as e:
+            if e.response is not None and 400 <= e.response.status_code < 500:
+                self.update(prompt_id, "error", error=f"rejected: {rejection(e.response)}")
+            else:
+                self.update(prompt_id, "submitted", error=f"submit unconfirmed: {e}")
+            raise
+        except Exception as e:
+            self.update(prompt_id, "submitted", error=f"submit unconfirmed: {e}")
+            raise
+        if queued != prompt_id:  # older ComfyUI: ignores the requested id
+            with self.db:
+                self.db.execute("UPDATE jobs SET prompt_id = ?, updated = ? WHERE prompt_id = ?",
+                                (queued, time.time(), prompt_id))
+        return queued
+
+    def update(self, prompt_id: str, status: str, outputs: Optional[list] = None,
+               error: Optional[str] = None):
+        with self.db:
+            self.db.execute(
+                "UPDATE jobs SET status = ?, outputs = COALESCE(?, outputs), error = ?, updated = ? "
+                "WHERE prompt_id = ?",
+                (status, json.dumps(outputs) if outputs is not None else None, error, time.time(), prompt_id),
+            )
+
+    def record_result(self, prompt_id: str, entry: dict):
+        """Store the outcome from a /history entry."""
+        status = entry.get("status", {})
+        if status.get("status_str") == "error":
+            errors = [m[1].get("exception_message", "") for m in status.get("messages", [])
+                      if isinstance(m, list) and len(m) > 1 and m[0] == "execution_error"]
+            self.update(prompt_id, "error", history_outputs(entry), errors[0] if errors else "error")
+        else:
+            self.update(prompt_id, "success", history_outputs(entry))
+
+    def get(self, prompt_id: str) -> Optional[sqlite3.Row]:
+        return self.db.execute("SELECT * FROM jobs WHERE prompt_id = ?", (prompt_id,)).fetchone()
+
+    def jobs(self, statuses=None, limit: int = 50) -> List[sqlite3.Row]:
+        if statuses:
+            marks = ",".join("?" * len(statuses))
+            return self.db.execute(f"SELECT * FROM jobs WHERE status IN ({marks}) ORDER BY id",
+                                   tuple(statuses)).fetchall()
+        return self.db.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+
+    def active(self) -> List[sqlite3.Row]:
+        return self.jobs(ACTIVE_STATUSES)
+
+    def reconcile(self, job, client=None) -> str:
+        """Look the job up on its backend and record what we find. Returns the new status."""
+        client = client or get_client(job["backend"])
+        prompt_id = job["prompt_id"]
+        entry = client.get_history(prompt_id).get(prompt_id)
+        if entry is not None:
+            self.record_result(prompt_id, entry)
+            return self.get(prompt_id)["status"]
+
+        queue = client.get_queue()
+        # queue entries are [number, prompt_id, prompt, extra_data, outputs]
+        if any(item[1] == prompt_id for item in queue.get("queue_running", [])):
+            status = "running"
+        elif any(item[1] == prompt_id for item in queue.get("queue_pending", [])):
+            status = "submitted"
+        else:
+            status = LOST  # server restarted, history cleared, or the submit never arrived
+        self.update(prompt_id, status)
+        return status
+
+    def resume(self, wait: bool = True, resubmit_lost: bool = False, timeout: float = 3600) -> List[dict]:
+        """Re-attach to every active job (and lost ones, with resubmit_lost). Returns [{prompt_id, name, status}]."""
+        report = []
+        for job in self.jobs(ACTIVE_STATUSES + ((LOST,) if resubmit_lost else ())):
+            prompt_id = job["prompt_id"]
+            # Events go only to the socket of the client_id that queued the prompt: listen as that client
+            own_client = bool(job["client_id"])
+            client = ComfyClient(job["backend"], client_id=job["client_id"]) if own_client \
+                else get_client(job["backend"])
+            try:
+                status = self.reconcile(job, client)
+                if status in ACTIVE_STATUSES and wait:
+                    entry = client.wait_for_prompt(prompt_id, timeout=timeout, use_websocket=own_client)
+                    self.record_result(prompt_id, entry)
+                    status = self.get(prompt_id)["status"]
+                elif status == LOST and resubmit_lost:
+                    new_id = self.submit(client, json.loads(job["workflow"]), job["name"])
+                    self.update(prompt_id, "resubmitted", error=f"resubmitted as {new_id}")
+                    status = "resubmitted"
+                    report.append({"prompt_id": new_id, "name": job["name"], "status": "submitted"})
+            except (requests.RequestException, TimeoutError) as e:
+                status = f"unreachable ({e.__class__.__name__})"
+            finally:
+                if own_client:
+                    client.close()
+            report.append({"prompt_id": prompt_id, "name": job["name"], "status": status})
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and resume recorded ComfyUI jobs")
+    parser.add_argument("command", choices=["list", "show", "resume"])
+    parser.add_argument("prompt_id", nargs="?", help="Job to show")
+    parser.add_argument("--all", action="store_true", help="list: include finished jobs")
+    parser.add_argument("--no-wait", action="store_true", help="resume: only reconcile, do not wait")
+    parser.add_argument("--resubmit-lost", action="store_true",
+                        help="resume: resubmit jobs the server no longer knows about")
+    parser.add_argument("--db", default=None, help=f"Database path (default: {DB_PATH})")
+    args = parser.parse_args()
+
+    store = JobStore(args.db)
+    if args.command == "list":
+        rows = store.jobs() if args.all else store.active()
+        for job in rows:
+            age = (time.time() - job["created"]) / 60
+            print(f"{job['prompt_id']}  {job['status']:<9}  {age:6.1f} min  {job['backend']}  {job['name'] or ''}")
+        if not rows:
+            print("No jobs" if args.all else "No active jobs")
+    elif args.command == "show":
+        job = store.get(args.prompt_id)
+        if job is None:
+            print(f"Unknown prompt_id {args.prompt_id}")
+            return 1
+        for key in job.keys():
+            if key != "workflow":
+                print(f"{key:>14}: {job[key]}")
+    else:
+        for r in store.resume(wait=not args.no_wait, resubmit_lost=args.resubmit_lost):
+            print(f"{r['prompt_id']}  {r['status']:<9}  {r['name'] or ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
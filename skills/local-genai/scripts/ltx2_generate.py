@@ -15,10 +15,12 @@ from ltx_core.model.video_vae import TilingConfig, get_video_chunks_number
 from ltx_pipelines.utils.media_io import encode_video
 from ltx_pipelines.utils.constants import AUDIO_SAMPLE_RATE
 
+from model_staging import staged
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Model paths - using existing models
+# Model paths - using existing models (the CLI swaps in local staged copies, see model_staging.py)
 MODELS_DIR = Path("/mnt/c/models")
 CHECKPOINT_PATH = MODELS_DIR / "diffusion_models" / "ltx-2-19b-dev-fp8.safetensors"
 SPATIAL_UPSCALER_PATH = MODELS_DIR / "upscale_models" / "ltx-2-spatial-upscaler-x2-1.0.safetensors"
@@ -161,6 +163,8 @@ if __name__ == "__main__":
     parser.add_argument("--no-fp8", action="store_true", help="Disable FP8 quantization")
     
     args = parser.parse_args()
+    CHECKPOINT_PATH, SPATIAL_UPSCALER_PATH, GEMMA_ROOT, DISTILLED_LORA_PATH = (
+        Path(staged(path)) for path in (CHECKPOINT_PATH, SPATIAL_UPSCALER_PATH, GEMMA_ROOT, DISTILLED_LORA_PATH))
     
     output = generate_video(
         prompt=args.prompt,
@@ -14,6 +14,7 @@ import sys
 import os
 import argparse
 import logging
+import time
 from pathlib import Path
 
 # Add the LTX packages to path (installed via pip)
@@ -23,6 +24,13 @@ from ltx_core.model.video_vae import TilingConfig, get_video_chunks_number
 from ltx_pipelines.ti2vid_two_stages import TI2VidTwoStagesPipeline
 from ltx_pipelines.utils.media_io import encode_video
 from ltx_pipelines.utils.constants import AUDIO_SAMPLE_RATE
+from ltx_pipelines.utils import model_ledger
+
+from ltx2_worker import format_event, is_running as is_worker_running, submit as submit_to_worker
+from ltx_planner import plan, record_timing
+from model_index import preflight
+from model_staging import staged
+from text_embedding_cache import install as install_embedding_cache
 
 # Configure logging
 logging.basicConfig(
@@ -173,12 +181,34 @@ def parse_args():
         action="store_true",
         help="Use LLM to enhance the prompt automatically"
     )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        help="Time budget in minutes: pick width/height/steps from measured timings"
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Render on the warm LTX-2 worker (ltx2_worker.py serve) when it is running"
+    )
+    parser.add_argument(
+        "--no-embedding-cache",
+        action="store_true",
+        help="Always run the Gemma text encoder instead of reusing cached prompt embeddings"
+    )
+    parser.add_argument(
+        "--vram-gb",
+        type=float,
+        default=None,
+        help="VRAM to plan for when checking that the models fit (default: the GPU's total memory)"
+    )
     
     return parser.parse_args()
 
 
 def validate_model_files(args) -> bool:
-    """Check that all required model files exist."""
+    """Check that all required model files exist and that the largest fits in VRAM."""
     files_to_check = [
         ("Checkpoint", args.checkpoint_path),
         ("Distilled LoRA", args.distilled_lora),
@@ -200,7 +230,42 @@ def validate_model_files(args) -> bool:
             logger.error(f"✗ {name} NOT FOUND: {resolved}")
             all_exist = False
     
-    return all_exist
+    if not all_exist:
+        return False
+    
+    # Estimate resident size from the safetensors headers before a long load ends in an OOM
+    return preflight([resolve_path(path) for _, path in files_to_check], args.vram_gb, logger)
+
+
+def render_on_worker(args) -> int:
+    """Send the job to the resident pipeline of ltx2_worker.py and log its events."""
+    job = {
+        "checkpoint_path": args.checkpoint_path,
+        "distilled_lora": args.distilled_lora,
+        "spatial_upsampler_path": args.spatial_upsampler_path,
+        "gemma_root": args.gemma_root,
+        "enable_fp8": args.enable_fp8,
+        "prompt": args.prompt,
+        "negative_prompt": args.negative_prompt,
+        "output_path": args.output_path,
+        "seed": args.seed,
+        "width": args.width,
+        "height": args.height,
+        "num_frames": args.num_frames,
+        "frame_rate": args.frame_rate,
+        "num_inference_steps": args.num_inference_steps,
+        "video_cfg_scale": args.video_cfg_scale,
+        "video_stg_scale": args.video_stg_scale,
+        "video_rescale_scale": args.video_rescale_scale,
+        "enhance_prompt": args.enhance_prompt,
+    }
+    logger.info("Rendering on the LTX-2 worker...")
+    for event in submit_to_worker(job):
+        logger.info(f"  {format_event(event)}")
+    if event["event"] != "done":
+        return 1
+    logger.info(f"✓ Video saved: {event['output_path']} ({event['seconds'] / 60:.1f} min)")
+    return 0
 
 
 def main():
@@ -216,13 +281,33 @@ def main():
     # Validate model files
     logger.info("Validating model files...")
     if not validate_model_files(args):
-        logger.error("Some required model files are missing. Please check the paths.")
+        logger.error("Some required model files are missing or too large for this GPU. Please check the paths.")
         sys.exit(1)
     
+    if args.deadline:
+        preset = plan(args.deadline * 60, frames=args.num_frames, fps=args.frame_rate, pipelines=["two_stage"])
+        args.width, args.height = preset["width"], preset["height"]
+        args.num_frames, args.num_inference_steps = preset["frames"], preset["steps"]
+        logger.info(f"Deadline {args.deadline:.0f} min -> {args.width}x{args.height}, {args.num_inference_steps} steps "
+                    f"(predicted {preset['predicted_seconds'] / 60:.1f} min, {preset['model']})")
+        if not preset["fits"]:
+            logger.warning("  No preset fits the deadline; using the fastest one")
+    
+    if args.worker:
+        if is_worker_running():
+            sys.exit(render_on_worker(args))
+        logger.warning("LTX-2 worker not running; loading the pipeline in this process")
+    
     # Ensure output directory exists
     output_dir = os.path.dirname(args.output_path)
     os.makedirs(output_dir, exist_ok=True)
     
+    # Load from the local staged copy of a /mnt/c model when there is one (the worker does the same)
+    args.checkpoint_path = staged(args.checkpoint_path)
+    args.distilled_lora = staged(args.distilled_lora)
+    args.spatial_upsampler_path = staged(args.spatial_upsampler_path)
+    args.gemma_root = staged(args.gemma_root)
+    
     # Setup LoRA configuration
     distilled_lora_config = [
         LoraPathStrengthAndSDOps(
@@ -240,6 +325,10 @@ def main():
     logger.info(f"  Frames: {args.num_frames} (duration: {args.num_frames/args.frame_rate:.1f}s)")
     logger.info(f"  Inference Steps: {args.num_inference_steps}")
     
+    # Reuse cached prompt embeddings; Gemma is only built for prompts not seen before
+    if not args.no_embedding_cache:
+        install_embedding_cache(model_ledger)
+    
     # Initialize pipeline
     pipeline = TI2VidTwoStagesPipeline(
         checkpoint_path=args.checkpoint_path,
@@ -259,6 +348,7 @@ def main():
     
     try:
         # Generate video
+        gen_start = time.time()
         video, audio = pipeline(
             prompt=args.prompt,
             negative_prompt=args.negative_prompt,
@@ -308,6 +398,11 @@ def main():
             
             if file_size < 1024 * 1024:  # Less than 1MB
                 logger.warning("  Warning: File size is small, may indicate issues")
+            
+            # Feed the deadline planner's cost model
+            elapsed = time.time() - gen_start
+            logger.info(f"  Time: {elapsed / 60:.1f} min")
+            record_timing("two_stage", args.width, args.height, args.num_frames, args.num_inference_steps, elapsed)
         else:
             logger.error("✗ Video file was not created!")
             sys.exit(1)
@@ -26,6 +26,11 @@ from ltx_pipelines.ti2vid_two_stages import TI2VidTwoStagesPipeline
 from ltx_pipelines.utils.media_io import encode_video
 from ltx_pipelines.utils.constants import AUDIO_SAMPLE_RATE
 
+from gemma_loader import MODES as TEXT_ENCODER_LOAD_MODES, load_text_encoder
+from model_index import preflight
+from model_staging import staged
+from text_embedding_cache import install as install_embedding_cache
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -175,12 +180,29 @@ def parse_args():
         action="store_true",
         help="Use LLM to enhance the prompt automatically"
     )
+    parser.add_argument(
+        "--text-encoder-load",
+        choices=TEXT_ENCODER_LOAD_MODES,
+        default="eager",
+        help="eager: materialise Gemma in host RAM first; mmap: stream memory-mapped shards to the device"
+    )
+    parser.add_argument(
+        "--no-embedding-cache",
+        action="store_true",
+        help="Always run the Gemma text encoder instead of reusing cached prompt embeddings"
+    )
+    parser.add_argument(
+        "--vram-gb",
+        type=float,
+        default=None,
+        help="VRAM to plan for when checking that the models fit (default: the GPU's total memory)"
+    )
     
     return parser.parse_args()
 
 
 def validate_model_files(args) -> bool:
-    """Check that all required model files exist."""
+    """Check that all required model files exist and that the largest fits in VRAM."""
     files_to_check = [
         ("Checkpoint", args.checkpoint_path),
         ("Distilled LoRA", args.distilled_lora),
@@ -202,23 +224,27 @@ def validate_model_files(args) -> bool:
             logger.error(f"✗ {name} NOT FOUND: {resolved}")
             all_exist = False
     
-    return all_exist
+    if not all_exist:
+        return False
+    
+    # Estimate resident size from the safetensors headers before a long load ends in an OOM
+    return preflight([resolve_path(path) for _, path in files_to_check], args.vram_gb, logger)
 
 
 def main():
     args = parse_args()
     
-    # Resolve all paths
-    args.checkpoint_path = resolve_path(args.checkpoint_path)
-    args.distilled_lora = resolve_path(args.distilled_lora)
-    args.spatial_upsampler_path = resolve_path(args.spatial_upsampler_path)
-    args.gemma_root = resolve_path(args.gemma_root)
+    # Resolve all paths (to the local staged copy of a /mnt/c model when there is one)
+    args.checkpoint_path = staged(resolve_path(args.checkpoint_path))
+    args.distilled_lora = staged(resolve_path(args.distilled_lora))
+    args.spatial_upsampler_path = staged(resolve_path(args.spatial_upsampler_path))
+    args.gemma_root = staged(resolve_path(args.gemma_root))
     args.output_path = resolve_path(args.output_path)
     
     # Validate model files
     logger.info("Validating model files...")
     if not validate_model_files(args):
-        logger.error("Some required model files are missing. Please check the paths.")
+        logger.error("Some required model files are missing or too large for this GPU. Please check the paths.")
         sys.exit(1)
     
     # Ensure output directory exists
@@ -246,27 +272,13 @@ def main():
     # This is the key fix - we need to ensure the text encoder is loaded with actual weights
     try:
         from ltx_pipelines.utils import model_ledger
-        from transformers import AutoModelForCausalLM, AutoTokenizer
-        
-        original_text_encoder_build = model_ledger.TextEncoderBuilder.build
         
         def patched_text_encoder_build(self, device, dtype):
             """Build text encoder with proper weight loading."""
-            logger.info(f"Loading Gemma text encoder from {self.gemma_root}...")
+            logger.info(f"Loading Gemma text encoder from {self.gemma_root} ({args.text_encoder_load})...")
             
-            # Load with proper device placement
-            model = AutoModelForCausalLM.from_pretrained(
-                self.gemma_root,
-                torch_dtype=dtype,
-                device_map=device if device != "meta" else None,
-                low_cpu_mem_usage=False,  # Ensure weights are fully loaded
-            )
-            
-            # Move to target device if not already there
-            if device != "meta" and hasattr(model, 'device') and str(model.device) != str(device):
-                model = model.to(device)
-            
-            return model
+            # eager: from_pretrained with low_cpu_mem_usage=False; mmap: shards streamed onto the device
+            return load_text_encoder(self.gemma_root, device, dtype, mode=args.text_encoder_load)
         
         # Apply the patch
         model_ledger.TextEncoderBuilder.build = patched_text_encoder_build
@@ -276,6 +288,15 @@ def main():
         logger.warning(f"Could not apply text encoder patch: {e}")
         logger.warning("Will try default loading method...")
     
+    # Reuse cached prompt embeddings; Gemma is only built for prompts not seen before
+    if not args.no_embedding_cache:
+        try:
+            from ltx_pipelines.utils import model_ledger
+            install_embedding_cache(model_ledger)
+            logger.info("Text embedding cache enabled")
+        except Exception as e:
+            logger.warning(f"Could not enable the text embedding cache: {e}")
+    
     # Initialize pipeline
     pipeline = TI2VidTwoStagesPipeline(
         checkpoint_path=args.checkpoint_path,
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Warm LTX-2 worker that keeps the two-stage pipeline resident
+
+ltx2_generate.py and ltx2_generate_video*.py build a new
+TI2VidTwoStagesPipeline per run, so every clip pays for loading the 19B
+checkpoint, the distilled LoRA, the spatial upsampler and Gemma from
+/mnt/c again. This worker builds the pipeline once and renders jobs sent
+to it over a local socket (multiprocessing.connection, authenticated
+with a per-user key file). Each job streams events back:
+
+    queued      position in the worker's queue
+    loading     the pipeline is being (re)built; loaded follows with seconds
+    reused      the resident pipeline is used as is
+    progress    step / total (stub pipeline only)
+    encoding    writing the MP4
+    done        output_path, render and load seconds
+    error       message
+
+The pipeline is only rebuilt when a job asks for different pipeline
+settings (checkpoint, distilled LoRA and strength, upsampler, Gemma root,
+extra LoRAs, FP8); sizes, frames, steps, seeds and prompts never trigger
+a reload. Jobs run one at a time in arrival order.
+
+--stub serves a stand-in pipeline that sleeps instead of rendering and
+needs neither torch nor the LTX packages, to test the worker and its
+clients on a CPU-only machine.
+
+Usage (from another script):
+    from ltx2_worker import submit
+
+    for event in submit({"prompt": "A cat ...", "output_path": "/tmp/cat.mp4", "seed": 7}):
+        print(event)
+
+CLI:
+    python ltx2_worker.py serve [--stub]
+    python ltx2_worker.py submit --prompt "A cat walks..." --output ~/ComfyUI/output/cat.mp4
+    python ltx2_worker.py status
+    python ltx2_worker.py stop
+"""
+
+import argparse
+import gc
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from model_staging import staged
+from text_embedding_cache import install as install_embedding_cache
+
+CACHE_DIR = Path.home() / ".cache" / "comfyui"
+DEFAULT_ADDRESS = os.environ.get("LTX2_WORKER_ADDRESS", str(CACHE_DIR / "ltx2_worker.sock"))
+KEY_PATH = Path(os.environ.get("LTX2_WORKER_KEY", CACHE_DIR / "ltx2_worker.key")).expanduser()
+
+# Pipeline settings: a change in any of these rebuilds the pipeline
+SETTINGS = {
+    "checkpoint_path": "/mnt/c/models/diffusion_models/ltx-2-19b-dev-fp8.safetensors",
+    "distilled_lora": "/mnt/c/models/loras/ltx-2-19b-distilled-lora-384.safetensors",
+    "distilled_lora_strength": 1.0,
+    "spatial_upsampler_path": "/mnt/c/models/upscale_models/ltx-2-spatial-upscaler-x2-1.0.safetensors",
+    "gemma_root": "/mnt/c/models/gemma-for-ltxv",
+    "loras": (),  # extra (path, strength) pairs
+    "enable_fp8": False,
+}
+# Per-job parameters (ltx2_generate_video.py defaults)
+PARAMS = {
+    "prompt": "",
+    "negative_prompt": "blurry, out of focus, overexposed, underexposed, low contrast, distorted proportions, "
+                       "artifacts, flickering, jittery movement, AI artifacts.",
+    "output_path": "~/ComfyUI/output/ltx2_worker.mp4",
+    "seed": 42,
+    "width": 768,
+    "height": 512,
+    "num_frames": 97,
+    "frame_rate": 24.0,
+    "num_inference_steps": 30,
+    "video_cfg_scale": 3.0,
+    "video_stg_scale": 1.0,
+    "video_rescale_scale": 0.7,
+    "enhance_prompt": False,
+    "images": (),  # (image_path, frame_index, strength) for image-to-video
+}
+
+
+def split_job(job: dict) -> tuple:
+    """(settings, params) of a job, with defaults filled in; unknown keys are an error."""
+    unknown = set(job) - set(SETTINGS) - set(PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown job keys: {', '.join(sorted(unknown))}")
+    settings = {k: job.get(k, v) for k, v in SETTINGS.items()}
+    settings["loras"] = tuple(tuple(lora) for lora in settings["loras"])
+    params = {k: job.get(k, v) for k, v in PARAMS.items()}
+    output_path = Path(params["output_path"]).expanduser()
+    if not output_path.is_absolute():
+        # Relative to whose working directory? submit() resolves it on the caller's side
+        raise ValueError(f"output_path must be absolute: {params['output_path']}")
+    params["output_path"] = str(output_path)
+    return settings, params
+
+
+def settings_key(settings: dict) -> tuple:
+    return tuple(sorted(settings.items()))
+
+
+def authkey() -> bytes:
+    """Shared secret for the socket; created (mode 0600) by the first caller."""
+    if not KEY_PATH.is_file():
+        KEY_PATH.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    return KEY_PATH.read_text().strip().encode()
+
+
+def parse_address(address: str):
+    """"host:port" for TCP, anything else is a Unix socket path."""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit() and "/" not in address:
+        return host, int(port)
+    return str(Path(address).expanduser())
+
+
+class LTXPipeline:
+    """The real TI2VidTwoStagesPipeline plus MP4 encoding."""
+
+    def __init__(self, settings: dict):
+        from ltx_core.loader import LoraPathStrengthAndSDOps, LTXV_LORA_COMFY_RENAMING_MAP
+        from ltx_pipelines.ti2vid_two_stages import TI2VidTwoStagesPipeline
+        from ltx_pipelines.utils import model_ledger
+
+        install_embedding_cache(model_ledger)  # repeated prompts skip building Gemma
+        # Settings keep the /mnt/c paths, so a copy finishing staging does not force a reload
+        self.pipeline = TI2VidTwoStagesPipeline(
+            checkpoint_path=staged(settings["checkpoint_path"]),
+            distilled_lora=[LoraPathStrengthAndSDOps(staged(settings["distilled_lora"]),
+                                                     settings["distilled_lora_strength"],
+                                                     LTXV_LORA_COMFY_RENAMING_MAP)],
+            spatial_upsampler_path=staged(settings["spatial_upsampler_path"]),
+            gemma_root=staged(settings["gemma_root"]),
+            loras=[LoraPathStrengthAndSDOps(staged(path), strength, LTXV_LORA_COMFY_RENAMING_MAP)
+                   for path, strength in settings["loras"]],
+            fp8transformer=settings["enable_fp8"],
+        )
+
+    def render(self, params: dict, emit: Callable[..., None]):
+        from ltx_core.components.guiders import MultiModalGuiderParams
+        from ltx_core.model.video_vae import TilingConfig, get_video_chunks_number
+        from ltx_pipelines.utils.constants import AUDIO_SAMPLE_RATE
+        from ltx_pipelines.utils.media_io import encode_video
+
+        tiling_config = TilingConfig.default()
+        video, audio = self.pipeline(
+            prompt=params["prompt"],
+            negative_prompt=params["negative_prompt"],
+            seed=params["seed"],
+            height=params["height"],
+            width=params["width"],
+            num_frames=params["num_frames"],
+            frame_rate=params["frame_rate"],
+            num_inference_steps=params["num_inference_steps"],
+            video_guider_params=MultiModalGuiderParams(
+                cfg_scale=params["video_cfg_scale"], stg_scale=params["video_stg_scale"],
+                rescale_scale=params["video_rescale_scale"], modality_scale=3.0, skip_step=0, stg_blocks=[29]),
+            audio_guider_params=MultiModalGuiderParams(
+                cfg_scale=7.0, stg_scale=1.0, rescale_scale=0.7, modality_scale=3.0, skip_step=0, stg_blocks=[29]),
+            images=[tuple(image) for image in params["images"]],
+            tiling_config=tiling_config,
+            enhance_prompt=params["enhance_prompt"],
+        )
+        emit("encoding")
+        encode_video(video=video, fps=params["frame_rate"], audio=audio, audio_sample_rate=AUDIO_SAMPLE_RATE,
+                     output_path=params["output_path"],
+                     video_chunks_number=get_video_chunks_number(params["num_frames"], tiling_config))
+
+    def close(self):
+        del self.pipeline
+        gc.collect()
+        try:
+            import torch
+            torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+
+class StubPipeline:
+    """Stand-in with the same interface: sleeps for the load and each step, writes a placeholder file."""
+
+    def __init__(self, settings: dict, load_seconds: float = 2.0, step_seconds: float = 0.05):
+        self.settings = settings
+        self.step_seconds = step_seconds
+        time.sleep(load_seconds)
+
+    def render(self, params: dict, emit: Callable[..., None]):
+        total = params["num_inference_steps"]
+        for step in range(1, total + 1):
+            time.sleep(self.step_seconds)
+            emit("progress", step=step, total=total)
+        emit("encoding")
+        Path(params["output_path"]).write_bytes(
+            f"stub LTX-2 render: {params['prompt']!r} seed={params['seed']}\n".encode())
+
+    def close(self):
+        pass
+
+
+class Worker:
+    """Owns the resident pipeline and renders queued jobs one at a time."""
+
+    def __init__(self, factory: Callable[[dict], object], address: str = DEFAULT_ADDRESS,
+                 record_timings: bool = True):
+        self.factory = factory
+        self.address = parse_address(address)
+        self.record_timings = record_timings
+        self.pipeline = None
+        self.key: Optional[tuple] = None
+        self.jobs: "queue.Queue" = queue.Queue()
+        self.current: Optional[dict] = None
+        self.stats = {"jobs": 0, "failed": 0, "loads": 0, "load_seconds": 0.0, "render_seconds": 0.0,
+                      "started": time.time()}
+        self._stop = threading.Event()
+
+    def ensure_pipeline(self, settings: dict, emit) -> float:
+        """Build the pipeline if the settings changed; returns the load seconds (0 when reused)."""
+        key = settings_key(settings)
+        if self.pipeline is not None and key == self.key:
+            emit("reused")
+            return 0.0
+        if self.pipeline is not None:
+            self.pipeline.close()
+            self.pipeline, self.key = None, None
+        emit("loading", checkpoint=Path(settings["checkpoint_path"]).name)
+        start = time.time()
+        self.pipeline = self.factory(settings)
+        self.key = key
+        seconds = time.time() - start
+        self.stats["loads"] += 1
+        self.stats["load_seconds"] += seconds
+        emit("loaded", seconds=round(seconds, 2))
+        return seconds
+
+    def run_job(self, job: dict, emit):
+        try:
+            settings, params = split_job(job)
+            Path(params["output_path"]).parent.mkdir(parents=True, exist_ok=True)
+            load_seconds = self.ensure_pipeline(settings, emit)
+            start = time.time()
+            self.pipeline.render(params, emit)
+            seconds = time.time() - start
+        except Exception as e:
+            self.stats["failed"] += 1
+            emit("error", message=f"{type(e).__name__}: {e}")
+            return
+        self.stats["jobs"] += 1
+        self.stats["render_seconds"] += seconds
+        if self.record_timings:
+            # Same span ltx2_generate_video.py records: the pipeline call and encoding
+            from ltx_planner import record_timing
+            record_timing("two_stage", params["width"], params["height"], params["num_frames"],
+                          params["num_inference_steps"], seconds, warm=not load_seconds)
+        emit("done", output_path=params["output_path"], seconds=round(seconds, 2),
+             load_seconds=round(load_seconds, 2))
+
+    def status(self) -> dict:
+        settings = dict(self.key) if self.key else None
+        stats = {k: round(v, 1) if isinstance(v, float) else v for k, v in self.stats.items() if k != "started"}
+        return dict(stats, queued=self.jobs.qsize(), running=bool(self.current),
+                    checkpoint=Path(settings["checkpoint_path"]).name if settings else None,
+                    uptime=round(time.time() - self.stats["started"]))
+
+    def _handle(self, conn):
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            conn.close()
+            return
+        op = request.get("op")
+        if op == "generate":
+            # Sent before queueing: from then on only the render loop writes to conn
+            self._send(conn, "queued", position=self.jobs.qsize() + 1 + bool(self.current))
+            self.jobs.put((request.get("job", {}), conn))
+            return  # the render loop answers and closes
+        if op == "status":
+            self._send(conn, "status", **self.status())
+        elif op == "stop":
+            self._send(conn, "stopping")
+            self.stop()
+        else:
+            self._send(conn, "error", message=f"Unknown op {op!r}")
+        conn.close()
+
+    @staticmethod
+    def _send(conn, event: str, **data) -> bool:
+        try:
+            conn.send(dict(data, event=event))
+            return True
+        except (OSError, EOFError, ValueError):
+            return False  # client went away; the job still runs to completion
+
+    def _accept(self, listener):
+        while not self._stop.is_set():
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError):
+                if self._stop.is_set():
+                    return
+                continue  # failed authentication or a dropped connection
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        self.jobs.put(None)
+
+    def serve(self):
+        """Accept jobs until stopped; renders run on the calling thread."""
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)  # stale socket from a killed worker
+        listener = Listener(self.address, authkey=authkey())
+        if isinstance(self.address, str):
+            os.chmod(self.address, 0o600)
+        threading.Thread(target=self._accept, args=(listener,), daemon=True).start()
+        print(f"LTX-2 worker listening on {listener.address}")
+        try:
+            while True:
+                item = self.jobs.get()
+                if item is None:
+                    break
+                job, conn = item
+                self.current = job
+                self.run_job(job, lambda event, **data: self._send(conn, event, **data))
+                self.current = None
+                conn.close()
+        finally:
+            listener.close()
+            if self.pipeline is not None:
+                self.pipeline.close()
+            if isinstance(self.address, str) and os.path.exists(self.address):
+                os.unlink(self.address)
+
+
+def _request(request: dict, address: str = DEFAULT_ADDRESS):
+    conn = Client(parse_address(address), authkey=authkey())
+    conn.send(request)
+    return conn
+
+
+def submit(job: dict, address: str = DEFAULT_ADDRESS) -> Iterator[dict]:
+    """Send a job to a running worker and yield its events until done or error.
+
+    A relative output_path is resolved here, against the caller's working directory.
+    """
+    if "output_path" in job:
+        job = dict(job, output_path=str(Path(job["output_path"]).expanduser().resolve()))
+    conn = _request({"op": "generate", "job": job}, address)
+    try:
+        while True:
+            try:
+                event = conn.recv()
+            except EOFError:
+                raise ConnectionError("LTX-2 worker closed the connection") from None
+            yield event
+            if event["event"] in ("done", "error"):
+                return
+    finally:
+        conn.close()
+
+
+def call(op: str, address: str = DEFAULT_ADDRESS) -> dict:
+    conn = _request({"op": op}, address)
+    try:
+        return conn.recv()
+    finally:
+        conn.close()
+
+
+def is_running(address: str = DEFAULT_ADDRESS) -> bool:
+    try:
+        call("status", address)
+        return True
+    except (OSError, EOFError):
+        return False
+
+
+def format_event(event: dict) -> str:
+    data = {k: v for k, v in event.items() if k != "event"}
+    if event["event"] == "progress":
+        return f"  step {data['step']}/{data['total']}"
+    return f"{event['event']:<9} " + " ".join(f"{k}={v}" for k, v in data.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm LTX-2 worker with a resident pipeline")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="Unix socket path or host:port")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("serve", help="Run the worker")
+    p.add_argument("--stub", action="store_true", help="Stand-in pipeline (no GPU, torch or LTX packages)")
+    p.add_argument("--stub-load", type=float, default=2.0, help="Stub pipeline load seconds")
+    p.add_argument("--stub-step", type=float, default=0.05, help="Stub pipeline seconds per step")
+
+    p = sub.add_parser("submit", help="Render a clip on the running worker")
+    p.add_argument("--prompt", required=True)
+    p.add_argument("--negative-prompt")
+    p.add_argument("--output", required=True, help="Output MP4 path")
+    p.add_argument("--seed", type=int)
+    p.add_argument("--width", type=int)
+    p.add_argument("--height", type=int)
+    p.add_argument("--num-frames", type=int)
+    p.add_argument("--frame-rate", type=float)
+    p.add_argument("--steps", type=int, dest="num_inference_steps")
+    p.add_argument("--checkpoint-path")
+    p.add_argument("--distilled-lora")
+    p.add_argument("--lora", nargs=2, action="append", metavar=("PATH", "STRENGTH"), help="Extra LoRA (repeatable)")
+    p.add_argument("--enable-fp8", action="store_true", default=None)
+
+    sub.add_parser("status", help="Show the worker's state")
+    sub.add_parser("stop", help="Stop the worker once the queued jobs are done")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        if args.stub:
+            factory = lambda settings: StubPipeline(settings, args.stub_load, args.stub_step)
+        else:
+            factory = LTXPipeline
+        Worker(factory, args.address, record_timings=not args.stub).serve()
+        return 0
+
+    try:
+        if args.command == "submit":
+            job = {k: v for k, v in vars(args).items() if (k in PARAMS or k in SETTINGS) and v is not None}
+            job["output_path"] = str(Path(args.output).expanduser().resolve())
+            if args.lora:
+                job["loras"] = [(path, float(strength)) for path, strength in args.lora]
+            for event in submit(job, args.address):
+                print(format_event(event))
+            return 0 if event["event"] == "done" else 1
+        print(format_event(call(args.command, args.address)))
+        return 0
+    except (OSError, EOFError) as e:
+        print(f"❌ LTX-2 worker not reachable at {args.address}: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Deadline-aware LTX-2 preset planner
+
+Every finished LTX-2 render appends its wall time and configuration
+(width, height, frames, steps, pipeline) to a timings log. From those
+runs the planner fits a per-pipeline cost model
+
+    seconds = load + a * steps * tokens + b * steps * tokens^2 + c * tokens
+
+where tokens = (width/32) * (height/32) * ((frames - 1)/8 + 1) is the
+size of the latent the transformer attends over. Until enough runs are
+recorded, a prior matching the timings in the skill docs (~10 min for
+121 frames at 720p on the RTX 5090) is used.
+
+Given a deadline, plan() picks the best-quality preset whose predicted
+time (times a safety margin) fits: highest resolution first, then the
+full model over the distilled one, then more steps. Every candidate is
+valid for LTX-2 - frames are 8*K+1 and width/height are multiples of 32
+(64 for the two-stage pipeline, whose first stage runs at half size).
+
+Usage (from another script):
+    from ltx_planner import plan, record_timing
+
+    preset = plan(deadline=300, duration=5.0)   # 5 s clip in 5 minutes
+    ...render with preset["width"], preset["height"], ...
+    record_timing(preset["pipeline"], w, h, frames, steps, seconds)
+
+CLI:
+    python ltx_planner.py plan --deadline 6 --duration 5 [--pipeline comfyui]
+    python ltx_planner.py model
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+TIMINGS_PATH = Path(os.environ.get("LTX_TIMINGS", Path.home() / ".cache" / "comfyui" / "ltx_timings.jsonl")).expanduser()
+
+ASPECT = 16 / 9
+HEIGHTS = (704, 640, 576, 544, 512, 448, 384, 352, 320, 256)  # 720p ... 360p and below
+SAFETY = 1.15  # plan for predicted time * SAFETY
+MIN_RUNS = 4  # runs of a pipeline before its own fit replaces the prior
+
+# pipeline -> size multiple, step choices (best last), quality rank, prior coefficients
+PIPELINES = {
+    # comfyui_ltx2_api.py: single stage in ComfyUI
+    "comfyui": {"multiple": 32, "steps": (12, 16, 20, 25, 30), "rank": 2,
+                "prior": (30.0, 1.6e-3, 0.0, 0.0)},
+    # ltx2_generate_video.py: half-size stage 1 + distilled-LoRA upscale stage 2
+    "two_stage": {"multiple": 64, "steps": (15, 20, 30, 40), "rank": 3,
+                  "prior": (90.0, 0.5e-3, 0.0, 2.0e-3)},
+    # distilled checkpoint, few steps without CFG
+    "distilled": {"multiple": 32, "steps": (4, 6, 8), "rank": 1,
+                  "prior": (30.0, 0.9e-3, 0.0, 0.0)},
+}
+FEATURES = ("load", "steps*tokens", "steps*tokens^2", "tokens")
+
+
+def valid_frames(frames: int) -> int:
+    """Nearest LTX-2 frame count of the form 8*K + 1 (at least 9)."""
+    return max(9, 8 * round((frames - 1) / 8) + 1)
+
+
+def frames_for(duration: float, fps: float = 24.0) -> int:
+    """Smallest valid frame count covering duration seconds."""
+    k = -(-(math.ceil(duration * fps) - 1) // 8)  # ceil division
+    return max(9, 8 * k + 1)
+
+
+def snap(value: float, multiple: int) -> int:
+    return max(multiple, int(round(value / multiple)) * multiple)
+
+
+def tokens(width: int, height: int, frames: int) -> float:
+    return (width / 32) * (height / 32) * ((frames - 1) / 8 + 1)
+
+
+def features(width: int, height: int, frames: int, steps: int) -> List[float]:
+    t = tokens(width, height, frames)
+    return [1.0, steps * t, steps * t * t, t]
+
+
+def record_timing(pipeline: str, width: int, height: int, frames: int, steps: int, seconds: float,
+                  path=None, **extra):
+    """Append one measured run to the timings log."""
+    path = Path(path or TIMINGS_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    record = dict(extra, pipeline=pipeline, width=width, height=height, frames=frames, steps=steps,
+                  seconds=round(seconds, 2), time=time.time())
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def load_timings(path=None) -> List[dict]:
+    path = Path(path or TIMINGS_PATH)
+    if not path.is_file():
+        return []
+    runs = []
+    for line in path.read_text().splitlines():
+        try:
+            runs.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue  # torn write from a killed process
+    return runs
+
+
+def _solve(a: List[List[float]], b: List[float]) -> Optional[List[float]]:
+    """Gaussian elimination with partial pivoting; None if singular."""
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12:
+            return None
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(n):
+            if r != col:
+                f = m[r][col] / m[col][col]
+                m[r] = [x - f * y for x, y in zip(m[r], m[col])]
+    return [m[i][n] / m[i][i] for i in range(n)]
+
+
+def fit(runs: List[dict]) -> Optional[List[float]]:
+    """Least-squares coefficients (non-negative, by dropping negative terms), or None."""
+    active = list(range(len(FEATURES)))
+    rows = [features(r["width"], r["height"], r["frames"], r["steps"]) for r in runs]
+    ys = [r["seconds"] for r in runs]
+    while active and len(runs) >= len(active):
+        # Normal equations with a tiny ridge so near-duplicate runs stay solvable
+        scale = [max(abs(row[j]) for row in rows) or 1.0 for j in active]
+        x = [[row[j] / s for j, s in zip(active, scale)] for row in rows]
+        ata = [[sum(r[i] * r[k] for r in x) + (1e-9 if i == k else 0) for k in range(len(active))]
+               for i in range(len(active))]
+        aty = [sum(r[i] * y for r, y in zip(x, ys)) for i in range(len(active))]
+        solution = _solve(ata, aty)
+        if solution is None:
+            return None
+        coef = [c / s for c, s in zip(solution, scale)]
+        negative = [j for j, c in zip(active, coef) if c < 0]
+        if not negative:
+            full = [0.0] * len(FEATURES)
+            for j, c in zip(active, coef):
+                full[j] = c
+            return full
+        active.remove(negative[-1])
+    return None
+
+
+class CostModel:
+    """Per-pipeline wall-time predictions from recorded runs (or the prior)."""
+
+    def __init__(self, runs: Optional[List[dict]] = None):
+        runs = load_timings() if runs is None else runs
+        self.coef: Dict[str, List[float]] = {}
+        self.source: Dict[str, str] = {}
+        for name, spec in PIPELINES.items():
+            own = [r for r in runs if r.get("pipeline") == name]
+            coef = fit(own) if len(own) >= MIN_RUNS else None
+            self.coef[name] = coef or list(spec["prior"])
+            self.source[name] = f"fit on {len(own)} runs" if coef else f"prior ({len(own)} runs)"
+
+    def predict(self, pipeline: str, width: int, height: int, frames: int, steps: int) -> float:
+        return sum(c * f for c, f in zip(self.coef[pipeline], features(width, height, frames, steps)))
+
+
+def candidates(frames: int, pipelines=None, aspect: float = ASPECT, heights=HEIGHTS) -> List[dict]:
+    """Every valid (pipeline, size, steps) preset for a frame count."""
+    presets = []
+    for name in pipelines or PIPELINES:
+        spec = PIPELINES[name]
+        sizes = {(snap(h * aspect, spec["multiple"]), snap(h, spec["multiple"])) for h in heights}
+        for width, height in sizes:
+            for steps in spec["steps"]:
+                presets.append({"pipeline": name, "width": width, "height": height,
+                                "frames": frames, "steps": steps})
+    return presets
+
+
+def quality(preset: dict) -> tuple:
+    return (preset["width"] * preset["height"], PIPELINES[preset["pipeline"]]["rank"], preset["steps"])
+
+
+def plan(deadline: float, duration: Optional[float] = None, frames: Optional[int] = None, fps: float = 24.0,
+         pipelines=None, aspect: float = ASPECT, model: Optional[CostModel] = None,
+         safety: float = SAFETY) -> dict:
+    """Best-quality preset predicted to finish within deadline seconds.
+
+    If nothing fits, the fastest preset is returned with fits=False.
+    """
+    frames = valid_frames(frames) if frames else frames_for(duration or 5.0, fps)
+    model = model or CostModel()
+    scored = []
+    for preset in candidates(frames, pipelines, aspect):
+        preset["predicted_seconds"] = model.predict(preset["pipeline"], preset["width"], preset["height"],
+                                                    frames, preset["steps"])
+        scored.append(preset)
+    fitting = [p for p in scored if p["predicted_seconds"] * safety <= deadline]
+    if fitting:
+        best = max(fitting, key=quality)
+        best["fits"] = True
+    else:
+        best = min(scored, key=lambda p: p["predicted_seconds"])
+        best["fits"] = False
+    best["fps"] = fps
+    best["model"] = model.source[best["pipeline"]]
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick LTX-2 settings that fit a time budget")
+    parser.add_argument("command", choices=["plan", "model"])
+    parser.add_argument("--deadline", type=float, help="plan: time budget in minutes")
+    parser.add_argument("--duration", type=float, default=5.0, help="plan: clip length in seconds")
+    parser.add_argument("--frames", type=int, help="plan: exact frame count instead of --duration")
+    parser.add_argument("--fps", type=float, default=24.0)
+    parser.add_argument("--pipeline", action="append", choices=list(PIPELINES),
+                        help="plan: restrict to these pipelines (repeatable)")
+    parser.add_argument("--aspect", type=float, default=ASPECT, help="plan: width / height")
+    args = parser.parse_args()
+
+    model = CostModel()
+    if args.command == "model":
+        for name in PIPELINES:
+            coef = ", ".join(f"{f}={c:.3g}" for f, c in zip(FEATURES, model.coef[name]))
+            print(f"{name:<10} {model.source[name]:<22} {coef}")
+        return 0
+
+    if args.deadline is None:
+        parser.error("plan needs --deadline")
+    p = plan(args.deadline * 60, args.duration, args.frames, args.fps, args.pipeline, args.aspect, model)
+    status = "fits" if p["fits"] else "does NOT fit - fastest option"
+    print(f"{p['pipeline']}: {p['width']}x{p['height']}, {p['frames']} frames "
+          f"({p['frames'] / p['fps']:.1f}s), {p['steps']} steps")
+    print(f"Predicted {p['predicted_seconds'] / 60:.1f} min ({status}; {p['model']})")
+    print(json.dumps({k: p[k] for k in ("pipeline", "width", "height", "frames", "steps")}))
+    return 0 if p["fits"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
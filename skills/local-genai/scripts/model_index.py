@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Safetensors header index of the model library, with VRAM-fit estimates
+
+A .safetensors file starts with an 8-byte length and a JSON header that
+lists every tensor's dtype, shape and byte range. Reading only that
+header (through mmap - the weights are never touched, which matters for
+20 GB files on /mnt/c) gives, per file:
+
+    tensors     number of tensors
+    dtypes      parameters per dtype (F8_E4M3, BF16, ...)
+    params      total parameter count
+    bytes       size of the tensor data = resident size when loaded as stored
+
+Model directories (the Gemma root, diffusers folders) are summed over
+their .safetensors files. Entries are cached in an index file and only
+re-read when a file's size or mtime changes.
+
+fit() answers "does checkpoint + encoder + upsampler + LoRA fit in N GB?"
+before a job is launched: the sum of the components' resident sizes plus
+an allowance for activations, and - for pipelines like LTX-2 that load
+one component at a time - whether the largest one fits on its own.
+
+Usage (from another script):
+    from model_index import ModelIndex, fit
+
+    index = ModelIndex()
+    info = index.info("/mnt/c/models/diffusion_models/ltx-2-19b-dev-fp8.safetensors")
+    plan = fit([checkpoint, gemma_root, upsampler, lora], vram_gb=32)
+    if not plan["fits_sequential"]:
+        ...
+
+CLI:
+    python model_index.py scan                  # index everything under /mnt/c/models
+    python model_index.py show /mnt/c/models/gemma-for-ltxv
+    python model_index.py fit --preset ltx2 --vram 32
+    python model_index.py fit ckpt.safetensors encoder_dir --vram 24
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from model_staging import SOURCE_ROOT
+
+INDEX_PATH = Path(os.environ.get("MODEL_INDEX_PATH",
+                                 Path.home() / ".cache" / "comfyui" / "model_index.json")).expanduser()
+ACTIVATION_RESERVE_GB = 4.0  # latents, attention buffers and the CUDA context
+MAX_HEADER_BYTES = 100 * 1024 * 1024  # the format's own limit
+
+# Element size in bytes per safetensors dtype
+DTYPE_BYTES = {
+    "F64": 8, "I64": 8, "U64": 8, "F32": 4, "I32": 4, "U32": 4, "F16": 2, "BF16": 2, "I16": 2, "U16": 2,
+    "F8_E4M3": 1, "F8_E5M2": 1, "I8": 1, "U8": 1, "BOOL": 1,
+}
+
+# Components of the LTX-2 two-stage pipeline (ltx2_generate_video.py defaults)
+PRESETS = {
+    "ltx2": [
+        "/mnt/c/models/diffusion_models/ltx-2-19b-dev-fp8.safetensors",
+        "/mnt/c/models/gemma-for-ltxv",
+        "/mnt/c/models/upscale_models/ltx-2-spatial-upscaler-x2-1.0.safetensors",
+        "/mnt/c/models/loras/ltx-2-19b-distilled-lora-384.safetensors",
+    ],
+}
+
+
+def safetensors_header(path) -> dict:
+    """The JSON header of a .safetensors file, read through mmap without touching the weights."""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            (length,) = struct.unpack("<Q", mapped[:8])
+            if length > min(MAX_HEADER_BYTES, len(mapped) - 8):
+                raise ValueError(f"{path}: not a safetensors file (header length {length})")
+            return json.loads(mapped[8:8 + length])
+
+
+def header_info(header: dict) -> dict:
+    """Tensor count, parameters per dtype, total parameters and data bytes of one header."""
+    dtypes: Dict[str, int] = {}
+    data_bytes = 0
+    for name, tensor in header.items():
+        if name == "__metadata__":
+            continue
+        count = 1
+        for dim in tensor["shape"]:
+            count *= dim
+        dtypes[tensor["dtype"]] = dtypes.get(tensor["dtype"], 0) + count
+        begin, end = tensor["data_offsets"]
+        data_bytes += end - begin
+    return {"tensors": sum(1 for name in header if name != "__metadata__"), "dtypes": dtypes,
+            "params": sum(dtypes.values()), "bytes": data_bytes}
+
+
+def merge_info(infos: List[dict]) -> dict:
+    dtypes: Dict[str, int] = {}
+    for info in infos:
+        for dtype, count in info["dtypes"].items():
+            dtypes[dtype] = dtypes.get(dtype, 0) + count
+    return {"tensors": sum(i["tensors"] for i in infos), "dtypes": dtypes,
+            "params": sum(i["params"] for i in infos), "bytes": sum(i["bytes"] for i in infos),
+            "files": sum(i.get("files", 1) for i in infos)}
+
+
+def resident_bytes(info: dict, load_dtype: Optional[str] = None) -> int:
+    """Memory the weights take once loaded: as stored, or cast to load_dtype (e.g. "BF16")."""
+    if load_dtype is None:
+        return info["bytes"]
+    return info["params"] * DTYPE_BYTES[load_dtype]
+
+
+class ModelIndex:
+    """Header facts for every .safetensors file, cached by size and mtime."""
+
+    def __init__(self, path=None):
+        self.path = Path(path or INDEX_PATH)
+        self.entries: Dict[str, dict] = {}
+        if self.path.is_file():
+            try:
+                self.entries = json.loads(self.path.read_text())
+            except json.JSONDecodeError:
+                self.entries = {}  # rebuilt on the next scan
+        self._dirty = False
+
+    def file_info(self, path: Path) -> dict:
+        st = path.stat()
+        key = str(path)
+        entry = self.entries.get(key)
+        if entry and (entry["size"], entry["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+            return entry
+        entry = dict(header_info(safetensors_header(path)), size=st.st_size, mtime_ns=st.st_mtime_ns,
+                     indexed=time.time())
+        self.entries[key] = entry
+        self._dirty = True
+        return entry
+
+    def info(self, path) -> Optional[dict]:
+        """Facts for a .safetensors file or a model directory (summed), None if there are none."""
+        path = Path(path).expanduser().resolve()
+        if path.is_file():
+            return dict(self.file_info(path), files=1) if path.suffix == ".safetensors" else None
+        if not path.is_dir():
+            return None
+        files = sorted(path.rglob("*.safetensors"))
+        return merge_info([self.file_info(f) for f in files]) if files else None
+
+    def scan(self, root=None) -> int:
+        """Index every .safetensors file under root; drops entries of deleted files. Returns files seen."""
+        root = Path(root or SOURCE_ROOT).expanduser().resolve()
+        seen = 0
+        for path in root.rglob("*.safetensors"):
+            try:
+                self.file_info(path)
+                seen += 1
+            except (OSError, ValueError):
+                continue
+        for key in [k for k in self.entries if k.startswith(str(root)) and not Path(k).exists()]:
+            del self.entries[key]
+            self._dirty = True
+        return seen
+
+    def save(self):
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.part")
+        tmp.write_text(json.dumps(self.entries))
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+
+def gpu_vram_bytes() -> Optional[int]:
+    """Total memory of the first GPU (nvidia-smi), or None without one."""
+    try:
+        result = subprocess.run(["nvidia-smi", "--query-gpu=memory.total", "--format=csv,noheader,nounits"],
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0 or not result.stdout.strip():
+        return None
+    return int(float(result.stdout.split()[0])) * 1024 ** 2
+
+
+def fit(components, vram_gb: Optional[float] = None, reserve_gb: float = ACTIVATION_RESERVE_GB,
+        load_dtypes: Optional[Dict[str, str]] = None, index: Optional[ModelIndex] = None) -> dict:
+    """Whether the components fit in VRAM all at once and one at a time.
+
+    components are files or model directories; load_dtypes maps a
+    component to the dtype it is cast to when loaded (default: as stored).
+    Components without safetensors weights are listed as unknown.
+    """
+    index = index or ModelIndex()
+    vram = vram_gb * 1024 ** 3 if vram_gb else gpu_vram_bytes()
+    reserve = reserve_gb * 1024 ** 3
+    rows, unknown = [], []
+    for component in components:
+        info = index.info(component)
+        if info is None:
+            unknown.append(str(component))
+            continue
+        dtype = (load_dtypes or {}).get(str(component))
+        rows.append({"path": str(component), "params": info["params"], "dtypes": info["dtypes"],
+                     "bytes": resident_bytes(info, dtype)})
+    index.save()
+    total = sum(r["bytes"] for r in rows)
+    largest = max((r["bytes"] for r in rows), default=0)
+    return {
+        "components": rows,
+        "unknown": unknown,
+        "total_bytes": total,
+        "largest_bytes": largest,
+        "reserve_bytes": reserve,
+        "vram_bytes": vram,
+        "fits_all": vram is not None and total + reserve <= vram,
+        "fits_sequential": vram is not None and largest + reserve <= vram,
+    }
+
+
+def format_params(count: int) -> str:
+    return f"{count / 1e9:.2f}B" if count >= 1e8 else f"{count / 1e6:.1f}M"
+
+
+def format_dtypes(dtypes: Dict[str, int]) -> str:
+    total = sum(dtypes.values()) or 1
+    return ", ".join(f"{d} {100 * c / total:.0f}%" for d, c in sorted(dtypes.items(), key=lambda x: -x[1]))
+
+
+def format_fit(plan: dict) -> List[str]:
+    lines = [f"  {r['bytes'] / 1024 ** 3:6.2f} GB  {format_params(r['params']):>8}  {Path(r['path']).name}"
+             f"  ({format_dtypes(r['dtypes'])})" for r in plan["components"]]
+    lines += [f"  {'?':>6}         {Path(p).name} (no safetensors weights found)" for p in plan["unknown"]]
+    if plan["vram_bytes"] is None:
+        lines.append(f"  Total {plan['total_bytes'] / 1024 ** 3:.1f} GB + {plan['reserve_bytes'] / 1024 ** 3:.0f} GB "
+                     "reserve (no GPU found, pass --vram)")
+        return lines
+    vram = plan["vram_bytes"] / 1024 ** 3
+    lines.append(f"  All resident: {(plan['total_bytes'] + plan['reserve_bytes']) / 1024 ** 3:.1f} / {vram:.0f} GB "
+                 + ("✓" if plan["fits_all"] else "✗"))
+    lines.append(f"  One at a time: {(plan['largest_bytes'] + plan['reserve_bytes']) / 1024 ** 3:.1f} / {vram:.0f} GB "
+                 + ("✓" if plan["fits_sequential"] else "✗ (will not fit even with offloading between stages)"))
+    return lines
+
+
+def preflight(components, vram_gb: Optional[float] = None, log=None) -> bool:
+    """Log the fit of a pipeline's components before loading them; False only if it cannot fit at all.
+
+    Index errors never block a run - the estimate is advisory.
+    """
+    log = log or logging.getLogger(__name__)
+    try:
+        plan = fit(components, vram_gb)
+    except (OSError, ValueError) as e:
+        log.warning(f"VRAM estimate unavailable: {e}")
+        return True
+    for line in format_fit(plan):
+        log.info(line)
+    if plan["vram_bytes"] is not None and not plan["fits_all"] and plan["fits_sequential"]:
+        log.warning("Components do not fit in VRAM together; relying on the pipeline freeing each stage")
+    if plan["vram_bytes"] is not None and not plan["fits_sequential"]:
+        log.error(f"{Path(max(plan['components'], key=lambda r: r['bytes'])['path']).name} alone needs "
+                  f"{(plan['largest_bytes'] + plan['reserve_bytes']) / 1024 ** 3:.1f} GB of "
+                  f"{plan['vram_bytes'] / 1024 ** 3:.0f} GB VRAM")
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index safetensors headers and check VRAM fit")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("scan", help="Index every .safetensors file under the models root")
+    p.add_argument("--root", default=str(SOURCE_ROOT))
+    p = sub.add_parser("show", help="Header facts for files or model directories")
+    p.add_argument("paths", nargs="+")
+    p = sub.add_parser("fit", help="Does this set of components fit in VRAM?")
+    p.add_argument("paths", nargs="*")
+    p.add_argument("--preset", choices=sorted(PRESETS), help="Use a pipeline's default components")
+    p.add_argument("--vram", type=float, default=None, help="GB of VRAM (default: the GPU's total)")
+    p.add_argument("--reserve", type=float, default=ACTIVATION_RESERVE_GB, help="GB kept for activations")
+    args = parser.parse_args()
+
+    index = ModelIndex()
+    if args.command == "scan":
+        start = time.time()
+        seen = index.scan(args.root)
+        index.save()
+        total = sum(e["bytes"] for k, e in index.entries.items() if k.startswith(str(Path(args.root).resolve())))
+        print(f"Indexed {seen} files ({total / 1024 ** 3:.0f} GB of weights) in {time.time() - start:.1f}s "
+              f"-> {index.path}")
+        return 0
+    if args.command == "show":
+        for path in args.paths:
+            info = index.info(path)
+            if info is None:
+                print(f"✗ {path}: no safetensors weights")
+                continue
+            print(f"{path}\n  {info['files']} file(s), {info['tensors']} tensors, {format_params(info['params'])} "
+                  f"params, {info['bytes'] / 1024 ** 3:.2f} GB\n  {format_dtypes(info['dtypes'])}")
+        index.save()
+        return 0
+
+    paths = (PRESETS[args.preset] if args.preset else []) + args.paths
+    if not paths:
+        parser.error("fit needs component paths or --preset")
+    plan = fit(paths, args.vram, args.reserve, index=index)
+    print("\n".join(format_fit(plan)))
+    return 0 if plan["fits_sequential"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
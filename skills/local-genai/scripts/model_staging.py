@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Local NVMe staging cache for model files on /mnt/c
+
+The checkpoints live under /mnt/c/models, a Windows drive reached through
+WSL's 9P file system, which reads a 19B checkpoint several times slower
+than native ext4. This module keeps copies of the model files that are
+actually used in a local cache directory and resolves model paths to
+them:
+
+    staged(path)    the local copy of path (a file or a model directory
+                    such as the Gemma root) when it is complete and still
+                    matches the source, otherwise path itself
+
+Staging is explicit: `model_staging.py stage` (e.g. between render
+sessions) fills the cache, and scripts only pick up what is there. With
+MODEL_STAGE=1, staged() also starts a detached `stage` process for a
+missing path. That copy competes with the render's own model loads -
+ionice cannot help, since it has no effect on reads from drvfs - so
+it is off by default. Each file is copied to a .part file while its
+SHA-256 is computed, then renamed into place. A staged copy is used only
+while the source still has the size and mtime it was copied with; the
+stored hash lets `verify` check the copies themselves.
+
+The cache has a size budget with least-recently-used eviction, tracked in
+an SQLite index like the result cache. Each file row records the model
+it belongs to (the file or directory passed to stage()), and a model is
+staged and evicted as a whole: a directory is staged only if all of it
+fits, and evicting it drops every shard, never just some of them.
+
+Usage (from another script):
+    from model_staging import staged
+
+    CHECKPOINT = staged("/mnt/c/models/diffusion_models/ltx-2-19b-dev-fp8.safetensors")
+
+CLI:
+    python model_staging.py stage /mnt/c/models/diffusion_models/ltx-2-19b-dev-fp8.safetensors
+    python model_staging.py status
+    python model_staging.py verify
+    python model_staging.py evict --max-gb 100
+"""
+
+import argparse
+import fcntl
+import hashlib
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Collection, List, Optional
+
+SOURCE_ROOT = Path(os.environ.get("COMFYUI_MODELS_ROOT", "/mnt/c/models"))
+STAGE_ROOT = Path(os.environ.get("MODEL_STAGE_DIR", Path.home() / ".cache" / "comfyui" / "models")).expanduser()
+DEFAULT_MAX_BYTES = int(float(os.environ.get("MODEL_STAGE_GB", "120")) * 1024 ** 3)
+AUTO_STAGE = os.environ.get("MODEL_STAGE", "0") not in ("", "0")
+CHUNK = 16 * 1024 * 1024
+FREE_SPACE_RESERVE = 10 * 1024 ** 3  # never fill the local disk beyond this
+
+
+def source_files(path: Path) -> List[Path]:
+    return [path] if path.is_file() else sorted(p for p in path.rglob("*") if p.is_file())
+
+
+class StagingCache:
+    """Local copies of model files under SOURCE_ROOT, with LRU eviction."""
+
+    def __init__(self, root=None, source_root=None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root or STAGE_ROOT).expanduser()
+        self.source_root = Path(source_root or SOURCE_ROOT)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(self.root / "index.db", timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                rel TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                staged REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                model TEXT
+            );
+        """)
+        if "model" not in {row[1] for row in self.db.execute("PRAGMA table_info(files)")}:
+            with self.db:  # index from before models were tracked: each file is its own model
+                self.db.execute("ALTER TABLE files ADD COLUMN model TEXT")
+
+    def relative(self, path) -> Optional[str]:
+        """Path relative to the source root, or None for paths outside it."""
+        try:
+            return Path(path).expanduser().resolve().relative_to(self.source_root.resolve()).as_posix()
+        except ValueError:
+            return None
+
+    def local(self, rel: str) -> Path:
+        return self.root / "files" / rel
+
+    def _valid(self, rel: str, source: Path) -> bool:
+        row = self.db.execute("SELECT size, mtime_ns FROM files WHERE rel = ?", (rel,)).fetchone()
+        if row is None or not self.local(rel).is_file():
+            return False
+        st = source.stat()
+        return (row[0], row[1]) == (st.st_size, st.st_mtime_ns) and self.local(rel).stat().st_size == st.st_size
+
+    def lookup(self, path) -> Optional[Path]:
+        """The staged copy of a file or directory if every file is staged and current, else None."""
+        rel = self.relative(path)
+        source = Path(path).expanduser()
+        if rel is None or not source.exists():
+            return None
+        files = source_files(source)
+        rels = [self.relative(f) for f in files]
+        if not files or not all(self._valid(r, f) for r, f in zip(rels, files)):
+            return None
+        with self.db:
+            self.db.executemany("UPDATE files SET last_used = ?, hits = hits + 1 WHERE rel = ?",
+                                [(time.time(), r) for r in rels])
+        return self.local(rel)
+
+    def missing(self, path) -> List[Path]:
+        """Source files of path that have no current staged copy."""
+        source = Path(path).expanduser()
+        if self.relative(source) is None or not source.exists():
+            return []
+        return [f for f in source_files(source) if not self._valid(self.relative(f), f)]
+
+    def stage_file(self, source: Path, model: Optional[str] = None) -> Optional[Path]:
+        """Copy one file into the cache (hashing as it goes). Skips files that do not fit.
+
+        model is the staged model (relative path) the file belongs to, by
+        default the file itself; that model is not evicted to make room.
+        """
+        rel = self.relative(source)
+        if rel is None:
+            raise ValueError(f"{source} is not under {self.source_root}")
+        dest = self.local(rel)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        with open(dest.with_name(f".{dest.name}.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # one copier per file across processes
+            if self._valid(rel, source):
+                return dest
+            st = source.stat()
+            if st.st_size > self.max_bytes:
+                return None
+            model = model or rel
+            self.evict(self.max_bytes - st.st_size, keep={model})
+            if shutil.disk_usage(self.root).free - st.st_size < FREE_SPACE_RESERVE:
+                return None
+
+            digest = hashlib.sha256()
+            tmp = dest.with_name(f".{dest.name}.part")
+            with open(source, "rb") as src, open(tmp, "wb") as out:
+                while True:
+                    chunk = src.read(CHUNK)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+            if source.stat().st_mtime_ns != st.st_mtime_ns:
+                tmp.unlink()
+                return None  # source changed while copying
+            os.replace(tmp, dest)
+            now = time.time()
+            with self.db:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO files (rel, size, mtime_ns, sha256, staged, last_used, model) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (rel, st.st_size, st.st_mtime_ns, digest.hexdigest(), now, now, model),
+                )
+            return dest
+
+    def stage(self, path) -> Optional[Path]:
+        """Stage a file or a whole model directory. Returns the staged path once complete.
+
+        A directory that cannot fit as a whole is not staged at all, rather
+        than evicting other models (or its own files) for a partial copy.
+        """
+        missing = self.missing(path)
+        if missing:
+            files = source_files(Path(path).expanduser())
+            if sum(f.stat().st_size for f in files) > self.max_bytes:
+                return None
+            model = self.relative(path)
+            for f in missing:
+                if self.stage_file(f, model=model) is None:
+                    return None
+        return self.lookup(path)
+
+    def _delete(self, rel: str):
+        self.local(rel).unlink(missing_ok=True)
+        self.db.execute("DELETE FROM files WHERE rel = ?", (rel,))
+
+    def evict(self, max_bytes: Optional[int] = None, keep: Collection[str] = ()) -> int:
+        """Drop least recently used models until the cache fits. Returns files removed.
+
+        A model directory goes as a whole; keep names models that stay. A
+        removed file that a running job has open stays readable until it is
+        closed (Linux keeps the inode), so eviction never breaks a load.
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM files").fetchone()[0]
+        removed = 0
+        with self.db:
+            for model, size in self.db.execute(
+                    "SELECT COALESCE(model, rel) AS m, SUM(size) FROM files GROUP BY m "
+                    "ORDER BY MAX(last_used)").fetchall():
+                if total <= limit:
+                    break
+                if model in keep:
+                    continue
+                for (rel,) in self.db.execute("SELECT rel FROM files WHERE COALESCE(model, rel) = ?",
+                                              (model,)).fetchall():
+                    self._delete(rel)
+                    removed += 1
+                total -= size
+        return removed
+
+    def verify(self, rehash: bool = True) -> List[str]:
+        """Files whose staged copy is missing, stale or (with rehash) corrupt; they are dropped."""
+        bad = []
+        for rel, sha in self.db.execute("SELECT rel, sha256 FROM files").fetchall():
+            source = self.source_root / rel
+            ok = source.is_file() and self._valid(rel, source)
+            if ok and rehash:
+                digest = hashlib.sha256()
+                with open(self.local(rel), "rb") as f:
+                    for chunk in iter(lambda: f.read(CHUNK), b""):
+                        digest.update(chunk)
+                ok = digest.hexdigest() == sha
+            if not ok:
+                bad.append(rel)
+                with self.db:
+                    self._delete(rel)
+        return bad
+
+    def status(self) -> dict:
+        count, size, hits = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM files").fetchone()
+        return {"files": count, "bytes": size, "max_bytes": self.max_bytes, "hits": hits,
+                "free_bytes": shutil.disk_usage(self.root).free}
+
+
+_cache: Optional[StagingCache] = None
+_queued = set()
+
+
+def get_cache() -> StagingCache:
+    global _cache
+    if _cache is None:
+        _cache = StagingCache()
+    return _cache
+
+
+def stage_in_background(paths) -> Optional[subprocess.Popen]:
+    """Copy paths into the cache from a detached process."""
+    paths = [str(p) for p in paths if str(p) not in _queued]
+    if not paths:
+        return None
+    _queued.update(paths)
+    command = [sys.executable, str(Path(__file__).resolve()), "stage", "--quiet", *paths]
+    log = open(STAGE_ROOT / "staging.log", "a") if STAGE_ROOT.is_dir() else subprocess.DEVNULL
+    return subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True)
+
+
+def staged(path, stage: bool = AUTO_STAGE) -> str:
+    """The staged copy of a model file/directory under /mnt/c if present, else path.
+
+    With stage (MODEL_STAGE=1) a missing copy is queued in the background.
+    """
+    try:
+        cache = get_cache()
+        local = cache.lookup(path)
+        if local is not None:
+            return str(local)
+        if stage and cache.missing(path):
+            stage_in_background([path])
+    except (OSError, sqlite3.Error):
+        pass  # staging is an optimisation; the source path always works
+    return str(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stage model files from /mnt/c onto the local disk")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("stage", help="Copy files or model directories into the cache now")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--quiet", action="store_true")
+    sub.add_parser("status", help="Show cache size and contents")
+    p = sub.add_parser("verify", help="Re-hash staged copies and drop stale or corrupt ones")
+    p.add_argument("--quick", action="store_true", help="Only compare size and mtime")
+    p = sub.add_parser("evict", help="Shrink the cache")
+    p.add_argument("--max-gb", type=float, default=None)
+    args = parser.parse_args()
+
+    cache = get_cache()
+    if args.command == "stage":
+        for path in args.paths:
+            start = time.time()
+            size = sum(f.stat().st_size for f in cache.missing(path))
+            local = cache.stage(path)
+            if not args.quiet or local is None:
+                rate = size / 1024 ** 2 / max(time.time() - start, 1e-6)
+                print(f"{'✓' if local else '✗'} {path} -> {local or 'not staged (budget or disk space)'}"
+                      + (f" ({size / 1024 ** 3:.1f} GB at {rate:.0f} MB/s)" if local and size else ""))
+    elif args.command == "status":
+        s = cache.status()
+        print(f"Staged: {s['files']} files, {s['bytes'] / 1024 ** 3:.1f} / {s['max_bytes'] / 1024 ** 3:.0f} GB "
+              f"({s['hits']} hits, {s['free_bytes'] / 1024 ** 3:.0f} GB free on {cache.root})")
+        for rel, size, last_used in cache.db.execute(
+                "SELECT rel, size, last_used FROM files ORDER BY last_used DESC").fetchall():
+            print(f"  {size / 1024 ** 3:7.2f} GB  {time.strftime('%Y-%m-%d %H:%M', time.localtime(last_used))}  {rel}")
+    elif args.command == "verify":
+        bad = cache.verify(rehash=not args.quick)
+        print(f"{len(bad)} stale or corrupt copies dropped" + "".join(f"\n  {rel}" for rel in bad))
+    else:
+        max_bytes = int(args.max_gb * 1024 ** 3) if args.max_gb is not None else None
+        print(f"Evicted {cache.evict(max_bytes)} files")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Per-node execution timing from the ComfyUI WebSocket stream
+
+ComfyUI announces every node it starts ("executing" with the node id),
+every node it skips because the result is cached ("execution_cached"),
+and the end of the prompt ("executing" with node None). A NodeTimer is
+fed those events and turns them into one record per node - class_type,
+seconds, cached - so we can see whether a job spends its time loading
+the checkpoint, encoding text, sampling, in VAEDecodeTiled or in
+SaveAnimatedWEBP. The clients (comfyui_client, comfyui_async and
+comfyui_ltx2_api.track_progress) append the records of every prompt
+they follow to a JSONL metrics file.
+
+Record lines:
+    {"kind": "node", "prompt_id", "workflow", "node", "class_type", "start", "seconds", "cached"}
+    {"kind": "prompt", "prompt_id", "workflow", "start", "queue_seconds", "run_seconds", "nodes", "cached"}
+
+"workflow" is a readable label: the model files the workflow loads, or
+a hash of its node classes when it loads none.
+
+CLI:
+    python node_timing.py report [--by class|node] [--workflow SUBSTR] [--since HOURS]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from job_scheduler import model_files
+
+METRICS_PATH = Path(os.environ.get("COMFYUI_NODE_METRICS",
+                                   Path.home() / ".cache" / "comfyui" / "node_metrics.jsonl")).expanduser()
+
+
+def workflow_label(workflow: Optional[dict]) -> str:
+    if not workflow:
+        return "unknown"
+    models = sorted({Path(filename).stem for _, filename in model_files(workflow)})
+    if models:
+        return "+".join(models)
+    shape = ",".join(sorted(node.get("class_type", "") for node in workflow.values()))
+    return "shape-" + hashlib.sha1(shape.encode()).hexdigest()[:8]
+
+
+class NodeTimer:
+    """Turns the WebSocket events of one prompt into per-node timings."""
+
+    def __init__(self, prompt_id: str, workflow: Optional[dict] = None, submitted_at: Optional[float] = None):
+        self.prompt_id = prompt_id
+        self.workflow = workflow or {}
+        self.label = workflow_label(workflow)
+        self.submitted_at = submitted_at
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.nodes: List[dict] = []
+        self._current = None  # (node id, class_type, start)
+
+    def _class_type(self, node: str, data: dict) -> str:
+        # Expanded/subgraph nodes are reported with ids not in the submitted graph
+        for candidate in (node, data.get("display_node")):
+            if candidate is not None and str(candidate) in self.workflow:
+                return self.workflow[str(candidate)].get("class_type", "?")
+        return "?"
+
+    def _close(self, now: float):
+        if self._current:
+            node, class_type, start = self._current
+            self.nodes.append({"node": node, "class_type": class_type, "start": start,
+                               "seconds": now - start, "cached": False})
+            self._current = None
+
+    def feed(self, msg_type: str, data: dict, now: Optional[float] = None):
+        now = now or time.time()
+        if msg_type == "execution_start":
+            self.started_at = now
+        elif msg_type == "execution_cached":
+            for node in data.get("nodes") or []:
+                self.nodes.append({"node": str(node), "class_type": self._class_type(str(node), data),
+                                   "start": now, "seconds": 0.0, "cached": True})
+        elif msg_type == "executing":
+            self._close(now)
+            if self.started_at is None:
+                self.started_at = now
+            node = data.get("node")
+            if node is None:
+                self.finished_at = now
+            else:
+                self._current = (str(node), self._class_type(str(node), data), now)
+        elif msg_type in ("execution_success", "execution_error", "execution_interrupted"):
+            self._close(now)
+            self.finished_at = self.finished_at or now
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def records(self) -> List[dict]:
+        base = {"prompt_id": self.prompt_id, "workflow": self.label}
+        lines = [dict(base, kind="node", **n) for n in self.nodes]
+        if self.started_at is not None:
+            lines.append(dict(
+                base,
+                kind="prompt",
+                start=self.started_at,
+                queue_seconds=self.started_at - self.submitted_at if self.submitted_at else None,
+                run_seconds=(self.finished_at - self.started_at) if self.finished_at else None,
+                nodes=sum(not n["cached"] for n in self.nodes),
+                cached=sum(n["cached"] for n in self.nodes),
+            ))
+        return lines
+
+    def write(self, path=None):
+        """Append this prompt's records to the metrics file."""
+        lines = self.records()
+        if not lines:
+            return
+        path = Path(path or METRICS_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a") as f:
+            f.write("".join(json.dumps(line) + "\n" for line in lines))
+
+
+def load_metrics(path=None, since: Optional[float] = None) -> List[dict]:
+    path = Path(path or METRICS_PATH)
+    if not path.is_file():
+        return []
+    records = []
+    for line in path.read_text().splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if since is None or record.get("start", 0) >= since:
+            records.append(record)
+    return records
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def report(records: List[dict], by: str = "class") -> List[dict]:
+    """Aggregate node records per (workflow, class_type or node id)."""
+    groups: Dict[tuple, List[dict]] = {}
+    for r in records:
+        if r.get("kind") == "node":
+            key = (r["workflow"], r["class_type"] if by == "class" else f"{r['node']} {r['class_type']}")
+            groups.setdefault(key, []).append(r)
+    totals: Dict[str, float] = {}
+    for (workflow, _), rs in groups.items():
+        totals[workflow] = totals.get(workflow, 0.0) + sum(r["seconds"] for r in rs)
+
+    rows = []
+    for (workflow, name), rs in groups.items():
+        run = [r["seconds"] for r in rs if not r["cached"]]
+        rows.append({
+            "workflow": workflow,
+            "name": name,
+            "count": len(rs),
+            "cached": len(rs) - len(run),
+            "p50": percentile(run, 50) if run else 0.0,
+            "p95": percentile(run, 95) if run else 0.0,
+            "total": sum(run),
+            "share": sum(run) / totals[workflow] if totals[workflow] else 0.0,
+        })
+    return sorted(rows, key=lambda r: (r["workflow"], -r["total"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-node ComfyUI timing report")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("--by", choices=["class", "node"], default="class",
+                        help="Group by node class_type or by individual node id")
+    parser.add_argument("--workflow", help="Only workflows whose label contains this")
+    parser.add_argument("--since", type=float, help="Only the last N hours")
+    parser.add_argument("--metrics", default=None, help=f"Metrics file (default: {METRICS_PATH})")
+    args = parser.parse_args()
+
+    since = time.time() - args.since * 3600 if args.since else None
+    records = load_metrics(args.metrics, since)
+    if args.workflow:
+        records = [r for r in records if args.workflow in r.get("workflow", "")]
+    if not records:
+        print("No metrics recorded")
+        return 1
+
+    current = None
+    for row in report(records, args.by):
+        if row["workflow"] != current:
+            current = row["workflow"]
+            prompts = [r for r in records if r.get("kind") == "prompt" and r["workflow"] == current]
+            queue = [r["queue_seconds"] for r in prompts if r.get("queue_seconds") is not None]
+            print(f"\n{current}  ({len(prompts)} prompts"
+                  + (f", queue wait p50 {percentile(queue, 50):.1f}s" if queue else "") + ")")
+            print(f"  {'node':<32} {'runs':>5} {'cached':>6} {'p50 s':>8} {'p95 s':>8} {'share':>6}")
+        print(f"  {row['name'][:32]:<32} {row['count']:>5} {row['cached']:>6} "
+              f"{row['p50']:>8.2f} {row['p95']:>8.2f} {100 * row['share']:>5.1f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
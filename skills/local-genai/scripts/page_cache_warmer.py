@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Predictive page-cache warming for the next job's model files
+
+While ComfyUI runs one job, the scheduler already knows which job comes
+next and which model files it loads. The warmer reads those files into
+the OS page cache in the background, so the swap to the next model is
+served from RAM instead of /mnt/c or the disk:
+
+    read      sequential reads into a scratch buffer, capped at
+              --mb-s so the running job's own I/O is not starved
+              (default; works on 9P/WSL mounts as well)
+    fadvise   posix_fadvise(WILLNEED): the kernel reads ahead at its own
+              pace, no bandwidth cap
+
+A file is skipped when it is already resident, or when reading it would
+not fit in the reclaimable memory left after the running job's model
+files (MemAvailable minus their resident bytes minus a headroom) - it
+would only evict the model that is in use.
+
+Residency is measured with mincore(2). When a warmed job starts, the
+warmer checks how much of its files is still resident and credits the
+bytes that became resident through warming (residency now minus what was
+already cached before the read) at the cold read rate it measured - the
+load time saved. Only files read to the end count as warmed; one whose
+read was cut short by a schedule change is warmed again when it is next
+wanted.
+
+Usage (from another script):
+    from page_cache_warmer import PageCacheWarmer
+
+    warmer = PageCacheWarmer(bandwidth_mb_s=300)
+    scheduler = ModelAffinityScheduler(client, warmer=warmer)   # warms the upcoming job
+    ...
+    print(warmer.report())
+
+CLI:
+    python page_cache_warmer.py warm /mnt/c/models/checkpoints/flux1-dev-fp8.safetensors --mb-s 300
+    python page_cache_warmer.py status flux.json qwen.json     # resident share of their model files
+"""
+
+import argparse
+import ctypes
+import json
+import mmap
+import os
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from comfyui_outputs import COMFYUI_DIR
+from job_scheduler import model_files
+from seed_sweep import FOLDER_ALIASES
+
+WARM_MB_S = 300.0
+HEADROOM = 2 * 1024 ** 3  # reclaimable memory left alone for the running job
+CHUNK = 8 * 1024 * 1024
+MODES = ("read", "fadvise")
+
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+def model_paths(workflow: dict) -> List[Path]:
+    """Files (symlinks resolved) of the models a workflow loads; directories expand to their files."""
+    paths = []
+    for folder, filename in model_files(workflow):
+        for name in FOLDER_ALIASES.get(folder, (folder,)):
+            path = COMFYUI_DIR / "models" / name / filename
+            if path.exists():
+                path = path.resolve()
+                paths.extend([path] if path.is_file() else sorted(p for p in path.rglob("*") if p.is_file()))
+                break
+    return paths
+
+
+def resident_bytes(path) -> Optional[int]:
+    """Bytes of path currently in the page cache (mincore), or None if it cannot be measured."""
+    try:
+        size = os.path.getsize(path)
+        if size == 0:
+            return 0
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)  # private mapping: no page is touched
+        try:
+            page = mmap.PAGESIZE
+            pages = (size + page - 1) // page
+            vec = (ctypes.c_ubyte * pages)()
+            buf = (ctypes.c_char * size).from_buffer(mapped)
+            try:
+                if _libc.mincore(ctypes.c_void_p(ctypes.addressof(buf)), ctypes.c_size_t(size), vec) != 0:
+                    return None
+            finally:
+                del buf
+            return min(size, (pages - bytes(vec).count(0)) * page)
+        finally:
+            mapped.close()
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def mem_available() -> int:
+    for line in Path("/proc/meminfo").read_text().splitlines():
+        if line.startswith("MemAvailable:"):
+            return int(line.split()[1]) * 1024
+    return 0
+
+
+class PageCacheWarmer:
+    """Background prefetcher of upcoming model files, with a bandwidth cap."""
+
+    def __init__(self, bandwidth_mb_s: float = WARM_MB_S, mode: str = "read", headroom: int = HEADROOM):
+        if mode not in MODES:
+            raise ValueError(f"Unknown warm mode {mode!r}, expected one of {MODES}")
+        self.bandwidth = bandwidth_mb_s * 1024 ** 2
+        self.mode = mode
+        self.headroom = headroom
+        self.running: List[Path] = []
+        self.wanted: List[Path] = []
+        # path -> (measured cold read rate in bytes/s, bytes resident before warming)
+        self.warmed: Dict[Path, Tuple[float, int]] = {}
+        self.stats = {"files_warmed": 0, "bytes_warmed": 0, "files_skipped": 0, "already_resident": 0,
+                      "bytes_hit": 0, "seconds_saved": 0.0}
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="page cache warmer", daemon=True)
+        self._thread.start()
+
+    def set_running(self, workflow: dict):
+        """The job now executing: its files are never pushed out and count as in use."""
+        with self._lock:
+            self.running = model_paths(workflow)
+
+    def prefetch(self, workflow: Optional[dict]):
+        """Warm the files of the job expected to run next (replaces any earlier request)."""
+        with self._lock:
+            running = list(self.running)
+        self.warm([p for p in model_paths(workflow) if p not in running] if workflow else [])
+
+    def warm(self, paths: Iterable[Path]):
+        """Warm these files in order; a file no longer wanted stops being read."""
+        paths = list(paths)
+        with self._lock:
+            self.wanted = paths
+        for path in paths:
+            self._queue.put(path)
+
+    def job_started(self, workflow: dict):
+        """Credit the load time saved by bytes the warmer made resident and that still are."""
+        for path in model_paths(workflow):
+            with self._lock:
+                warmed = self.warmed.pop(path, None)
+            if warmed is None:
+                continue
+            rate, before = warmed
+            hit = max(0, (resident_bytes(path) or 0) - before)
+            with self._lock:
+                self.stats["bytes_hit"] += hit
+                self.stats["seconds_saved"] += hit / rate if rate else 0.0
+
+    def _fits(self, path: Path, missing: int) -> bool:
+        with self._lock:
+            running = list(self.running)
+        in_use = sum(resident_bytes(p) or 0 for p in running)
+        return missing <= mem_available() - in_use - self.headroom
+
+    def _read(self, path: Path) -> Tuple[bool, float]:
+        """Read path at most at the bandwidth cap.
+
+        Returns (finished, cold read rate in bytes/s with sleeps excluded);
+        finished is False when the file stopped being wanted part way.
+        """
+        buffer = bytearray(CHUNK)
+        view = memoryview(buffer)
+        reading = 0.0
+        done = 0
+        finished = False
+        start = time.monotonic()
+        with open(path, "rb", buffering=0) as f:
+            while True:
+                with self._lock:
+                    if path not in self.wanted:
+                        break  # the schedule changed; stop spending I/O on it
+                t0 = time.monotonic()
+                n = f.readinto(view)
+                reading += time.monotonic() - t0
+                if not n:
+                    finished = True
+                    break
+                done += n
+                ahead = start + done / self.bandwidth - time.monotonic()
+                if ahead > 0:
+                    time.sleep(ahead)
+        with self._lock:
+            self.stats["bytes_warmed"] += done
+        return finished, done / reading if reading else 0.0
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            if path is None:
+                return
+            with self._lock:
+                if path not in self.wanted or path in self.warmed:
+                    continue
+            try:
+                size = path.stat().st_size
+                resident = resident_bytes(path)
+                if resident is not None and resident >= 0.95 * size:
+                    with self._lock:
+                        self.stats["already_resident"] += 1
+                    continue
+                if not self._fits(path, size - (resident or 0)):
+                    with self._lock:
+                        self.stats["files_skipped"] += 1
+                    continue
+                if self.mode == "fadvise":
+                    fd = os.open(path, os.O_RDONLY)
+                    try:
+                        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                    finally:
+                        os.close(fd)
+                    finished, rate = True, 0.0  # the kernel reads asynchronously; no rate to credit
+                else:
+                    finished, rate = self._read(path)
+                if not finished:
+                    continue  # not warmed: may be queued again when it is next wanted
+                with self._lock:
+                    self.warmed[path] = (rate, resident or 0)
+                    self.stats["files_warmed"] += 1
+            except OSError:
+                with self._lock:
+                    self.stats["files_skipped"] += 1
+
+    def report(self) -> dict:
+        with self._lock:
+            return dict(self.stats, mode=self.mode, bandwidth_mb_s=self.bandwidth / 1024 ** 2)
+
+    def drain(self):
+        """Finish the queued files and stop the background thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def close(self):
+        """Abandon pending warming and stop."""
+        with self._lock:
+            self.wanted = []
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+def format_report(r: dict) -> str:
+    return (f"Page cache warming ({r['mode']}, {r['bandwidth_mb_s']:.0f} MB/s cap): "
+            f"{r['files_warmed']} files / {r['bytes_warmed'] / 1024 ** 3:.1f} GB read, "
+            f"{r['already_resident']} already cached, {r['files_skipped']} skipped (memory); "
+            f"{r['bytes_hit'] / 1024 ** 3:.1f} GB still cached at job start, "
+            f"~{r['seconds_saved']:.1f}s load time saved")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm model files into the OS page cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("warm", help="Read files (or a workflow's model files) into the page cache now")
+    p.add_argument("paths", nargs="+", help="Model files or API workflow JSON files")
+    p.add_argument("--mb-s", type=float, default=WARM_MB_S, help="Bandwidth cap")
+    p.add_argument("--mode", choices=MODES, default="read")
+    p = sub.add_parser("status", help="Resident share of files (or a workflow's model files)")
+    p.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    paths: List[Path] = []
+    for arg in args.paths:
+        path = Path(arg).expanduser()
+        paths.extend(model_paths(json.loads(path.read_text())) if path.suffix == ".json" else [path])
+
+    if args.command == "status":
+        for path in paths:
+            resident = resident_bytes(path)
+            size = path.stat().st_size
+            share = f"{100 * resident / size:5.1f}%" if resident is not None and size else "    ?"
+            print(f"{share}  {size / 1024 ** 3:6.2f} GB  {path}")
+        return 0
+
+    start = time.time()
+    warmer = PageCacheWarmer(args.mb_s, args.mode)
+    warmer.warm(paths)
+    warmer.drain()
+    r = warmer.report()
+    print(f"Warmed {r['files_warmed']} files ({r['bytes_warmed'] / 1024 ** 3:.2f} GB) in {time.time() - start:.1f}s; "
+          f"{r['already_resident']} already cached, {r['files_skipped']} skipped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
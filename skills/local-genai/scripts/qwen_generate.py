@@ -11,7 +11,9 @@ import os
 from pathlib import Path
 import argparse
 
-MODEL_PATH = "/mnt/c/models/Qwen/Qwen-Image-2512"
+from model_staging import staged
+
+MODEL_PATH = "/mnt/c/models/Qwen/Qwen-Image-2512"  # main() swaps in the local staged copy when present
 OUTPUT_DIR = Path.home() / "ComfyUI" / "output"
 
 def generate_image(prompt, negative_prompt="", width=1024, height=1024, steps=20, guidance_scale=4.5, seed=None):
@@ -90,6 +92,9 @@ def main():
     
     args = parser.parse_args()
     
+    global MODEL_PATH
+    MODEL_PATH = staged(MODEL_PATH)
+    
     try:
         output = generate_image(
             prompt=args.prompt,
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Trace-replay load test for the generation scheduler
+
+Replays a mix of jobs - Flux and Qwen images, Qwen Lightning bursts, long
+LTX-2 renders and LTX-2 I2V with an uploaded first frame - against one or
+more stand-in ComfyUI servers (fake_comfyui) and reports how the
+scheduling held up:
+
+    makespan        first arrival to last completion
+    latency         arrival to completion per job, p50/p95 (also per kind)
+    GPU idle        share of the makespan the fake GPUs were not executing
+    swaps           model reloads the servers had to do (and their time)
+
+Jobs are built with the real builders (generate_image, generate_qwen,
+comfyui_ltx2_api), routed with backend_pool when there are several
+servers, and ordered per server by job_scheduler (policy "affinity") or
+in arrival order (policy "fifo"). GPU time per job comes from a model of
+each pipeline: LTX-2 from ltx_planner's cost model (measured timings once
+recorded), Qwen from the timings in qwen-image/references/model-info.md,
+Flux from an estimate. A model swap costs the size of the newly loaded
+files over --load-gbps. --speed compresses time so an hour-long trace
+replays in a minute; everything is reported in trace seconds.
+
+Traces are JSONL, one job per line, in arrival order:
+    {"t": 0.0, "kind": "flux", "width": 1024, "height": 1024, "steps": 20}
+    {"t": 12.5, "kind": "ltx_i2v", "width": 704, "height": 384, "frames": 121, "steps": 20}
+    {"t": 30.0, "workflow": {...API workflow...}}
+--from-jobs turns the job store (job_store.py) into such a trace, with the
+recorded workflows and submit times; --synthetic N generates a mix.
+
+CLI:
+    python replay_load.py --synthetic 60 --policy fifo --policy affinity
+    python replay_load.py --trace prod.jsonl --backends 2 --speed 120
+    python replay_load.py --from-jobs --write-trace prod.jsonl
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from comfyui_client import ComfyClient, finished_at
+from fake_comfyui import FakeComfyUI, workflow_batch, workflow_steps
+from job_scheduler import DEFAULT_MAX_SKIPS, ModelAffinityScheduler, model_files, model_key
+from ltx_planner import CostModel
+from node_timing import percentile
+from seed_sweep import FOLDER_ALIASES
+from comfyui_outputs import COMFYUI_DIR
+
+KINDS = ("flux", "qwen", "qwen_lightning", "ltx", "ltx_i2v")
+POLICIES = ("fifo", "affinity")
+SPEED = 60.0
+LOAD_GBPS = 1.5  # NVMe-ish; a checkpoint on /mnt/c loads far slower
+# GPU seconds per step per megapixel (plus fixed overhead), RTX 5090
+QWEN_STEP_MP_SECONDS, QWEN_OVERHEAD = 0.85, 2.0  # model-info.md: 1328x1328, 20 steps ~35 s
+FLUX_STEP_MP_SECONDS, FLUX_OVERHEAD = 0.45, 1.5  # estimate, refine from node_timing.py report
+LTX_OVERHEAD = 3.0
+# Rough file sizes when the model is not on this machine
+MODEL_GB = {"ltx-2-19b": 27.0, "gemma": 24.0, "qwen_image_2512": 20.4, "qwen_2.5_vl": 9.4,
+            "flux1-dev": 17.2, "vae": 0.3}
+DEFAULT_MODEL_GB = 5.0
+UPLOAD_MB = 1.5
+MEAN_GAP = 60.0  # synthetic: seconds between arrivals (bursts count once)
+I2V_IMAGE = "replay_i2v.png"
+
+
+def classify(workflow: dict) -> str:
+    names = " ".join(f.lower() for _, f in model_files(workflow))
+    classes = {node.get("class_type") for node in workflow.values()}
+    if "ltx" in names:
+        return "ltx_i2v" if "LoadImage" in classes else "ltx"
+    if "qwen" in names:
+        loras = " ".join(str(n.get("inputs", {}).get("lora_name", "")).lower() for n in workflow.values())
+        return "qwen_lightning" if "lightning" in loras else "qwen"
+    if "flux" in names:
+        return "flux"
+    return "other"
+
+
+def _latent(workflow: dict) -> dict:
+    for node in workflow.values():
+        if node.get("class_type") in ("EmptyLatentImage", "EmptySD3LatentImage", "EmptyLTXVLatentVideo"):
+            return node.get("inputs", {})
+    return {}
+
+
+def job_seconds(workflow: dict, cost_model: Optional[CostModel] = None) -> float:
+    """Modelled GPU seconds of one job, without model loading."""
+    kind = classify(workflow)
+    latent = _latent(workflow)
+    width, height = latent.get("width", 1024), latent.get("height", 1024)
+    steps, batch = workflow_steps(workflow), workflow_batch(workflow)
+    megapixels = width * height / 1e6
+    if kind.startswith("ltx"):
+        model = cost_model or CostModel()
+        checkpoint = " ".join(f for _, f in model_files(workflow))
+        pipeline = "distilled" if "distilled" in checkpoint else "comfyui"
+        predicted = model.predict(pipeline, width, height, latent.get("length", 121), steps)
+        return batch * (predicted - model.coef[pipeline][0]) + LTX_OVERHEAD  # coef[0] is load/setup
+    if kind.startswith("qwen"):
+        return QWEN_OVERHEAD + QWEN_STEP_MP_SECONDS * steps * megapixels * batch
+    if kind == "flux":
+        return FLUX_OVERHEAD + FLUX_STEP_MP_SECONDS * steps * megapixels * batch
+    return 10.0
+
+
+def model_gb(folder: str, filename: str) -> float:
+    for name in FOLDER_ALIASES.get(folder, (folder,)):
+        path = COMFYUI_DIR / "models" / name / filename
+        if path.is_file():
+            return path.stat().st_size / 1024 ** 3
+    lowered = filename.lower()
+    return next((gb for key, gb in MODEL_GB.items() if key in lowered), DEFAULT_MODEL_GB)
+
+
+def build(item: dict) -> dict:
+    """API workflow for one trace item (recorded workflow or kind + parameters)."""
+    if "workflow" in item:
+        return item["workflow"]
+    kind = item["kind"]
+    seed = item.get("seed", 42)
+    prompt = item.get("prompt", f"replay {kind}")
+    if kind == "flux":
+        from generate_image import create_flux_workflow
+        return create_flux_workflow(prompt, "", item.get("width", 1024), item.get("height", 1024), seed,
+                                    item.get("steps", 20))
+    if kind in ("qwen", "qwen_lightning"):
+        sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "qwen-image" / "scripts"))
+        from generate_qwen import create_api_workflow
+        lightning = kind == "qwen_lightning"
+        return create_api_workflow(prompt, item.get("width", 1328), item.get("height", 1328),
+                                   item.get("steps", 4 if lightning else 20), seed, lightning)[0]
+    if kind in ("ltx", "ltx_i2v"):
+        from comfyui_ltx2_api import load_ltx2_workflow
+        workflow = load_ltx2_workflow(prompt, item.get("width", 704), item.get("height", 384),
+                                      item.get("frames", 121), item.get("fps", 24.0), seed,
+                                      item.get("steps", 20))
+        if kind == "ltx_i2v":
+            workflow = i2v_workflow(workflow)
+        return workflow
+    raise ValueError(f"Unknown job kind {kind!r}, expected one of {KINDS}")
+
+
+def i2v_workflow(workflow: dict) -> dict:
+    """LTX-2 T2V graph turned into I2V: the uploaded image conditions the first frame."""
+    latent = workflow["4"]["inputs"]
+    workflow["13"] = {"class_type": "LoadImage", "inputs": {"image": I2V_IMAGE, "upload": "image"}}
+    workflow["14"] = {"class_type": "LTXVImgToVideo", "inputs": {
+        "positive": ["2", 0], "negative": ["3", 0], "vae": ["1", 2], "image": ["13", 0],
+        "width": latent["width"], "height": latent["height"], "length": latent["length"],
+        "batch_size": latent.get("batch_size", 1), "strength": 1.0}}
+    workflow["6"]["inputs"].update(positive=["14", 0], negative=["14", 1], latent_image=["14", 2])
+    workflow["10"]["inputs"]["latent_image"] = ["14", 2]
+    return workflow
+
+
+def synthetic_trace(count: int, seed: int = 0, mean_gap: float = MEAN_GAP) -> List[dict]:
+    """A production-like mix: mostly images, Lightning bursts, some long videos and I2V."""
+    rng = random.Random(seed)
+    items, t = [], 0.0
+    while len(items) < count:
+        t += rng.expovariate(1 / mean_gap)
+        roll = rng.random()
+        if roll < 0.35:
+            w, h = rng.choice([(1024, 1024), (1344, 768), (768, 1344)])
+            items.append({"t": t, "kind": "flux", "width": w, "height": h, "steps": 20})
+        elif roll < 0.6:
+            items.append({"t": t, "kind": "qwen", "width": 1328, "height": 1328, "steps": 20})
+        elif roll < 0.7:
+            for i in range(rng.randint(4, 8)):  # someone iterating on a prompt
+                items.append({"t": t + 3.0 * i, "kind": "qwen_lightning", "width": 1024, "height": 1024,
+                              "steps": 4})
+        elif roll < 0.92:
+            w, h = rng.choice([(704, 384), (1280, 704)])
+            items.append({"t": t, "kind": "ltx", "width": w, "height": h, "frames": 121, "steps": 20})
+        else:
+            items.append({"t": t, "kind": "ltx_i2v", "width": 704, "height": 384, "frames": 121, "steps": 20})
+    for i, item in enumerate(items):
+        item["seed"] = seed * 100000 + i
+    return sorted(items[:count], key=lambda item: item["t"])
+
+
+def trace_from_jobs(db=None) -> List[dict]:
+    """Jobs recorded by job_store.py, as a trace with their workflows and submit times."""
+    from job_store import JobStore
+    jobs = sorted(JobStore(db).jobs(limit=1000000), key=lambda job: job["created"])
+    if not jobs:
+        return []
+    start = jobs[0]["created"]
+    trace = []
+    for job in jobs:
+        workflow = json.loads(job["workflow"])
+        trace.append({"t": job["created"] - start, "kind": classify(workflow), "workflow": workflow})
+    return trace
+
+
+def load_trace(path) -> List[dict]:
+    items = [json.loads(line) for line in Path(path).read_text().splitlines() if line.strip()]
+    return sorted(items, key=lambda item: item.get("t", 0.0))
+
+
+class Lane:
+    """One stand-in server with its own scheduler and dispatcher thread."""
+
+    def __init__(self, url: str, policy: str, depth: int, max_skips: int, upload_bytes: int, timeout: float):
+        self.url = url
+        self.client = ComfyClient(url, record_metrics=False)
+        self.scheduler = ModelAffinityScheduler(self.client, max_skips=0 if policy == "fifo" else max_skips,
+                                                depth=depth)
+        self.depth = depth
+        self.upload_bytes = upload_bytes
+        self.timeout = timeout
+        self.backend = None  # backend_pool.Backend when routed by a pool
+        self.done: List = []
+        self.closed = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name=f"lane {url}", daemon=True)
+
+    def add(self, workflow: dict, item: dict):
+        with self.cond:
+            job = self.scheduler.add(workflow, name=item.get("kind") or classify(workflow))
+            job.item = item
+            self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+    def _submit(self, job):
+        for node in job.workflow.values():
+            if node.get("class_type") == "LoadImage":
+                uploaded = self.client.upload_image(b"\0" * self.upload_bytes, f"replay_{job.seq}.png")
+                node["inputs"]["image"] = uploaded["name"]
+        job.prompt_id = self.client.queue_prompt(job.workflow)["prompt_id"]
+        job.submitted_at = time.time()
+
+    def run(self):
+        # Waits go in submission order: the server runs its queue FIFO, and
+        # one waiter per client keeps a single WebSocket per client_id.
+        in_flight = deque()
+        while True:
+            with self.cond:
+                while not self.scheduler.pending and not in_flight and not self.closed:
+                    self.cond.wait()
+                if not self.scheduler.pending and not in_flight:
+                    return
+                ready = []
+                while self.scheduler.pending and len(in_flight) + len(ready) < self.depth:
+                    ready.append(self.scheduler.next_job())
+            for job in ready:
+                try:
+                    self._submit(job)
+                    in_flight.append(job)
+                except Exception as e:
+                    job.error = e
+                    job.finished_at = time.time()
+                    self.done.append(job)
+            if in_flight:
+                job = in_flight.popleft()
+                try:
+                    job.entry = self.client.wait_for_prompt(job.prompt_id, timeout=self.timeout)
+                    job.finished_at = finished_at(job.entry) or time.time()
+                    if job.entry.get("status", {}).get("status_str") == "error":
+                        job.error = RuntimeError("execution error")
+                except Exception as e:
+                    job.error = e
+                    job.finished_at = time.time()
+                self.done.append(job)
+                if self.backend is not None:
+                    with self.backend.lock:
+                        self.backend.queue_depth -= 1
+
+
+def replay(trace: List[dict], backends: int = 1, policy: str = "affinity", depth: int = 1,
+           max_skips: int = DEFAULT_MAX_SKIPS, speed: float = SPEED, load_gbps: float = LOAD_GBPS,
+           upload_mb: float = UPLOAD_MB, seed: int = 0) -> dict:
+    """Replay a trace against fresh stand-in servers and return the load-test metrics."""
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}, expected one of {POLICIES}")
+    cost_model = CostModel()
+    servers = [FakeComfyUI(duration=lambda wf: job_seconds(wf, cost_model) / speed,
+                           load_seconds=lambda folder, name: model_gb(folder, name) / load_gbps / speed,
+                           output_bytes=64 * 1024, seed=seed + i) for i in range(backends)]
+    urls = [server.start_in_thread() for server in servers]
+    timeout = 4 * max((job_seconds(build(item), cost_model) for item in trace), default=60) / speed + 60
+    lanes = {url: Lane(url, policy, depth, max_skips, int(upload_mb * 2 ** 20), timeout) for url in urls}
+    pool = None
+    if backends > 1:
+        from backend_pool import BackendPool
+        # No /queue polling: a lane holds jobs back from its server, so the
+        # pool routes on the depth counted here instead
+        pool = BackendPool(urls, refresh_interval=float("inf"))
+        for backend in pool.backends:
+            lanes[backend.url].backend = backend
+
+    try:
+        for lane in lanes.values():
+            lane.thread.start()
+        start = time.time()
+        for item in trace:
+            delay = start + item.get("t", 0.0) / speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            workflow = build(item)
+            if pool:
+                # What BackendPool.dispatch records, for jobs still waiting in our lanes
+                backend = pool.choose(workflow)
+                with backend.lock:
+                    backend.queue_depth += 1
+                    backend.loaded = model_key(workflow) or backend.loaded
+                lanes[backend.url].add(workflow, item)
+            else:
+                lanes[urls[0]].add(workflow, item)
+        for lane in lanes.values():
+            lane.close()
+        for lane in lanes.values():
+            lane.thread.join()
+        end = time.time()
+        stats = [server.summary() for server in servers]
+    finally:
+        for server in servers:
+            server.stop()
+
+    jobs = [job for lane in lanes.values() for job in lane.done]
+    return summarize(jobs, stats, start, end, speed, backends)
+
+
+def summarize(jobs, stats: List[dict], start: float, end: float, speed: float, backends: int) -> dict:
+    ok = [job for job in jobs if job.error is None]
+    latencies = [(job.finished_at - job.added_at) * speed for job in ok]
+    by_kind: Dict[str, List[float]] = {}
+    for job in ok:
+        by_kind.setdefault(job.name, []).append((job.finished_at - job.added_at) * speed)
+    finish = max((job.finished_at for job in jobs), default=end)
+    first = min((job.added_at for job in jobs), default=start)
+    makespan = (finish - first) * speed
+    busy = sum(s["busy_seconds"] for s in stats) * speed
+    return {
+        "jobs": len(jobs),
+        "failed": len(jobs) - len(ok),
+        "makespan_s": makespan,
+        "latency_p50_s": percentile(latencies, 50) if latencies else 0.0,
+        "latency_p95_s": percentile(latencies, 95) if latencies else 0.0,
+        "latency_p95_by_kind_s": {kind: percentile(values, 95) for kind, values in sorted(by_kind.items())},
+        "gpu_idle_fraction": max(0.0, 1 - busy / (makespan * backends)) if makespan else 0.0,
+        "swaps": sum(s["swaps"] for s in stats),
+        "load_s": sum(s["load_seconds"] for s in stats) * speed,
+        "cached_nodes": sum(s["cached_nodes"] for s in stats),
+    }
+
+
+def format_report(policy: str, r: dict) -> str:
+    kinds = ", ".join(f"{k} {v / 60:.1f}m" for k, v in r["latency_p95_by_kind_s"].items())
+    return (f"{policy:<9} {r['jobs']:>4} jobs ({r['failed']} failed)  makespan {r['makespan_s'] / 60:7.1f} min  "
+            f"p50 {r['latency_p50_s'] / 60:6.1f} min  p95 {r['latency_p95_s'] / 60:6.1f} min  "
+            f"GPU idle {100 * r['gpu_idle_fraction']:4.1f}%  swaps {r['swaps']:>3} ({r['load_s'] / 60:.1f} min)\n"
+            f"{'':<9} p95 by kind: {kinds}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a job mix against stand-in ComfyUI servers")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--trace", help="JSONL trace (one job per line, see module docstring)")
+    source.add_argument("--from-jobs", nargs="?", const="", metavar="DB",
+                        help="Build the trace from the job store (default: $COMFYUI_JOB_DB)")
+    source.add_argument("--synthetic", type=int, metavar="N", help="Generate a mix of N jobs")
+    parser.add_argument("--write-trace", help="Save the trace used (e.g. to replay a synthetic mix again)")
+    parser.add_argument("--policy", action="append", choices=POLICIES,
+                        help="Scheduling policy to replay (repeatable; default: fifo and affinity)")
+    parser.add_argument("--backends", type=int, default=1, help="Stand-in servers (routed by backend_pool)")
+    parser.add_argument("--depth", type=int, default=1, help="Jobs handed to each server at a time")
+    parser.add_argument("--max-skips", type=int, default=DEFAULT_MAX_SKIPS, help="Affinity fairness bound")
+    parser.add_argument("--speed", type=float, default=SPEED, help="Time compression (trace s per wall s)")
+    parser.add_argument("--load-gbps", type=float, default=LOAD_GBPS, help="Model load bandwidth in GB/s")
+    parser.add_argument("--mean-gap", type=float, default=MEAN_GAP, help="Synthetic: mean seconds between arrivals")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    if args.trace:
+        trace = load_trace(args.trace)
+    elif args.synthetic:
+        trace = synthetic_trace(args.synthetic, args.seed, args.mean_gap)
+    else:
+        trace = trace_from_jobs(args.from_jobs or None)
+    if not trace:
+        print("Empty trace")
+        return 1
+    if args.write_trace:
+        Path(args.write_trace).write_text("".join(json.dumps(item) + "\n" for item in trace))
+
+    counts: Dict[str, int] = {}
+    for item in trace:
+        kind = item.get("kind") or classify(item["workflow"])
+        counts[kind] = counts.get(kind, 0) + 1
+    span = trace[-1].get("t", 0.0) - trace[0].get("t", 0.0)
+    print(f"Trace: {len(trace)} jobs over {span / 60:.1f} min ({', '.join(f'{k} {v}' for k, v in counts.items())})")
+    print(f"Replaying at {args.speed:g}x on {args.backends} server(s), depth {args.depth}\n")
+
+    results = {}
+    for policy in args.policy or POLICIES:
+        results[policy] = replay(trace, args.backends, policy, args.depth, args.max_skips, args.speed,
+                                 args.load_gbps, seed=args.seed)
+        print(format_report(policy, results[policy]))
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of generation results
+
+Finished API workflows are hashed canonically (sorted keys, no _meta, no
+filename_prefix - but including the seed), and the files a job produced
+are stored under that hash. Asking for the same image or video again
+returns the stored artifact immediately instead of spending GPU minutes.
+
+The cache has a size budget and evicts least recently used entries.
+Hit/miss counts and the GPU time saved are kept in the index database.
+
+Entries are independent copies (reflinks where the filesystem supports
+them, never hardlinks) and read-only, and a hit is copied out again, so
+editing a delivered image cannot change what later hits return.
+
+Usage (from another script):
+    from result_cache import ResultCache
+
+    cache = ResultCache()
+    files = cache.get(workflow)            # list of Paths or None
+    if files is None:
+        ...run the job...
+        cache.put(workflow, output_paths, gpu_seconds=elapsed)
+
+CLI:
+    python result_cache.py stats
+    python result_cache.py clear
+    python result_cache.py evict --max-gb 20
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from comfyui_outputs import copy_local, retrieve_all
+
+CACHE_ROOT = Path(os.environ.get("COMFYUI_RESULT_CACHE",
+                                 Path.home() / ".cache" / "comfyui" / "results")).expanduser()
+DEFAULT_MAX_BYTES = int(float(os.environ.get("COMFYUI_RESULT_CACHE_GB", "50")) * 1024 ** 3)
+
+# Inputs that do not change what a job computes
+IGNORED_INPUTS = ("filename_prefix", "control_after_generate")
+
+
+def canonical_workflow(workflow: dict) -> str:
+    """Stable JSON form of an API workflow, used as the cache key source."""
+    nodes = {}
+    for node_id, node in workflow.items():
+        inputs = {k: v for k, v in node.get("inputs", {}).items() if k not in IGNORED_INPUTS}
+        nodes[str(node_id)] = {"class_type": node.get("class_type"), "inputs": inputs}
+    return json.dumps(nodes, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def workflow_hash(workflow: dict) -> str:
+    return hashlib.sha256(canonical_workflow(workflow).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Local content-addressed store of job outputs with LRU eviction."""
+
+    def __init__(self, root=None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root or CACHE_ROOT).expanduser()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # Shared by the worker threads of batch runs; _lock serializes its use
+        self.db = sqlite3.connect(self.root / "index.db", timeout=30, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                files TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                gpu_seconds REAL NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS stats (
+                name TEXT PRIMARY KEY,
+                value REAL NOT NULL
+            );
+        """)
+
+    def _bump(self, **deltas):
+        for name, delta in deltas.items():
+            self.db.execute(
+                "INSERT INTO stats (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, delta),
+            )
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, workflow: dict) -> Optional[List[Path]]:
+        """Cached output files for workflow, or None on a miss."""
+        key = workflow_hash(workflow)
+        with self._lock, self.db:
+            row = self.db.execute("SELECT files, gpu_seconds FROM entries WHERE key = ?", (key,)).fetchone()
+            files = [self._entry_dir(key) / name for name in json.loads(row[0])] if row else None
+            if files and all(f.is_file() for f in files):
+                self.db.execute("UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                                (time.time(), key))
+                self._bump(hits=1, gpu_seconds_saved=row[1])
+                return files
+            if row:
+                self._delete(key)  # files vanished underneath us
+            self._bump(misses=1)
+        return None
+
+    def put(self, workflow: dict, paths, gpu_seconds: float = 0.0) -> Optional[List[Path]]:
+        """Store a job's output files. Returns the cached paths (None if no file exists)."""
+        paths = [Path(p) for p in paths if Path(p).is_file()]
+        if not paths:
+            return None
+        key = workflow_hash(workflow)
+        entry_dir = self._entry_dir(key)
+        # Copied into a scratch directory first: only a committed entry gets its directory
+        tmp_dir = self.root / "tmp" / f"{key}.{os.getpid()}.{threading.get_ident()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        try:
+            names = []
+            for i, src in enumerate(paths):
+                name = f"{i:03d}_{src.name}"
+                copy_local(src, tmp_dir / name)
+                os.chmod(tmp_dir / name, 0o444)
+                names.append(name)
+            size = sum((tmp_dir / n).stat().st_size for n in names)
+
+            now = time.time()
+            with self._lock:
+                with self.db:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO entries (key, files, size, gpu_seconds, created, last_used) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, json.dumps(names), size, gpu_seconds, now, now),
+                    )
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                entry_dir.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_dir, entry_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict()
+        return [entry_dir / n for n in names]
+
+    def put_remote(self, workflow: dict, client, files: List[dict], gpu_seconds: float = 0.0) -> Optional[List[Path]]:
+        """Store outputs that exist only on the server (history_outputs() items), fetched over HTTP."""
+        with tempfile.TemporaryDirectory(dir=self.root) as tmp:
+            dests = [Path(tmp) / str(i) / f["filename"] for i, f in enumerate(files)]
+            results = retrieve_all(client, files, dests=dests, mode="http")
+            return self.put(workflow, [r["path"] for r in results], gpu_seconds)
+
+    def restore(self, files: List[Path], dests) -> List[Path]:
+        """Copy cached files to dests (writable copies; the entry itself stays read-only)."""
+        restored = []
+        for src, dest in zip(files, dests):
+            dest = Path(dest).expanduser()
+            copy_local(src, dest)
+            os.chmod(dest, 0o644)
+            restored.append(dest)
+        return restored
+
+    def _delete(self, key: str):
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+        self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """Drop least recently used entries until the cache fits. Returns entries removed."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        removed = 0
+        with self._lock, self.db:
+            total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+                if total <= limit:
+                    break
+                self._delete(key)
+                total -= size
+                removed += 1
+            if removed:
+                self._bump(evictions=removed)
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            values = dict(self.db.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        hits, misses = int(values.get("hits", 0)), int(values.get("misses", 0))
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "evictions": int(values.get("evictions", 0)),
+            "gpu_seconds_saved": values.get("gpu_seconds_saved", 0.0),
+        }
+
+    def clear(self):
+        with self._lock, self.db:
+            for (key,) in self.db.execute("SELECT key FROM entries").fetchall():
+                self._delete(key)
+            self.db.execute("DELETE FROM stats")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the ComfyUI result cache")
+    parser.add_argument("command", choices=["stats", "clear", "evict"])
+    parser.add_argument("--root", default=None, help=f"Cache directory (default: {CACHE_ROOT})")
+    parser.add_argument("--max-gb", type=float, default=None, help="Size budget for evict")
+    args = parser.parse_args()
+
+    cache = ResultCache(args.root)
+    if args.command == "clear":
+        cache.clear()
+        print("Cache cleared")
+    elif args.command == "evict":
+        max_bytes = int(args.max_gb * 1024 ** 3) if args.max_gb is not None else None
+        print(f"Evicted {cache.evict(max_bytes)} entries")
+    else:
+        s = cache.stats()
+        print(f"Entries:   {s['entries']} ({s['bytes'] / 1024 ** 3:.2f} / {s['max_bytes'] / 1024 ** 3:.0f} GB)")
+        print(f"Hits:      {s['hits']}  Misses: {s['misses']}  Hit rate: {100 * s['hit_rate']:.1f}%")
+        print(f"Evictions: {s['evictions']}")
+        print(f"GPU time saved: {s['gpu_seconds_saved'] / 60:.1f} min")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
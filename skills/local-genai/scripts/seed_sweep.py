@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Seed sweeps with batched latents
+
+The builders always render batch_size 1, so a 16-seed sweep used to be 16
+full jobs. A sweep here sets batch_size on the empty-latent node
+(EmptyLatentImage, EmptySD3LatentImage, EmptyLTXVLatentVideo) so several
+samples are denoised together, sized to the VRAM ComfyUI reports, and
+queues every batch up front so the GPU goes straight from one to the next.
+Outputs are split back into one file per sample with a JSON sidecar.
+
+ComfyUI draws the noise for a whole batch from one seed, so a batch of n
+starting at seed s is not the same as n jobs with seeds s, s+1, ... A
+batched sweep is therefore a range (a start seed and a sample count):
+each batch uses the first seed of its chunk, and the sidecar records
+seed, batch_size and batch_index - together they reproduce the sample
+exactly. An explicit list such as 1,5,9 cannot be batched; every listed
+seed is rendered in its own job.
+
+Video latents decode to one long frame sequence per batch, so for them
+the save node is replicated behind ImageFromBatch, one per sample.
+
+Usage (from another script):
+    from seed_sweep import parse_seeds, fit_batch_size, run_sweep
+
+    seeds = parse_seeds("1-16")
+    batch = fit_batch_size(client, workflow, 1024, 1024, gb_per_mp=FLUX_GB_PER_MP) if is_seed_range(seeds) else 1
+    results = run_sweep(client, lambda seed: create_flux_workflow(prompt, seed=seed),
+                        seeds, batch, dest_dir="sweep/", stem="fox")
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import tracing
+from comfyui_client import history_outputs
+from comfyui_outputs import COMFYUI_DIR, retrieve_all
+from job_scheduler import model_files
+from result_cache import workflow_hash
+from workflow_templates import copy_graph, validate_for
+
+# Empty-latent node -> does its batch decode to a frame sequence?
+LATENT_NODES = {
+    "EmptyLatentImage": False,
+    "EmptySD3LatentImage": False,
+    "EmptyLTXVLatentVideo": True,
+}
+MAX_BATCH = 16
+VRAM_RESERVE_GB = 1.5
+
+# Rough activation memory per batch item in GB per megapixel (per frame
+# for video) with the fp8 checkpoints - conservative, tune per GPU
+FLUX_GB_PER_MP = 1.0
+QWEN_GB_PER_MP = 1.5
+LTX2_GB_PER_MP_FRAME = 0.12
+
+# Extra names ComfyUI accepts for the model folders used by job_scheduler
+FOLDER_ALIASES = {"text_encoders": ("text_encoders", "clip"), "diffusion_models": ("diffusion_models", "unet")}
+
+
+def parse_seeds(spec: str) -> List[int]:
+    """'1-4,10,20-22' -> [1, 2, 3, 4, 10, 20, 21, 22]"""
+    seeds = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = (int(x) for x in part.split("-", 1))
+            if end < start:
+                raise ValueError(f"Empty seed range: {part}")
+            seeds.extend(range(start, end + 1))
+        else:
+            seeds.append(int(part))
+    if not seeds:
+        raise ValueError(f"No seeds in {spec!r}")
+    return seeds
+
+
+def is_seed_range(seeds: List[int]) -> bool:
+    """Consecutive ascending seeds - the only kind of sweep that can be batched."""
+    return seeds == list(range(seeds[0], seeds[0] + len(seeds)))
+
+
+def weights_bytes(workflow: dict) -> int:
+    """Size of the model files the workflow loads, where they can be found locally."""
+    total = 0
+    for folder, filename in model_files(workflow):
+        for name in FOLDER_ALIASES.get(folder, (folder,)):
+            path = COMFYUI_DIR / "models" / name / filename
+            if path.is_file():
+                total += path.stat().st_size
+                break
+    return total
+
+
+def fit_batch_size(client, workflow: dict, width: int, height: int, frames: int = 1,
+                   gb_per_mp: float = FLUX_GB_PER_MP, max_batch: int = MAX_BATCH,
+                   reserve_gb: float = VRAM_RESERVE_GB) -> int:
+    """Largest batch that fits next to the model weights in the VRAM ComfyUI reports."""
+    try:
+        device = (client.get_system_stats().get("devices") or [{}])[0]
+    except Exception:
+        return 1
+    free, total = device.get("vram_free", 0), device.get("vram_total", 0)
+    # Weights not loaded yet still have to fit, so cap by total minus weights
+    budget = min(free, total - weights_bytes(workflow)) / 1024 ** 3 - reserve_gb
+    per_item = gb_per_mp * width * height / 1e6 * frames
+    return max(1, min(max_batch, int(budget / per_item))) if per_item > 0 else 1
+
+
+def batch_workflow(workflow: dict, batch_size: int) -> Tuple[dict, Optional[List[List[str]]]]:
+    """Copy of workflow rendering batch_size samples.
+
+    Returns (workflow, item_nodes). item_nodes is None for image batches
+    (each save node writes one file per sample, in order); for video
+    batches it lists, per sample, the save nodes that write that sample.
+    """
+    workflow = copy_graph(workflow)
+    frames = None
+    for node in workflow.values():
+        if node["class_type"] in LATENT_NODES:
+            node["inputs"]["batch_size"] = batch_size
+            if LATENT_NODES[node["class_type"]]:
+                frames = node["inputs"]["length"]
+    if frames is None or batch_size == 1:
+        return workflow, None
+
+    item_nodes: List[List[str]] = [[] for _ in range(batch_size)]
+    next_id = 1 + max(int(n) for n in workflow if str(n).isdigit())
+    save_nodes = [n for n, node in workflow.items() if "filename_prefix" in node["inputs"]
+                  and isinstance(node["inputs"].get("images"), list)]
+    for save_id in save_nodes:
+        save = workflow.pop(save_id)
+        for index in range(batch_size):
+            split_id, item_id = str(next_id), str(next_id + 1)
+            next_id += 2
+            workflow[split_id] = {
+                "class_type": "ImageFromBatch",
+                "inputs": {"image": save["inputs"]["images"], "batch_index": index * frames, "length": frames},
+            }
+            item = copy_graph({"n": save})["n"]
+            item["inputs"]["images"] = [split_id, 0]
+            item["inputs"]["filename_prefix"] = f"{save['inputs']['filename_prefix']}_b{index}"
+            workflow[item_id] = item
+            item_nodes[index].append(item_id)
+    return workflow, item_nodes
+
+
+def split_batch(entry: dict, batch_size: int, item_nodes: Optional[List[List[str]]]) -> List[List[dict]]:
+    """Files of a batched job, grouped per sample."""
+    files = history_outputs(entry)
+    if item_nodes is not None:
+        return [[f for f in files if f["node"] in nodes] for nodes in item_nodes]
+    per_node: Dict[str, List[dict]] = {}
+    for f in files:
+        per_node.setdefault(f["node"], []).append(f)
+    items: List[List[dict]] = [[] for _ in range(batch_size)]
+    for node_files in per_node.values():
+        for index, f in enumerate(node_files[:batch_size]):
+            items[index].append(f)
+    return items
+
+
+def run_sweep(client, build: Callable[[int], dict], seeds: List[int], batch_size: int = 1,
+              dest_dir=None, stem: str = "sweep", metadata: Optional[dict] = None,
+              retrieve: str = "auto", timeout: float = 1800) -> List[dict]:
+    """Render len(seeds) samples in batches of batch_size and save them one file each.
+
+    Every batch is queued before the first one is waited on. Returns one
+    dict per sample: {seed, batch_index, batch_size, paths, prompt_id}.
+    With batch_size > 1 seeds must be a range (see is_seed_range).
+    """
+    if batch_size > 1 and not is_seed_range(seeds):
+        raise ValueError("Only a seed range can be batched; render explicit seed lists with batch_size 1")
+    dest_dir = Path(dest_dir or Path.cwd()).expanduser()
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    chunks = [seeds[i:i + batch_size] for i in range(0, len(seeds), batch_size)]
+
+    jobs = []
+    for chunk in chunks:
+        with tracing.span("build workflow", cat="build", seed=chunk[0], batch_size=len(chunk)):
+            workflow, item_nodes = batch_workflow(build(chunk[0]), len(chunk))
+            validate_for(client, workflow)
+        prompt_id = client.queue_prompt(workflow)["prompt_id"]
+        jobs.append((chunk, workflow, item_nodes, prompt_id))
+
+    results = []
+    for chunk, workflow, item_nodes, prompt_id in jobs:
+        entry = client.wait_for_prompt(prompt_id, timeout=timeout)
+        if entry.get("status", {}).get("status_str") == "error":
+            raise RuntimeError(f"Sweep batch for seed {chunk[0]} failed (prompt {prompt_id})")
+        for index, files in enumerate(split_batch(entry, len(chunk), item_nodes)):
+            name = f"{stem}_s{chunk[0]}" + (f"_b{index}" if len(chunk) > 1 else "")
+            dests = [dest_dir / (name + (f"_{k}" if len(files) > 1 else "") + Path(f["filename"]).suffix)
+                     for k, f in enumerate(files)]
+            paths = [r["path"] for r in retrieve_all(client, files, dests=dests, mode=retrieve)]
+            sample = {"seed": chunk[0], "batch_index": index, "batch_size": len(chunk),
+                      "prompt_id": prompt_id, "workflow_hash": workflow_hash(workflow)}
+            for path, f in zip(paths, files):
+                sidecar = dict(metadata or {}, **sample, source=f["filename"])
+                Path(os.fspath(path) + ".json").write_text(json.dumps(sidecar, indent=2))
+            results.append(dict(sample, paths=paths))
+    return results
+
+
+def format_sweep(results: List[dict], elapsed: float) -> str:
+    jobs = len({r["prompt_id"] for r in results})
+    rate = 60 * len(results) / elapsed if elapsed > 0 else 0.0
+    return f"{len(results)} samples in {jobs} jobs, {elapsed:.1f}s ({rate:.1f} samples/min)"
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of LTX-2 text-encoder outputs
+
+Every LTX-2 run encodes the prompt and the long fixed negative prompt
+with the 12B Gemma encoder, and building that encoder is the slowest part
+of startup. This cache stores what the encoder returned, keyed by
+
+    (encoder weights fingerprint, dtype, prompt text and call arguments)
+
+as one safetensors file per entry. Hits are loaded memory-mapped
+(safetensors.torch.load_file) straight onto the target device. The
+fingerprint hashes the name, size and safetensors header (tensor names,
+shapes, dtypes, offsets) of every file under the Gemma root, so it is
+cheap to compute, stable across copies of the same weights, and changes
+when the weights are replaced.
+
+install() wraps ltx_pipelines' TextEncoderBuilder.build so the pipeline
+gets a proxy instead of the model: calling it (or its encode/forward)
+with a cached prompt returns the stored tensors, and Gemma is only built
+on the first miss. Anything else the pipeline asks of the encoder (e.g.
+prompt enhancement) builds the real model and is passed through, so a
+rerun with a new seed or size skips Gemma as long as the prompts repeat.
+
+Like the result cache it has a size budget with LRU eviction, and keeps
+hit/miss counts and the encoder time saved in its index database.
+
+Usage (from another script):
+    from text_embedding_cache import install
+
+    from ltx_pipelines.utils import model_ledger
+    install(model_ledger)          # before the pipeline encodes prompts
+
+CLI:
+    python text_embedding_cache.py stats
+    python text_embedding_cache.py clear
+    python text_embedding_cache.py evict --max-gb 2
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from model_index import safetensors_header
+
+CACHE_ROOT = Path(os.environ.get("COMFYUI_EMBED_CACHE",
+                                 Path.home() / ".cache" / "comfyui" / "text_embeddings")).expanduser()
+DEFAULT_MAX_BYTES = int(float(os.environ.get("COMFYUI_EMBED_CACHE_GB", "8")) * 1024 ** 3)
+CACHED_METHODS = ("encode", "forward")  # besides calling the encoder itself
+
+
+def encoder_fingerprint(root) -> str:
+    """Hash of the encoder weights: file names, sizes and safetensors headers under root."""
+    root = Path(root)
+    digest = hashlib.sha256()
+    files = [root] if root.is_file() else sorted(p for p in root.rglob("*") if p.is_file())
+    for path in files:
+        digest.update(f"{path.relative_to(root) if path != root else path.name}:{path.stat().st_size}".encode())
+        if path.suffix == ".safetensors":
+            digest.update(json.dumps(safetensors_header(path), sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def _arg_key(value) -> Any:
+    """JSON-able stand-in for a call argument (tensors by content hash)."""
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_arg_key(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _arg_key(v) for k, v in sorted(value.items())}
+    if hasattr(value, "detach"):  # torch.Tensor, e.g. token ids
+        import torch
+
+        data = value.detach().cpu().contiguous().reshape(-1).view(torch.uint8)  # bfloat16 has no numpy form
+        return {"tensor": hashlib.sha256(data.numpy().tobytes()).hexdigest(), "dtype": str(value.dtype),
+                "shape": list(value.shape)}
+    return repr(value)
+
+
+def entry_key(fingerprint: str, dtype, method: str, args: tuple, kwargs: dict) -> str:
+    source = json.dumps([fingerprint, str(dtype), method, _arg_key(list(args)), _arg_key(kwargs)],
+                        sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def flatten(value, tensors: dict) -> Any:
+    """Encoder output -> JSON structure with tensors moved into `tensors`."""
+    if hasattr(value, "detach"):
+        name = str(len(tensors))
+        # safetensors wants contiguous tensors that share no storage
+        tensors[name] = value.detach().to("cpu").contiguous().clone()
+        return {"tensor": name}
+    if isinstance(value, (list, tuple)):
+        return {"list" if isinstance(value, list) else "tuple": [flatten(v, tensors) for v in value]}
+    if isinstance(value, dict):
+        return {"dict": {k: flatten(v, tensors) for k, v in value.items()}}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return {"value": value}
+    raise TypeError(f"Cannot cache encoder output of type {type(value).__name__}")
+
+
+def unflatten(structure, tensors: dict) -> Any:
+    (kind, value), = structure.items()
+    if kind == "tensor":
+        return tensors[value]
+    if kind in ("list", "tuple"):
+        items = [unflatten(v, tensors) for v in value]
+        return items if kind == "list" else tuple(items)
+    if kind == "dict":
+        return {k: unflatten(v, tensors) for k, v in value.items()}
+    return value
+
+
+class EmbeddingCache:
+    """Text-encoder outputs as memory-mapped safetensors files, with LRU eviction."""
+
+    def __init__(self, root=None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root or CACHE_ROOT).expanduser()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(self.root / "index.db", timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                seconds REAL NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS stats (
+                name TEXT PRIMARY KEY,
+                value REAL NOT NULL
+            );
+        """)
+
+    def _bump(self, **deltas):
+        for name, delta in deltas.items():
+            self.db.execute(
+                "INSERT INTO stats (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, delta),
+            )
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.safetensors"
+
+    def get(self, key: str, device="cpu") -> Optional[Any]:
+        """Cached encoder output for key (tensors on device), or None on a miss."""
+        from safetensors.torch import load_file
+
+        row = self.db.execute("SELECT seconds FROM entries WHERE key = ?", (key,)).fetchone()
+        path = self._path(key)
+        with self.db:
+            if row and path.is_file():
+                structure = json.loads(safetensors_header(path)["__metadata__"]["structure"])
+                value = unflatten(structure, load_file(str(path), device=str(device)))
+                self.db.execute("UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                                (time.time(), key))
+                self._bump(hits=1, seconds_saved=row[0])
+                return value
+            if row:
+                self._delete(key)  # file vanished underneath us
+            self._bump(misses=1)
+        return None
+
+    def put(self, key: str, value, text: str = "", seconds: float = 0.0) -> Path:
+        """Store an encoder output; seconds is what computing it cost (build + encode)."""
+        from safetensors.torch import save_file
+
+        tensors = {}
+        structure = flatten(value, tensors)
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.part")
+        save_file(tensors, str(tmp), metadata={"structure": json.dumps(structure), "text": text[:200]})
+        os.replace(tmp, path)
+
+        now = time.time()
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries (key, text, size, seconds, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, text[:200], path.stat().st_size, seconds, now, now),
+            )
+        self.evict()
+        return path
+
+    def _delete(self, key: str):
+        self._path(key).unlink(missing_ok=True)
+        self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """Drop least recently used entries until the cache fits. Returns entries removed."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        removed = 0
+        with self.db:
+            for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+                if total <= limit:
+                    break
+                self._delete(key)
+                total -= size
+                removed += 1
+            if removed:
+                self._bump(evictions=removed)
+        return removed
+
+    def stats(self) -> dict:
+        values = dict(self.db.execute("SELECT name, value FROM stats").fetchall())
+        entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        hits, misses = int(values.get("hits", 0)), int(values.get("misses", 0))
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "evictions": int(values.get("evictions", 0)),
+            "seconds_saved": values.get("seconds_saved", 0.0),
+        }
+
+    def clear(self):
+        with self.db:
+            for (key,) in self.db.execute("SELECT key FROM entries").fetchall():
+                self._delete(key)
+            self.db.execute("DELETE FROM stats")
+
+
+class CachedTextEncoder:
+    """Stands in for the text encoder; builds the real one only when the cache cannot answer."""
+
+    def __init__(self, build: Callable[[], Any], cache: EmbeddingCache, fingerprint: str, device, dtype):
+        self._build = build
+        self._cache = cache
+        self._fingerprint = fingerprint
+        self._device = device
+        self._dtype = dtype
+        self._model = None
+        self._build_seconds = 0.0  # charged to the first miss
+
+    def _real(self):
+        if self._model is None:
+            start = time.time()
+            self._model = self._build()
+            self._build_seconds = time.time() - start
+        return self._model
+
+    def _cached_call(self, method: str, args: tuple, kwargs: dict):
+        key = entry_key(self._fingerprint, self._dtype, method, args, kwargs)
+        value = self._cache.get(key, self._device)
+        if value is not None:
+            return value
+        model = self._real()
+        start = time.time()
+        value = model(*args, **kwargs) if method == "__call__" else getattr(model, method)(*args, **kwargs)
+        seconds = time.time() - start + self._build_seconds
+        self._build_seconds = 0.0
+        text = " | ".join(a for a in args if isinstance(a, str)) or str(kwargs.get("text", ""))
+        try:
+            self._cache.put(key, value, text, seconds)
+        except TypeError:
+            pass  # output is not plain tensors; nothing to cache
+        return value
+
+    def __call__(self, *args, **kwargs):
+        return self._cached_call("__call__", args, kwargs)
+
+    def __getattr__(self, name):
+        # Only reached for names the proxy lacks; its own fields must not recurse into _real()
+        if name.startswith("__") or name in _PROXY_FIELDS:
+            raise AttributeError(name)
+        if name in CACHED_METHODS:
+            return lambda *args, **kwargs: self._cached_call(name, args, kwargs)
+        return getattr(self._real(), name)
+
+
+_PROXY_FIELDS = ("_build", "_cache", "_fingerprint", "_device", "_dtype", "_model", "_build_seconds")
+_fingerprints = {}
+
+
+def install(model_ledger, cache: Optional[EmbeddingCache] = None) -> EmbeddingCache:
+    """Route TextEncoderBuilder.build of ltx_pipelines.utils.model_ledger through the cache.
+
+    Wraps whatever build is current, so call it after other patches
+    (e.g. the Gemma loading fix in ltx2_generate_video_fixed.py).
+    """
+    builder = model_ledger.TextEncoderBuilder
+    if getattr(builder.build, "embedding_cache", None) is not None:
+        return builder.build.embedding_cache
+    cache = cache or EmbeddingCache()
+    original_build = builder.build
+
+    def cached_build(self, device, dtype):
+        root = str(self.gemma_root)
+        if root not in _fingerprints:
+            _fingerprints[root] = encoder_fingerprint(root)
+        return CachedTextEncoder(lambda: original_build(self, device, dtype), cache, _fingerprints[root],
+                                 device, dtype)
+
+    cached_build.embedding_cache = cache
+    builder.build = cached_build
+    return cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the LTX-2 text-embedding cache")
+    parser.add_argument("command", choices=["stats", "clear", "evict"])
+    parser.add_argument("--root", default=None, help=f"Cache directory (default: {CACHE_ROOT})")
+    parser.add_argument("--max-gb", type=float, default=None, help="Size budget for evict")
+    args = parser.parse_args()
+
+    cache = EmbeddingCache(args.root)
+    if args.command == "clear":
+        cache.clear()
+        print("Cache cleared")
+    elif args.command == "evict":
+        max_bytes = int(args.max_gb * 1024 ** 3) if args.max_gb is not None else None
+        print(f"Evicted {cache.evict(max_bytes)} entries")
+    else:
+        s = cache.stats()
+        print(f"Entries:   {s['entries']} ({s['bytes'] / 1024 ** 2:.0f} MB / {s['max_bytes'] / 1024 ** 3:.0f} GB)")
+        print(f"Hits:      {s['hits']}  Misses: {s['misses']}  Hit rate: {100 * s['hit_rate']:.1f}%")
+        print(f"Evictions: {s['evictions']}")
+        print(f"Encoder time saved: {s['seconds_saved'] / 60:.1f} min")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
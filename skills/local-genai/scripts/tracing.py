@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+End-to-end request tracing as Chrome trace files
+
+A Trace collects spans for the whole life of a generation - workflow
+build, submit, server queue wait, every node ComfyUI executes (from the
+NodeTimer of node_timing) and the download or local copy of each output
+- and writes them as a Chrome trace / Perfetto JSON file. Open it in
+https://ui.perfetto.dev or chrome://tracing to see at a glance whether a
+slow batch spent its time queueing, loading models or doing I/O.
+
+Tracks (rows in the viewer):
+    main / worker threads   build, cache lookups, downloads and copies
+    prompt <id>             submit, queue wait, run, one span per node
+                            (loaders in category "load", cached nodes
+                            as zero-length spans)
+
+Tracing is off unless a script calls start() - the generation scripts
+do (via start_if_enabled) with --trace or when $COMFYUI_TRACE is set.
+Without an active trace span() and add() do nothing, so library code can
+call them freely.
+
+Usage (from another script):
+    import tracing
+
+    tracing.start("generate_qwen")
+    with tracing.span("build workflow"):
+        workflow = build(...)
+    ...
+    path = tracing.finish()   # ~/.cache/comfyui/traces/generate_qwen-20260101-120000.json
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+TRACE_DIR = Path(os.environ.get("COMFYUI_TRACE_DIR", Path.home() / ".cache" / "comfyui" / "traces")).expanduser()
+
+
+def prompt_track(prompt_id: str) -> str:
+    return f"prompt {prompt_id[:8]}"
+
+
+def node_category(class_type: str) -> str:
+    return "load" if "Loader" in class_type else "node"
+
+
+class Trace:
+    """Spans of one run or batch, in Chrome trace event format."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pid = os.getpid()
+        self.created = time.time()
+        self.events: List[dict] = [
+            {"ph": "M", "name": "process_name", "pid": self.pid, "tid": 0, "args": {"name": name}},
+        ]
+        self._tids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _tid(self, track: Optional[str]) -> int:
+        track = track or threading.current_thread().name
+        if track not in self._tids:
+            self._tids[track] = len(self._tids) + 1
+            self.events.append({"ph": "M", "name": "thread_name", "pid": self.pid,
+                                "tid": self._tids[track], "args": {"name": track}})
+        return self._tids[track]
+
+    def add(self, name: str, start: float, end: float, track: Optional[str] = None, cat: str = "", **args):
+        """Record a span measured elsewhere (start/end in time.time() seconds)."""
+        with self._lock:
+            self.events.append({
+                "ph": "X", "name": name, "cat": cat, "pid": self.pid, "tid": self._tid(track),
+                "ts": round(start * 1e6), "dur": max(0, round((end - start) * 1e6)), "args": args,
+            })
+
+    @contextmanager
+    def span(self, name: str, track: Optional[str] = None, cat: str = "", **args):
+        start = time.time()
+        try:
+            yield args  # callers may add args (sizes, methods) while the span is open
+        finally:
+            self.add(name, start, time.time(), track, cat, **args)
+
+    def add_timer(self, timer):
+        """Queue wait, run and per-node spans of a finished node_timing.NodeTimer."""
+        track = prompt_track(timer.prompt_id)
+        if timer.started_at is None:
+            return
+        if timer.submitted_at:
+            self.add("queue wait", timer.submitted_at, timer.started_at, track, "queue")
+        self.add("run", timer.started_at, timer.finished_at or time.time(), track, "run",
+                 prompt_id=timer.prompt_id, workflow=timer.label)
+        for node in timer.nodes:
+            self.add(node["class_type"], node["start"], node["start"] + node["seconds"], track,
+                     node_category(node["class_type"]), node=node["node"], cached=node["cached"])
+
+    def write(self, path=None) -> Path:
+        if path is None:
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.created))
+            path = TRACE_DIR / f"{self.name}-{stamp}.json"
+        path = Path(path).expanduser()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            data = {"traceEvents": self.events, "displayTimeUnit": "ms"}
+        tmp = path.with_name(f".{path.name}.part")
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, path)
+        return path
+
+
+_active: Optional[Trace] = None
+
+
+def start(name: str) -> Trace:
+    """Begin the process-wide trace."""
+    global _active
+    _active = Trace(name)
+    return _active
+
+
+def active() -> Optional[Trace]:
+    return _active
+
+
+def enabled(flag: bool = False) -> bool:
+    """True if tracing was requested by a --trace flag or $COMFYUI_TRACE."""
+    return flag or os.environ.get("COMFYUI_TRACE", "") not in ("", "0")
+
+
+def finish(path=None) -> Optional[Path]:
+    """Write the active trace and stop tracing. Returns the file, or None."""
+    global _active
+    trace, _active = _active, None
+    return trace.write(path) if trace else None
+
+
+def _finish_at_exit():
+    path = finish()
+    if path:
+        print(f"📈 Trace: {path} (open in https://ui.perfetto.dev)")
+
+
+def start_if_enabled(name: str, flag: bool = False) -> Optional[Trace]:
+    """For scripts: start a trace if requested and write it when the process exits."""
+    if not enabled(flag):
+        return None
+    atexit.register(_finish_at_exit)
+    return start(name)
+
+
+@contextmanager
+def span(name: str, track: Optional[str] = None, cat: str = "", **args):
+    if _active is None:
+        yield args
+        return
+    with _active.span(name, track, cat, **args) as span_args:
+        yield span_args
+
+
+def add(name: str, start: float, end: float, track: Optional[str] = None, cat: str = "", **args):
+    if _active is not None:
+        _active.add(name, start, end, track, cat, **args)
+
+
+def add_timer(timer):
+    if _active is not None:
+        _active.add_timer(timer)
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+Compiled ComfyUI workflow templates
+
+A WorkflowTemplate is an API-format graph that is built (or loaded and
+parsed) once, with named parameter slots such as prompt, seed or width
+that map onto node inputs. render(**params) produces a fresh workflow
+without re-parsing JSON or rebuilding the nested dicts by hand, which
+keeps batch submission cheap.
+
+Workflows are checked locally against ComfyUI's /object_info schema
+(node classes, required inputs, link targets, combo values, INT/FLOAT
+ranges) before submission. The schema is cached on disk per server, so
+an invalid job fails without a server round-trip.
+
+UI-format workflow files (the ones saved from the ComfyUI editor, e.g.
+skills/qwen-image/assets/qwen_image_2512.json) are converted to API
+format on load, including subgraphs, bypassed/muted nodes and reroutes.
+
+Usage (from another script):
+    from workflow_templates import WorkflowTemplate, register, validate_for
+
+    FLUX = register(WorkflowTemplate("flux", graph, slots={"prompt": [("2", "text")]}))
+    workflow = FLUX.render(prompt="a red fox")
+    validate_for(client, workflow)  # raises WorkflowValidationError
+
+CLI (convert a UI workflow and/or validate it against the server schema):
+    python workflow_templates.py workflow.json [--api-out api.json] [--validate]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+CACHE_DIR = Path(os.environ.get("COMFYUI_CACHE_DIR", Path.home() / ".cache" / "comfyui")).expanduser()
+OBJECT_INFO_TTL = 24 * 3600  # seconds
+OBJECT_INFO_RECHECK = 60  # a failed validation re-fetches a schema older than this (seconds)
+
+WIDGET_TYPES = ("INT", "FLOAT", "STRING", "BOOLEAN", "COMBO")
+SEED_INPUTS = ("seed", "noise_seed")
+UI_ONLY_NODES = ("Note", "MarkdownNote")
+MODE_MUTED = 2
+MODE_BYPASS = 4
+
+# Widget order of core nodes, used when converting UI workflows without a
+# server schema. "control_after_generate" is a UI-only widget after seeds.
+BUILTIN_WIDGETS = {
+    "CheckpointLoaderSimple": ["ckpt_name"],
+    "VAELoader": ["vae_name"],
+    "CLIPLoader": ["clip_name", "type", "device"],
+    "DualCLIPLoader": ["clip_name1", "clip_name2", "type", "device"],
+    "UNETLoader": ["unet_name", "weight_dtype"],
+    "LoraLoader": ["lora_name", "strength_model", "strength_clip"],
+    "LoraLoaderModelOnly": ["lora_name", "strength_model"],
+    "CLIPTextEncode": ["text"],
+    "EmptyLatentImage": ["width", "height", "batch_size"],
+    "EmptySD3LatentImage": ["width", "height", "batch_size"],
+    "EmptyLTXVLatentVideo": ["width", "height", "length", "batch_size"],
+    "KSampler": ["seed", "control_after_generate", "steps", "cfg", "sampler_name", "scheduler", "denoise"],
+    "RandomNoise": ["noise_seed", "control_after_generate"],
+    "KSamplerSelect": ["sampler_name"],
+    "BasicScheduler": ["scheduler", "steps", "denoise"],
+    "CFGGuider": ["cfg"],
+    "ModelSamplingAuraFlow": ["shift"],
+    "VAEDecode": [],
+    "VAEDecodeTiled": ["tile_size", "overlap", "temporal_size", "temporal_overlap"],
+    "LoadImage": ["image", "upload"],
+    "SaveImage": ["filename_prefix"],
+    "SaveAnimatedWEBP": ["filename_prefix", "fps", "lossless", "quality", "method"],
+    "PrimitiveString": ["value"],
+    "PrimitiveStringMultiline": ["value"],
+    "PrimitiveInt": ["value", "control_after_generate"],
+    "PrimitiveFloat": ["value"],
+}
+
+
+class WorkflowValidationError(ValueError):
+    """A workflow does not match the server's node schema."""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__("; ".join(errors))
+
+
+# -- templates ----------------------------------------------------------------
+
+def copy_graph(graph: dict) -> dict:
+    """Copy nodes and their inputs dicts (link lists are never mutated in place)."""
+    return {node_id: {**node, "inputs": dict(node["inputs"])} for node_id, node in graph.items()}
+
+
+class WorkflowTemplate:
+    """API-format graph with named parameter slots.
+
+    slots maps a parameter name to the (node_id, input_name) pairs it sets;
+    defaults holds values used when render() is called without them.
+    """
+
+    def __init__(self, name: str, graph: dict, slots: Dict[str, List[Tuple[str, str]]],
+                 defaults: Optional[dict] = None):
+        self.name = name
+        self.graph = graph
+        self.slots = slots
+        self.defaults = defaults or {}
+        self._checked_schema: Optional[int] = None
+        for slot, targets in slots.items():
+            for node_id, input_name in targets:
+                if node_id not in graph:
+                    raise KeyError(f"Template {name}: slot {slot} targets missing node {node_id}")
+
+    def render(self, **params) -> dict:
+        """Fresh API workflow with the given slot values filled in."""
+        unknown = set(params) - set(self.slots)
+        if unknown:
+            raise TypeError(f"Template {self.name} has no slot(s) {sorted(unknown)}")
+        workflow = copy_graph(self.graph)
+        for slot, value in {**self.defaults, **params}.items():
+            for node_id, input_name in self.slots[slot]:
+                workflow[node_id]["inputs"][input_name] = value
+        return workflow
+
+    def validate(self, workflow: dict, object_info: dict):
+        """Validate a rendered workflow.
+
+        The graph structure is checked once per schema; later calls only
+        check the inputs the slots can change.
+        """
+        if self._checked_schema != id(object_info):
+            validate_workflow(workflow, object_info)
+            self._checked_schema = id(object_info)
+            return
+        errors = []
+        for targets in self.slots.values():
+            for node_id, input_name in targets:
+                node = workflow[node_id]
+                spec = _input_spec(object_info.get(node["class_type"], {}), input_name)
+                if spec is not None:
+                    errors += _check_value(node_id, node["class_type"], input_name,
+                                           node["inputs"][input_name], spec)
+        if errors:
+            raise WorkflowValidationError(errors)
+
+
+_registry: Dict[str, WorkflowTemplate] = {}
+_file_cache: Dict[Tuple[str, float], dict] = {}
+
+
+def register(template: WorkflowTemplate) -> WorkflowTemplate:
+    _registry[template.name] = template
+    return template
+
+
+def get_template(name: str) -> WorkflowTemplate:
+    return _registry[name]
+
+
+def load_workflow_file(path, object_info: Optional[dict] = None) -> dict:
+    """Parse a workflow file once per (path, mtime), converting UI format to API format."""
+    path = Path(path).expanduser()
+    key = (str(path), path.stat().st_mtime)
+    if key not in _file_cache:
+        data = json.loads(path.read_text())
+        _file_cache[key] = ui_to_api(data, object_info) if is_ui_format(data) else data
+    return _file_cache[key]
+
+
+def load_template_file(path, name: Optional[str] = None, slots=None, defaults=None,
+                       object_info: Optional[dict] = None) -> WorkflowTemplate:
+    """Register (once) and return a template backed by a workflow file."""
+    name = name or Path(path).stem
+    graph = load_workflow_file(path, object_info)
+    template = _registry.get(name)
+    if template is None or template.graph is not graph:
+        template = register(WorkflowTemplate(name, graph, slots or {}, defaults))
+    return template
+
+
+# -- /object_info schema ------------------------------------------------------
+
+_object_info: Dict[str, dict] = {}
+_object_info_fetched: Dict[str, float] = {}  # base URL -> when its schema was fetched from the server
+
+
+def object_info_path(base_url: str) -> Path:
+    digest = hashlib.sha1(base_url.encode()).hexdigest()[:12]
+    return CACHE_DIR / f"object_info_{digest}.json"
+
+
+def get_object_info(client, refresh: bool = False, ttl: float = OBJECT_INFO_TTL) -> dict:
+    """Server node schema, cached in memory and on disk for `ttl` seconds."""
+    if not refresh and client.base_url in _object_info:
+        return _object_info[client.base_url]
+
+    path = object_info_path(client.base_url)
+    if not refresh and path.exists() and time.time() - path.stat().st_mtime < ttl:
+        info = json.loads(path.read_text())
+        _object_info_fetched[client.base_url] = path.stat().st_mtime
+    else:
+        info = client.get_object_info()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(info))
+        os.replace(tmp, path)
+        _object_info_fetched[client.base_url] = time.time()
+    _object_info[client.base_url] = info
+    return info
+
+
+def validate_for(client, workflow: dict, template: Optional[WorkflowTemplate] = None):
+    """Validate against the cached schema; refresh it before failing if it is not recent.
+
+    A stale cache (new model files, newly installed custom nodes) therefore
+    never rejects a valid workflow, while a run of invalid jobs costs at
+    most one /object_info download per OBJECT_INFO_RECHECK seconds - the
+    rest fail straight from the cache.
+    """
+    info = get_object_info(client)
+    check = template.validate if template else validate_workflow
+    try:
+        check(workflow, info)
+    except WorkflowValidationError:
+        if time.time() - _object_info_fetched.get(client.base_url, 0) < OBJECT_INFO_RECHECK:
+            raise
+        check(workflow, get_object_info(client, refresh=True))
+
+
+def _input_spec(node_info: dict, name: str):
+    for section in ("required", "optional", "hidden"):
+        spec = node_info.get("input", {}).get(section, {}).get(name)
+        if spec is not None:
+            return spec
+    return None
+
+
+def _check_value(node_id, class_type, name, value, spec) -> List[str]:
+    kind = spec[0]
+    options = spec[1] if len(spec) > 1 and isinstance(spec[1], dict) else {}
+    where = f"node {node_id} ({class_type}) input {name}"
+    if kind == "COMBO":
+        kind = options.get("options", [])
+    if isinstance(kind, list):
+        if kind and value not in kind:
+            return [f"{where}: {value!r} is not one of the {len(kind)} available values"]
+    elif kind in ("INT", "FLOAT"):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return [f"{where}: expected {kind}, got {value!r}"]
+        if "min" in options and value < options["min"]:
+            return [f"{where}: {value} < min {options['min']}"]
+        if "max" in options and value > options["max"]:
+            return [f"{where}: {value} > max {options['max']}"]
+    elif kind == "STRING" and not isinstance(value, str):
+        return [f"{where}: expected STRING, got {value!r}"]
+    return []
+
+
+def validate_workflow(workflow: dict, object_info: dict):
+    """Check an API workflow against a /object_info schema.
+
+    Raises WorkflowValidationError listing every problem found.
+    """
+    errors = []
+    has_output = False
+    for node_id, node in workflow.items():
+        class_type = node.get("class_type")
+        node_info = object_info.get(class_type)
+        if node_info is None:
+            errors.append(f"node {node_id}: unknown node type {class_type!r}")
+            continue
+        has_output = has_output or node_info.get("output_node", False)
+        inputs = node.get("inputs", {})
+
+        for name in node_info.get("input", {}).get("required", {}):
+            if name not in inputs:
+                errors.append(f"node {node_id} ({class_type}): missing required input {name}")
+
+        for name, value in inputs.items():
+            spec = _input_spec(node_info, name)
+            if spec is None:
+                continue  # extra inputs (e.g. control_after_generate) are ignored by ComfyUI
+            if isinstance(value, list) and len(value) == 2 and isinstance(value[1], int):
+                source = workflow.get(str(value[0]))
+                if source is None:
+                    errors.append(f"node {node_id} ({class_type}) input {name}: links to missing node {value[0]}")
+                    continue
+                source_info = object_info.get(source.get("class_type"), {})
+                outputs = source_info.get("output", [])
+                if source_info and value[1] >= len(outputs):
+                    errors.append(f"node {node_id} ({class_type}) input {name}: "
+                                  f"{source['class_type']} has no output {value[1]}")
+                elif source_info and isinstance(spec[0], str) and spec[0] not in ("*", "COMBO") \
+                        and isinstance(outputs[value[1]], str) and outputs[value[1]] not in ("*", spec[0]) \
+                        and spec[0] not in outputs[value[1]].split(","):
+                    errors.append(f"node {node_id} ({class_type}) input {name}: "
+                                  f"expects {spec[0]}, gets {outputs[value[1]]} from {source['class_type']}")
+            else:
+                errors += _check_value(node_id, class_type, name, value, spec)
+
+    if workflow and not has_output and not errors:
+        errors.append("workflow has no output node")
+    if errors:
+        raise WorkflowValidationError(errors)
+
+
+# -- UI format -> API format -----------------------------------------------------
+
+def is_ui_format(data: dict) -> bool:
+    return isinstance(data.get("nodes"), list) and "links" in data
+
+
+def widget_names(class_type: str, object_info: Optional[dict] = None) -> Optional[List[str]]:
+    """Names for a node's widgets_values, in order."""
+    node_info = (object_info or {}).get(class_type)
+    if node_info is None:
+        return BUILTIN_WIDGETS.get(class_type)
+    names = []
+    for section in ("required", "optional"):
+        for name, spec in node_info.get("input", {}).get(section, {}).items():
+            kind = spec[0]
+            options = spec[1] if len(spec) > 1 and isinstance(spec[1], dict) else {}
+            if isinstance(kind, list) or kind in WIDGET_TYPES:
+                if options.get("forceInput"):
+                    continue
+                names.append(name)
+                if name in SEED_INPUTS or options.get("control_after_generate"):
+                    names.append("control_after_generate")
+    return names
+
+
+def _normalize_links(links) -> Dict[int, dict]:
+    result = {}
+    for link in links or []:
+        if isinstance(link, list):
+            link = dict(zip(("id", "origin_id", "origin_slot", "target_id", "target_slot", "type"), link))
+        result[link["id"]] = link
+    return result
+
+
+def ui_to_api(ui: dict, object_info: Optional[dict] = None) -> dict:
+    """Convert an editor (UI-format) workflow into an API-format prompt.
+
+    Subgraph nodes are inlined with ids "<outer>:<inner>", bypassed nodes
+    pass their inputs through, muted and note nodes are dropped.
+    """
+    subgraphs = {sg["id"]: sg for sg in ui.get("definitions", {}).get("subgraphs", [])}
+    api: Dict[str, dict] = {}
+    _convert_scope(ui["nodes"], _normalize_links(ui["links"]), subgraphs, object_info, "", {}, {}, api)
+    return api
+
+
+def _convert_scope(nodes, links, subgraphs, object_info, prefix, external, overrides, api) -> dict:
+    """Emit the API nodes of one graph level into api.
+
+    external: subgraph input slot -> resolved value (link or literal).
+    overrides: (inner node id, widget name) -> value from proxy widgets.
+    Returns {output slot: resolved value} for links into the subgraph output node.
+    """
+    by_id = {n["id"]: n for n in nodes}
+    expanded: Dict[int, dict] = {}
+
+    def linked_input(node, name=None, type_=None):
+        for item in node.get("inputs", []):
+            if (name is None or item["name"] == name) and (type_ is None or item.get("type") == type_):
+                if item.get("link") is not None:
+                    return links[item["link"]]
+        return None
+
+    def resolve(origin_id, origin_slot):
+        if origin_id == -10:
+            return external.get(origin_slot)
+        node = by_id.get(origin_id)
+        if node is None or node.get("mode") == MODE_MUTED:
+            return None
+        if node["type"] == "Reroute" or node.get("mode") == MODE_BYPASS:
+            outputs = node.get("outputs", [])
+            type_ = outputs[origin_slot].get("type") if origin_slot < len(outputs) else None
+            link = linked_input(node, type_=type_ if node["type"] != "Reroute" else None)
+            return resolve(link["origin_id"], link["origin_slot"]) if link else None
+        if node["type"] == "PrimitiveNode":
+            return (node.get("widgets_values") or [None])[0]
+        if node["type"] in subgraphs:
+            return expand(node).get(origin_slot)
+        return [f"{prefix}{origin_id}", origin_slot]
+
+    def expand(node):
+        if node["id"] in expanded:
+            return expanded[node["id"]]
+        sg = subgraphs[node["type"]]
+        values = node.get("widgets_values") or []
+        proxies = node.get("properties", {}).get("proxyWidgets", [])
+        inner_external, inner_overrides = {}, {}
+        for i, (inner_id, widget) in enumerate(proxies):
+            if i >= len(values):
+                break
+            if str(inner_id) == "-1":
+                slot = next((k for k, sgi in enumerate(sg["inputs"]) if sgi["name"] == widget), None)
+                if slot is not None:
+                    inner_external[slot] = values[i]
+            else:
+                inner_overrides[(int(inner_id), widget)] = values[i]
+        for k, sgi in enumerate(sg["inputs"]):
+            link = linked_input(node, name=sgi["name"])
+            if link is not None:
+                inner_external[k] = resolve(link["origin_id"], link["origin_slot"])
+        result = _convert_scope(sg["nodes"], _normalize_links(sg["links"]), subgraphs, object_info,
+                                f"{prefix}{node['id']}:", inner_external, inner_overrides, api)
+        expanded[node["id"]] = result
+        return result
+
+    for node in nodes:
+        class_type = node["type"]
+        if node.get("mode", 0) in (MODE_MUTED, MODE_BYPASS) or class_type in UI_ONLY_NODES \
+                or class_type in ("Reroute", "PrimitiveNode"):
+            continue
+        if class_type in subgraphs:
+            expand(node)
+            continue
+
+        inputs = {}
+        values = node.get("widgets_values")
+        if isinstance(values, dict):
+            inputs.update(values)
+        elif values:
+            names = widget_names(class_type, object_info)
+            if names is None:
+                raise ValueError(f"Unknown widget layout for {class_type}; pass object_info from the server")
+            inputs.update(zip(names, values))
+        for (inner_id, widget), value in overrides.items():
+            if inner_id == node["id"]:
+                inputs[widget] = value
+        inputs.pop("control_after_generate", None)
+        inputs.pop("upload", None)
+
+        for item in node.get("inputs", []):
+            if item.get("link") is None:
+                continue
+            link = links[item["link"]]
+            value = resolve(link["origin_id"], link["origin_slot"])
+            if value is not None:
+                inputs[item["name"]] = value
+            elif item.get("widget") is None:
+                inputs.pop(item["name"], None)
+
+        api[f"{prefix}{node['id']}"] = {"inputs": inputs, "class_type": class_type,
+                                        "_meta": {"title": node.get("title", class_type)}}
+
+    return {link["target_slot"]: resolve(link["origin_id"], link["origin_slot"])
+            for link in links.values() if link["target_id"] == -20}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert and validate ComfyUI workflow files")
+    parser.add_argument("workflow", help="UI- or API-format workflow JSON")
+    parser.add_argument("--api-out", help="Write the API-format workflow here")
+    parser.add_argument("--validate", action="store_true", help="Validate against the server schema")
+    parser.add_argument("--comfyui-url", default=None,
+                        help="ComfyUI base URL (default: $COMFYUI_URL or http://127.0.0.1:8188)")
+    args = parser.parse_args()
+
+    object_info = None
+    if args.validate:
+        from comfyui_client import get_client
+        object_info = get_object_info(get_client(args.comfyui_url))
+
+    workflow = load_workflow_file(args.workflow, object_info)
+    print(f"{len(workflow)} nodes: {sorted({n['class_type'] for n in workflow.values()})}")
+    if args.api_out:
+        Path(args.api_out).write_text(json.dumps(workflow, indent=2, ensure_ascii=False))
+        print(f"API workflow written to {args.api_out}")
+    if object_info is not None:
+        try:
+            validate_workflow(workflow, object_info)
+            print("✓ Valid")
+        except WorkflowValidationError as e:
+            for error in e.errors:
+                print(f"✗ {error}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,47 +5,69 @@ Handles T2V and I2V using the fixed directory structure.
 """
 
 import json
-import urllib.request
 import os
 import sys
 import argparse
+from pathlib import Path
 
-COMFY_URL = "http://127.0.0.1:8188"
+import requests
+
+# Shared ComfyUI client and template registry live in the local-genai skill
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "local-genai" / "scripts"))
+from comfyui_client import get_client
+from job_store import JobStore
+from workflow_templates import WorkflowValidationError, load_template_file, validate_for
+
+COMFY_URL = os.environ.get("COMFYUI_URL", "http://127.0.0.1:8188")
 WORKFLOW_PATH = "/home/enric/ComfyUI/user_workflows/ltxv_i2v_final.json"
 
+# Parameter slots of ltxv_i2v_final.json
+WORKFLOW_SLOTS = {
+    "prompt": [("3", "text")],
+    "image": [("2", "image")],
+    "frames": [("6", "length")],
+    "steps": [("7", "steps")],
+}
+
+
+def workflow_template():
+    """The I2V template, parsed once per process."""
+    return load_template_file(WORKFLOW_PATH, name="ltxv_i2v", slots=WORKFLOW_SLOTS)
+
+
 def generate_video(prompt_text, image_name=None, frames=97, steps=30):
-    with open(WORKFLOW_PATH, 'r') as f:
-        workflow = json.load(f)
-    
-    # Update prompt
-    workflow["3"]["inputs"]["text"] = prompt_text
+    client = get_client(COMFY_URL)
+    template = workflow_template()
     
-    # Update image if provided
+    params = {"prompt": prompt_text, "frames": frames, "steps": steps}
     if image_name:
-        workflow["2"]["inputs"]["image"] = image_name
-    
-    # Update specs
-    workflow["6"]["inputs"]["length"] = frames
-    workflow["7"]["inputs"]["steps"] = steps
+        params["image"] = image_name
+    workflow = template.render(**params)
     
     # Submit
-    payload = {"prompt": workflow}
-    data = json.dumps(payload).encode('utf-8')
-    
-    req = urllib.request.Request(
-        f"{COMFY_URL}/prompt",
-        data=data,
-        headers={'Content-Type': 'application/json'},
-        method='POST'
-    )
-    
     try:
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            return result.get('prompt_id')
-    except Exception as e:
+        validate_for(client, workflow, template)
+        # Recorded before it is queued, so a crashed or restarted agent can re-attach to it
+        prompt_id = JobStore().submit(client, workflow, name=prompt_text[:60])
+    except WorkflowValidationError as e:
+        print("Invalid workflow:")
+        for error in e.errors:
+            print(f"  {error}")
+        return None
+    except requests.RequestException as e:
         print(f"Error submitting prompt: {e}")
         return None
+    return prompt_id
+
+
+def wait_for_video(prompt_id, timeout=3600):
+    """Block until the job finishes and record its outputs in the job store."""
+    client = get_client(COMFY_URL)
+    entry = client.wait_for_prompt(prompt_id, timeout=timeout)
+    jobs = JobStore()
+    jobs.record_result(prompt_id, entry)
+    return jobs.get(prompt_id)
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -53,10 +75,21 @@ if __name__ == "__main__":
     parser.add_argument("--image", help="Filename in ComfyUI input folder")
     parser.add_argument("--frames", type=int, default=97)
     parser.add_argument("--steps", type=int, default=30)
+    parser.add_argument("--wait", action="store_true", help="Wait for the render to finish")
     
     args = parser.parse_args()
     prompt_id = generate_video(args.prompt, args.image, args.frames, args.steps)
     if prompt_id:
         print(f"SUCCESS: Prompt submitted. ID: {prompt_id}")
+        if args.wait:
+            job = wait_for_video(prompt_id)
+            print(f"Status: {job['status']}")
+            if job["outputs"]:
+                for f in json.loads(job["outputs"]):
+                    print(f"  {os.path.join(f['subfolder'], f['filename'])}")
+            if job["status"] != "success":
+                sys.exit(1)
+        else:
+            print("Re-attach later with: python skills/local-genai/scripts/job_store.py resume")
     else:
         sys.exit(1)
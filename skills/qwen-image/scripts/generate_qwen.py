@@ -2,136 +2,203 @@
 """
 Qwen-Image-2512 Generator
 Generate images using ComfyUI API with Qwen-Image model
+
+Batch mode keeps several prompts queued in ComfyUI so the GPU never waits
+for the next submission:
+    python generate_qwen.py --batch prompts.jsonl --queue-depth 4 --output-dir out/
+
+Each line of prompts.jsonl is an object with "prompt" and optional
+"width", "height", "steps", "seed", "use_lightning" and "output".
+Malformed lines are reported (file:line) and skipped; the rest still run.
+Jobs are submitted in model-affinity order (job_scheduler.py), so Lightning
+and regular prompts are grouped instead of re-patching the model each time.
+
+--trace writes a Chrome trace of the run or batch (build, submit, queue
+wait, every node, downloads) to ~/.cache/comfyui/traces.
 """
 
 import argparse
+import asyncio
 import json
+import os
 import requests
 import sys
 import time
 from pathlib import Path
 
-COMFYUI_URL = "http://127.0.0.1:8188"
+# Shared pooled ComfyUI client lives in the local-genai skill
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "local-genai" / "scripts"))
+from backend_pool import NoBackendAvailable
+from comfyui_client import get_client, numbered_paths
+from comfyui_outputs import RETRIEVE_MODES
+from comfyui_run import cache_outputs, collect_outputs, restore_hit, run_with_failover
+from graph_merge import merge_workflows
+from job_scheduler import ModelAffinityScheduler
+from result_cache import ResultCache
+from seed_sweep import QWEN_GB_PER_MP, fit_batch_size, format_sweep, is_seed_range, run_sweep, parse_seeds
+import tracing
+from workflow_templates import (WorkflowTemplate, WorkflowValidationError, copy_graph, register,
+                                load_template_file, validate_for)
+
+client = get_client()
+COMFYUI_URL = client.base_url
 OUTPUT_DIR = Path.home() / "ComfyUI" / "output"
 WORKFLOW_PATH = Path(__file__).parent.parent / "assets" / "qwen_image_2512.json"
 
-def create_api_workflow(prompt, width=1328, height=1328, steps=20, seed=None, use_lightning=False):
-    """Create API-compatible workflow from template"""
-    
-    if seed is None:
-        seed = int(time.time()) % 1000000000
-    
-    # Base workflow structure (from analyzed JSON)
-    workflow = {
-        "1": {
-            "inputs": {"vae_name": "qwen_image_vae.safetensors"},
-            "class_type": "VAELoader"
+QWEN_SLOTS = {
+    "prompt": [("4", "text")],
+    "width": [("6", "width")],
+    "height": [("6", "height")],
+    "seed": [("7", "seed")],
+    "steps": [("7", "steps")],
+}
+
+# Base workflow structure (from analyzed JSON)
+QWEN_GRAPH = {
+    "1": {
+        "inputs": {"vae_name": "qwen_image_vae.safetensors"},
+        "class_type": "VAELoader"
+    },
+    "2": {
+        "inputs": {
+            "clip_name": "qwen_2.5_vl_7b_fp8_scaled.safetensors",
+            "type": "qwen_image"
         },
-        "2": {
-            "inputs": {
-                "clip_name": "qwen_2.5_vl_7b_fp8_scaled.safetensors",
-                "type": "qwen_image"
-            },
-            "class_type": "CLIPLoader"
+        "class_type": "CLIPLoader"
+    },
+    "3": {
+        "inputs": {
+            "unet_name": "qwen_image_2512_fp8_e4m3fn.safetensors",
+            "weight_dtype": "fp8_e4m3fn"
         },
-        "3": {
-            "inputs": {
-                "unet_name": "qwen_image_2512_fp8_e4m3fn.safetensors",
-                "weight_dtype": "fp8_e4m3fn"
-            },
-            "class_type": "UNETLoader"
+        "class_type": "UNETLoader"
+    },
+    "4": {
+        "inputs": {
+            "text": "",
+            "clip": ["2", 0]
         },
-        "4": {
-            "inputs": {
-                "text": prompt,
-                "clip": ["2", 0]
-            },
-            "class_type": "CLIPTextEncode"
+        "class_type": "CLIPTextEncode"
+    },
+    "5": {
+        "inputs": {
+            "text": "",
+            "clip": ["2", 0]
         },
-        "5": {
-            "inputs": {
-                "text": "",
-                "clip": ["2", 0]
-            },
-            "class_type": "CLIPTextEncode"
+        "class_type": "CLIPTextEncode"
+    },
+    "6": {
+        "inputs": {
+            "width": 1328,
+            "height": 1328,
+            "batch_size": 1
         },
-        "6": {
-            "inputs": {
-                "width": width,
-                "height": height,
-                "batch_size": 1
-            },
-            "class_type": "EmptySD3LatentImage"
+        "class_type": "EmptySD3LatentImage"
+    },
+    "7": {
+        "inputs": {
+            "seed": 0,
+            "steps": 20,
+            "cfg": 4.5,
+            "sampler_name": "euler",
+            "scheduler": "normal",
+            "denoise": 1.0,
+            "model": ["8", 0],
+            "positive": ["4", 0],
+            "negative": ["5", 0],
+            "latent_image": ["6", 0]
         },
-        "7": {
-            "inputs": {
-                "seed": seed,
-                "steps": steps,
-                "cfg": 4.5,
-                "sampler_name": "euler",
-                "scheduler": "normal",
-                "denoise": 1.0,
-                "model": ["8", 0],
-                "positive": ["4", 0],
-                "negative": ["5", 0],
-                "latent_image": ["6", 0]
-            },
-            "class_type": "KSampler"
+        "class_type": "KSampler"
+    },
+    "8": {
+        "inputs": {
+            "shift": 1.73,
+            "model": ["3", 0]
         },
-        "8": {
-            "inputs": {
-                "shift": 1.73,
-                "model": ["3", 0]
-            },
-            "class_type": "ModelSamplingAuraFlow"
+        "class_type": "ModelSamplingAuraFlow"
+    },
+    "9": {
+        "inputs": {
+            "samples": ["7", 0],
+            "vae": ["1", 0]
         },
-        "9": {
-            "inputs": {
-                "samples": ["7", 0],
-                "vae": ["1", 0]
-            },
-            "class_type": "VAEDecode"
+        "class_type": "VAEDecode"
+    },
+    "10": {
+        "inputs": {
+            "filename_prefix": "qwen_image",
+            "images": ["9", 0]
         },
-        "10": {
-            "inputs": {
-                "filename_prefix": "qwen_image",
-                "images": ["9", 0]
-            },
-            "class_type": "SaveImage"
-        }
+        "class_type": "SaveImage"
     }
+}
+
+def _lightning_graph(graph):
+    """Base graph plus the Lightning LoRA, rewired behind the UNET/CLIP loaders"""
+    graph = copy_graph(graph)
+    graph["11"] = {
+        "inputs": {
+            "lora_name": "Qwen-Image-Lightning-4steps-V1.0.safetensors",
+            "strength_model": 1.0,
+            "strength_clip": 1.0,
+            "model": ["3", 0],
+            "clip": ["2", 0]
+        },
+        "class_type": "LoraLoader"
+    }
+    # Update references
+    graph["7"]["inputs"]["model"] = ["11", 0]
+    graph["4"]["inputs"]["clip"] = ["11", 1]
+    graph["5"]["inputs"]["clip"] = ["11", 1]
+    graph["8"]["inputs"]["model"] = ["11", 0]
+    return graph
+
+QWEN_TEMPLATE = register(WorkflowTemplate("qwen_image", QWEN_GRAPH, QWEN_SLOTS))
+QWEN_LIGHTNING_TEMPLATE = register(WorkflowTemplate("qwen_image_lightning", _lightning_graph(QWEN_GRAPH), QWEN_SLOTS))
+
+def asset_template():
+    """Template for the editor workflow in assets/ (converted from UI format once per process)"""
+    return load_template_file(WORKFLOW_PATH, name="qwen_image_2512_asset", slots={
+        "prompt": [("91", "value")],
+        "width": [("86:58", "width")],
+        "height": [("86:58", "height")],
+        "seed": [("86:3", "seed")],
+        "steps": [("86:3", "steps")],
+    })
+
+def select_template(use_lightning=False, from_asset=False):
+    if from_asset:
+        return asset_template()
+    return QWEN_LIGHTNING_TEMPLATE if use_lightning else QWEN_TEMPLATE
+
+def create_api_workflow(prompt, width=1328, height=1328, steps=20, seed=None, use_lightning=False,
+                        from_asset=False):
+    """Create API-compatible workflow from the compiled template"""
     
-    # Add Lightning LoRA if requested
-    if use_lightning:
-        workflow["11"] = {
-            "inputs": {
-                "lora_name": "Qwen-Image-Lightning-4steps-V1.0.safetensors",
-                "strength_model": 1.0,
-                "strength_clip": 1.0,
-                "model": ["3", 0],
-                "clip": ["2", 0]
-            },
-            "class_type": "LoraLoader"
-        }
-        # Update references
-        workflow["7"]["inputs"]["model"] = ["11", 0]
-        workflow["4"]["inputs"]["clip"] = ["11", 1]
-        workflow["5"]["inputs"]["clip"] = ["11", 1]
-        workflow["8"]["inputs"]["model"] = ["11", 0]
+    if seed is None:
+        seed = int(time.time()) % 1000000000
     
+    template = select_template(use_lightning, from_asset)
+    workflow = template.render(prompt=prompt, width=width, height=height, steps=steps, seed=seed)
     return workflow, seed
 
-def submit_workflow(workflow):
-    """Submit workflow to ComfyUI API"""
+def submit_workflow(workflow, template=None, failover=False):
+    """Validate workflow against the cached /object_info schema, then submit to ComfyUI API
+
+    With failover, an unreachable server raises requests.ConnectionError so the job can go elsewhere.
+    """
     try:
-        response = requests.post(
-            f"{COMFYUI_URL}/prompt",
-            json={"prompt": workflow},
-            timeout=10
-        )
-        response.raise_for_status()
-        return response.json()["prompt_id"]
+        with tracing.span("validate", cat="build"):
+            validate_for(client, workflow, template)
+        return client.queue_prompt(workflow)["prompt_id"]
+    except WorkflowValidationError as e:
+        print("❌ Error: invalid workflow")
+        for error in e.errors:
+            print(f"   {error}")
+        sys.exit(1)
     except requests.exceptions.ConnectionError:
+        if failover:
+            raise
         print(f"❌ Error: Cannot connect to ComfyUI at {COMFYUI_URL}")
         print("   Start ComfyUI first: cd ~/ComfyUI && python main.py")
         sys.exit(1)
@@ -142,54 +209,50 @@ def submit_workflow(workflow):
             print(f"❌ Error submitting workflow: {e}")
         sys.exit(1)
 
-def wait_for_completion(prompt_id, timeout=600):
-    """Wait for generation to complete"""
+def wait_for_completion(prompt_id, timeout=600, failover=False):
+    """Wait for generation to complete (WebSocket notification, polling fallback).
+
+    With failover, a lost server raises requests.ConnectionError so the job can go elsewhere.
+    """
     start = time.time()
     print(f"⏳ Waiting for generation... (timeout: {timeout}s)")
     
-    while time.time() - start < timeout:
-        try:
-            response = requests.get(f"{COMFYUI_URL}/history/{prompt_id}", timeout=10)
-            data = response.json()
-            
-            if prompt_id in data:
-                status = data[prompt_id].get("status", {})
-                status_str = status.get("status_str", "unknown")
-                
-                if status_str == "success":
-                    print("\n✅ Generation complete!")
-                    return True, data[prompt_id]
-                elif status_str == "error":
-                    print("\n❌ Generation failed!")
-                    msgs = status.get("messages", [])
-                    errors = [m for m in msgs if isinstance(m, list) and "error" in str(m[0]).lower()]
-                    if errors:
-                        print(f"   Error: {errors[0][1].get('exception_message', 'Unknown')}")
-                    return False, None
-                
-                # Progress indicator
-                elapsed = int(time.time() - start)
-                print(f"   Status: {status_str}... ({elapsed}s)", end="\r")
-                
-        except Exception as e:
-            pass
-        
-        time.sleep(2)
-    
-    print("\n⚠️  Timeout waiting for generation")
-    return False, None
-
-def find_output_file(prompt_id):
-    """Find the generated image file"""
-    # Check for recent files
-    files = sorted(OUTPUT_DIR.glob("qwen_image_*.png"), key=lambda x: x.stat().st_mtime, reverse=True)
-    if files:
-        return files[0]
-    return None
-
-def generate_image(prompt, width=1328, height=1328, steps=20, seed=None, use_lightning=False, output=None):
-    """Main generation function"""
+    def on_progress(value, max_val):
+        elapsed = int(time.time() - start)
+        print(f"   Step {value}/{max_val}... ({elapsed}s)", end="\r")
+    
+    try:
+        entry = client.wait_for_prompt(prompt_id, timeout=timeout, on_progress=on_progress)
+    except TimeoutError:
+        print("\n⚠️  Timeout waiting for generation")
+        return False, None
+    except requests.exceptions.RequestException as e:
+        if failover and isinstance(e, requests.exceptions.ConnectionError):
+            raise
+        print(f"\n❌ Lost connection to ComfyUI: {e}")
+        return False, None
     
+    status = entry.get("status", {})
+    if status.get("status_str") == "error":
+        print("\n❌ Generation failed!")
+        msgs = status.get("messages", [])
+        errors = [m for m in msgs if isinstance(m, list) and "error" in str(m[0]).lower()]
+        if errors:
+            print(f"   Error: {errors[0][1].get('exception_message', 'Unknown')}")
+        return False, None
+    
+    print(f"\n✅ Generation complete! ({time.time() - start:.1f}s)")
+    return True, entry
+
+def generate_image(prompt, width=1328, height=1328, steps=20, seed=None, use_lightning=False, output=None,
+                   retrieve="auto", from_asset=False, use_cache=True, backends=None, variants=None):
+    """Main generation function. Returns the list of generated image paths (or None).
+
+    With use_cache, a workflow that was rendered before (same prompt, seed,
+    size, steps, ...) is served from the local result cache. backends is a
+    comma-separated list of ComfyUI URLs to load-balance over. variants are
+    extra prompts rendered in the same job, sharing loaders and encodes.
+    """
     print("🎨 Qwen-Image-2512 Generator")
     print(f"   Prompt: {prompt[:60]}...")
     print(f"   Size: {width}x{height}")
@@ -199,44 +262,294 @@ def generate_image(prompt, width=1328, height=1328, steps=20, seed=None, use_lig
     print()
     
     # Create workflow
-    workflow, seed = create_api_workflow(prompt, width, height, steps, seed, use_lightning)
+    with tracing.span("build workflow", cat="build"):
+        workflow, seed = create_api_workflow(prompt, width, height, steps, seed, use_lightning, from_asset)
     print(f"🎲 Seed: {seed}")
+    template = select_template(use_lightning, from_asset)
+    prompts, node_maps = [prompt] + list(variants or []), None
+    if variants:
+        with tracing.span("merge variants", cat="build", variants=len(variants) + 1):
+            workflows = [workflow] + [create_api_workflow(v, width, height, steps, seed, use_lightning,
+                                                          from_asset)[0] for v in variants]
+            workflow, node_maps = merge_workflows(workflows)
+        template = None  # merged graph no longer has the template's shape
+        print(f"🔀 {len(workflows)} prompts in one job ({sum(map(len, workflows))} → {len(workflow)} nodes)")
     
-    # Submit
-    print("📤 Submitting to ComfyUI...")
-    prompt_id = submit_workflow(workflow)
-    print(f"   Prompt ID: {prompt_id}")
-    
-    # Wait
-    success, result = wait_for_completion(prompt_id)
-    
-    if success:
-        # Find output
-        output_file = find_output_file(prompt_id)
-        if output_file:
-            print(f"\n💾 Saved: {output_file}")
-            if output:
-                import shutil
-                shutil.copy(output_file, output)
-                print(f"   Copied to: {output}")
-            return output_file
-        else:
-            print(f"\n⚠️  Output saved to: {OUTPUT_DIR}")
-            return None
-    else:
+    cache = ResultCache() if use_cache else None
+    with tracing.span("cache lookup", cat="cache"):
+        cached = cache.get(workflow) if cache else None
+    if cached:
+        print("⚡ Cache hit - no GPU time used")
+        for output_file in cached:
+            print(f"\n💾 Cached: {output_file}")
+        if output:
+            cached = restore_hit(cache, cached, output, prompts)
+            for dest in cached:
+                print(f"   Copied to: {dest}")
+        return cached
+    
+    def use_client(chosen):
+        global client, COMFYUI_URL
+        client, COMFYUI_URL = chosen, chosen.base_url
+    
+    def submit(workflow):
+        print("📤 Submitting to ComfyUI...")
+        prompt_id = submit_workflow(workflow, template, failover=bool(backends))
+        print(f"   Prompt ID: {prompt_id}")
+        return prompt_id
+    
+    def wait(prompt_id):
+        return wait_for_completion(prompt_id, failover=bool(backends))[1]
+    
+    # Submit and wait; with several backends, the least-loaded one that can
+    # run this workflow, resubmitting on the next one if it is down or dies
+    start = time.time()
+    try:
+        result = run_with_failover(workflow, submit, wait, backends=backends, on_backend=use_client)
+    except NoBackendAvailable as e:
+        print(f"❌ Error: {e}")
+        return None
+    if not result:
+        return None
+    
+    output_files, files = collect_outputs(client, result, output=output, retrieve=retrieve,
+                                          prompts=prompts, node_maps=node_maps, output_dir=OUTPUT_DIR)
+    if not files:
+        print(f"\n⚠️  Output saved to: {OUTPUT_DIR}")
         return None
+    cache_outputs(cache, workflow, client, output_files, files, gpu_seconds=time.time() - start)
+    return output_files
+
+def generate_sweep(prompt, seeds, batch_size=0, width=1328, height=1328, steps=20, use_lightning=False,
+                   output=None, retrieve="auto", from_asset=False):
+    """Seed sweep in batched latents (batch_size 0 = fit to free VRAM). Returns the per-sample results
+
+    Only a seed range is batched; an explicit seed list renders one job per seed.
+    """
+    build = lambda seed: create_api_workflow(prompt, width, height, steps, seed, use_lightning, from_asset)[0]
+    batch = batch_size or (fit_batch_size(client, build(seeds[0]), width, height, gb_per_mp=QWEN_GB_PER_MP)
+                           if is_seed_range(seeds) else 1)
+    batch = min(batch, len(seeds))
+    out = Path(output).expanduser() if output else OUTPUT_DIR / "sweeps" / "qwen.png"
+    print(f"🎲 Sweep: {len(seeds)} samples, batch size {batch}")
+    
+    start = time.time()
+    results = run_sweep(client, build, seeds, batch, dest_dir=out.parent, stem=out.stem, retrieve=retrieve,
+                        metadata={"model": "qwen_image_2512", "prompt": prompt, "width": width, "height": height,
+                                  "steps": steps, "use_lightning": use_lightning})
+    for r in results:
+        print(f"💾 seed {r['seed']} #{r['batch_index']}: {', '.join(str(p) for p in r['paths'])}")
+    print(f"📊 {format_sweep(results, time.time() - start)}")
+    return results
+
+BATCH_KEYS = ("prompt", "width", "height", "steps", "seed", "use_lightning", "output")
+
+def load_batch(path, width=1328, height=1328, steps=20, use_lightning=False):
+    """Read a prompts.jsonl file into job dicts; per-line keys override the CLI defaults.
+
+    Returns (items, errors): malformed lines are skipped and described in errors as "file:line: ...".
+    """
+    base_seed = int(time.time()) % 1000000000
+    items, errors = [], []
+    for n, line in enumerate(Path(path).read_text().splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            errors.append(f"{path}:{n}: invalid JSON: {e.msg} (column {e.colno})")
+            continue
+        if not isinstance(item, dict):
+            errors.append(f"{path}:{n}: expected a JSON object")
+            continue
+        unknown = set(item) - set(BATCH_KEYS)
+        if "prompt" not in item or unknown:
+            errors.append(f"{path}:{n}: need a 'prompt' key" if "prompt" not in item
+                          else f"{path}:{n}: unknown keys {sorted(unknown)}")
+            continue
+        item.setdefault("width", width)
+        item.setdefault("height", height)
+        item.setdefault("steps", steps)
+        item.setdefault("use_lightning", use_lightning)
+        # Distinct seeds even when the whole file is built within one second
+        item.setdefault("seed", base_seed + len(items))
+        item["line"] = n
+        items.append(item)
+    return items, errors
+
+def _collect_batch_outputs(item, entry, output_dir, retrieve, cache=None, gpu_seconds=0.0):
+    """Copy one finished batch job's images to its output path and cache them (blocking, run in a thread)"""
+    output = item.get("output") or (output_dir and str(Path(output_dir) / f"qwen_{item['line']:04d}.png"))
+    paths, files = collect_outputs(client, entry, output=output, retrieve=retrieve, output_dir=OUTPUT_DIR,
+                                   verbose=False)
+    cache_outputs(cache, item["workflow"], client, paths, files, gpu_seconds)
+    return paths
+
+def order_by_model(items):
+    """Batch items in model-affinity order (Lightning adds a LoRA loader), and the scheduler's report"""
+    scheduler = ModelAffinityScheduler()
+    by_seq = {scheduler.add(item["workflow"], name=f"line {item['line']}").seq: item for item in items}
+    ordered = []
+    while scheduler.pending:
+        ordered.append(by_seq[scheduler.next_job().seq])
+    return ordered, scheduler.report()
+
+async def _run_batch(items, queue_depth, output_dir, retrieve, cache, timeout):
+    from comfyui_async import AsyncComfyClient  # needs aiohttp, only for batch mode
+
+    done = 0
+    semaphore = asyncio.Semaphore(queue_depth)
+
+    async def one(item):
+        nonlocal done
+        # Hold a queue slot only while ComfyUI owns the job; fetching outputs
+        # happens after the next prompt has already been queued.
+        async with semaphore:
+            job = await aclient.submit(item["workflow"])
+            entry = await aclient.wait(job, timeout)
+        gpu_seconds = (job.finished_at or time.time()) - (job.started_at or job.submitted_at)
+        paths = await asyncio.to_thread(_collect_batch_outputs, item, entry, output_dir, retrieve, cache, gpu_seconds)
+        done += 1
+        print(f"✅ [{done}/{len(items)}] line {item['line']}: {', '.join(str(p) for p in paths)}")
+        return paths
+
+    async with AsyncComfyClient(client.base_url) as aclient:
+        return await asyncio.gather(*(one(item) for item in items), return_exceptions=True)
+
+def generate_batch(path, queue_depth=4, output_dir=None, retrieve="auto", use_cache=True, timeout=600,
+                   width=1328, height=1328, steps=20, use_lightning=False, from_asset=False):
+    """Run every prompt in a JSONL file, keeping queue_depth prompts queued. Returns the number of failures."""
+    items, errors = load_batch(path, width, height, steps, use_lightning)
+    for error in errors:
+        print(f"❌ {error}")
+    print(f"🎨 Qwen-Image-2512 batch: {len(items)} prompts, {queue_depth} queued at a time")
+    
+    cache = ResultCache() if use_cache else None
+    pending, cached = [], 0
+    for item in items:
+        with tracing.span("build workflow", cat="build", line=item["line"]):
+            item["workflow"], _ = create_api_workflow(item["prompt"], item["width"], item["height"],
+                                                      item["steps"], item["seed"], item["use_lightning"], from_asset)
+        with tracing.span("cache lookup", cat="cache", line=item["line"]):
+            hit = cache.get(item["workflow"]) if cache else None
+        if hit:
+            cached += 1
+            dest = item.get("output") or (output_dir and str(Path(output_dir) / f"qwen_{item['line']:04d}.png"))
+            if dest:
+                with tracing.span("cache restore", cat="io", line=item["line"]):
+                    hit = cache.restore(hit, numbered_paths(dest, len(hit)))
+            print(f"⚡ line {item['line']}: cache hit {', '.join(str(p) for p in hit)}")
+            continue
+        try:
+            with tracing.span("validate", cat="build", line=item["line"]):
+                validate_for(client, item["workflow"], select_template(item["use_lightning"], from_asset))
+        except WorkflowValidationError as e:
+            print(f"❌ line {item['line']}: invalid workflow: {e.errors[0]}")
+            continue
+        pending.append(item)
+    
+    pending, order = order_by_model(pending)
+    if order["fifo_swaps"]:
+        print(f"🔀 Model-affinity order: {order['swaps']} model switches instead of {order['fifo_swaps']} "
+              f"({order['swaps_avoided']} avoided)")
+    
+    start = time.time()
+    results = asyncio.run(_run_batch(pending, queue_depth, output_dir, retrieve, cache, timeout)) if pending else []
+    elapsed = time.time() - start
+    
+    failed = len(errors) + len(items) - cached - len(pending)
+    images = 0
+    for item, result in zip(pending, results):
+        if isinstance(result, BaseException):
+            failed += 1
+            print(f"❌ line {item['line']}: {result}")
+        else:
+            images += len(result)
+    
+    print(f"\n📊 {images} images in {elapsed:.1f}s ({60 * images / elapsed if elapsed else 0:.1f} images/min), "
+          f"{cached} from cache, {failed} failed")
+    return failed
 
 def main():
     parser = argparse.ArgumentParser(description="Generate images with Qwen-Image-2512")
-    parser.add_argument("prompt", help="Text prompt for generation")
+    parser.add_argument("prompt", nargs="?", help="Text prompt for generation")
     parser.add_argument("--width", "-W", type=int, default=1328, help="Image width")
     parser.add_argument("--height", "-H", type=int, default=1328, help="Image height")
     parser.add_argument("--steps", "-s", type=int, default=20, help="Inference steps")
     parser.add_argument("--seed", type=int, default=None, help="Random seed")
     parser.add_argument("--lightning", "-l", action="store_true", help="Use Lightning 4-step mode")
     parser.add_argument("--output", "-o", help="Output filename")
+    parser.add_argument("--from-asset", action="store_true",
+                        help="Use the editor workflow in assets/qwen_image_2512.json instead of the built-in graph")
+    parser.add_argument("--retrieve", choices=RETRIEVE_MODES, default="auto",
+                        help="How --output is filled: auto (link locally, else HTTP), move, or http")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always render, bypassing the local result cache")
+    parser.add_argument("--comfyui-url", default=None,
+                        help="ComfyUI base URL (default: $COMFYUI_URL or http://127.0.0.1:8188)")
+    parser.add_argument("--backends", default=os.environ.get("COMFYUI_BACKENDS"),
+                        help="Comma-separated ComfyUI URLs to load-balance over (default: $COMFYUI_BACKENDS)")
+    parser.add_argument("--seeds", help="Seed sweep: a range like 1-16 is batched (start seed + batch index), "
+                                        "a list like 1,5,9 renders one job per seed")
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="Samples per job for a --seeds range (default: as many as fit in free VRAM)")
+    parser.add_argument("--variant", action="append", default=[], metavar="PROMPT",
+                        help="Extra prompt rendered in the same job with shared loaders (repeatable)")
+    parser.add_argument("--batch", metavar="PROMPTS_JSONL",
+                        help="Generate every prompt in a JSONL file (one object per line)")
+    parser.add_argument("--queue-depth", type=int, default=4,
+                        help="Batch mode: prompts kept queued in ComfyUI at once")
+    parser.add_argument("--output-dir", help="Batch mode: copy images here as they complete")
+    parser.add_argument("--trace", action="store_true",
+                        help="Write a Chrome trace of this run or batch (also: $COMFYUI_TRACE=1)")
     
     args = parser.parse_args()
+    if not args.prompt and not args.batch:
+        parser.error("a prompt or --batch is required")
+    if args.seeds and args.variant:
+        parser.error("--seeds cannot be combined with --variant")
+    seeds = parse_seeds(args.seeds) if args.seeds else None
+    if seeds and args.batch_size > 1 and not is_seed_range(seeds):
+        parser.error("only a --seeds range (e.g. 1-16) can be batched; a seed list needs --batch-size 1")
+    tracing.start_if_enabled("generate_qwen-batch" if args.batch else "generate_qwen", args.trace)
+    
+    global client, COMFYUI_URL
+    if args.comfyui_url:
+        client = get_client(args.comfyui_url)
+        COMFYUI_URL = client.base_url
+    
+    if args.batch:
+        if not Path(args.batch).is_file():
+            parser.error(f"--batch: no such file: {args.batch}")
+        failed = generate_batch(
+            args.batch,
+            queue_depth=args.queue_depth,
+            output_dir=args.output_dir,
+            retrieve=args.retrieve,
+            use_cache=not args.no_cache,
+            width=args.width,
+            height=args.height,
+            steps=args.steps,
+            use_lightning=args.lightning,
+            from_asset=args.from_asset
+        )
+        return 1 if failed else 0
+    
+    if seeds:
+        results = generate_sweep(
+            args.prompt,
+            seeds,
+            batch_size=args.batch_size,
+            width=args.width,
+            height=args.height,
+            steps=args.steps,
+            use_lightning=args.lightning,
+            output=args.output,
+            retrieve=args.retrieve,
+            from_asset=args.from_asset
+        )
+        return 0 if results else 1
     
     result = generate_image(
         prompt=args.prompt,
@@ -245,7 +558,12 @@ def main():
         steps=args.steps,
         seed=args.seed,
         use_lightning=args.lightning,
-        output=args.output
+        output=args.output,
+        retrieve=args.retrieve,
+        from_asset=args.from_asset,
+        use_cache=not args.no_cache,
+        backends=args.backends,
+        variants=args.variant
     )
     
     return 0 if result else 1